@@ -0,0 +1,151 @@
+"""IPv4 addresses as integers, and DHCP-style address pools.
+
+Devices keep their address and prefix length as plain integers; dotted
+strings are only parsed at the edges (the terminal, the configuration tab,
+topology files) and formatted for display. New devices lease the lowest free
+host address of the first pool with room, tracked in a one-bit-per-address
+bitmap, so a /8 pool of 16 million addresses takes 2 MB.
+"""
+
+DEFAULT_POOLS = ("192.168.0.0/24", "10.0.0.0/8")  # Tried in order; small labs stay in 192.168.0.x
+
+
+def parse_ip(text):
+    """The integer value of a dotted IPv4 address; ValueError if it is not one."""
+    parts = text.split(".")
+    if len(parts) != 4:
+        raise ValueError(f"'{text}' is not an IPv4 address")
+    value = 0
+    for part in parts:
+        if not (part.isdigit() and len(part) <= 3 and int(part) <= 255):
+            raise ValueError(f"'{text}' is not an IPv4 address")
+        value = value << 8 | int(part)
+    return value
+
+
+def format_ip(value):
+    return f"{value >> 24}.{value >> 16 & 255}.{value >> 8 & 255}.{value & 255}"
+
+
+def prefix_mask(prefix):
+    """The netmask of a prefix length, as an integer."""
+    return (0xffffffff << (32 - prefix)) & 0xffffffff
+
+
+def parse_mask(text):
+    """The prefix length of a dotted netmask; ValueError unless its ones are contiguous."""
+    mask = parse_ip(text)
+    prefix = 32 - ((~mask & 0xffffffff).bit_length())
+    if prefix_mask(prefix) != mask:
+        raise ValueError(f"'{text}' is not a valid subnet mask")
+    return prefix
+
+
+def parse_subnet(text):
+    """(network, prefix length) of 'a.b.c.d/n'."""
+    address, _, prefix = text.partition("/")
+    if not prefix.isdigit() or not 0 <= int(prefix) <= 32:
+        raise ValueError(f"'{text}' is not a subnet in a.b.c.d/n form")
+    prefix = int(prefix)
+    return parse_ip(address) & prefix_mask(prefix), prefix
+
+
+class AddressPool:
+    """The host addresses of one subnet, leased lowest first from a free bitmap."""
+
+    def __init__(self, network, prefix):
+        self.network = network
+        self.prefix = prefix
+        self.size = 1 << (32 - prefix)
+        self._used = bytearray((self.size + 7) // 8)  # Bit set = address taken
+        self._hint = 0  # No free address below this offset
+        self.leased = 0
+        # The network and broadcast addresses are not hosts (except in /31 and /32)
+        if self.size > 2:
+            self._mark(0)
+            self._mark(self.size - 1)
+            self.leased -= 2
+
+    def __contains__(self, address):
+        return self.network <= address < self.network + self.size
+
+    @property
+    def free(self):
+        return self.size - self.leased - (2 if self.size > 2 else 0)
+
+    def _mark(self, offset):
+        self._used[offset >> 3] |= 1 << (offset & 7)
+        self.leased += 1
+
+    def allocate(self):
+        """Lease the lowest free address, or None if the pool is full."""
+        used = self._used
+        byte = self._hint >> 3
+        # Whole bytes of taken addresses are skipped at once
+        while byte < len(used) and used[byte] == 0xff:
+            byte += 1
+        if byte == len(used):
+            self._hint = self.size
+            return None
+        bits = used[byte]
+        offset = byte << 3
+        while bits & 1:
+            bits >>= 1
+            offset += 1
+        if offset >= self.size:
+            self._hint = self.size
+            return None
+        self._mark(offset)
+        self._hint = offset + 1
+        return self.network + offset
+
+    def reserve(self, address):
+        """Take a specific address; False if it is already leased."""
+        offset = address - self.network
+        if self._used[offset >> 3] & (1 << (offset & 7)):
+            return False
+        self._mark(offset)
+        return True
+
+    def release(self, address):
+        offset = address - self.network
+        if not self._used[offset >> 3] & (1 << (offset & 7)):
+            return
+        self._used[offset >> 3] &= ~(1 << (offset & 7)) & 0xff
+        self.leased -= 1
+        if offset < self._hint:
+            self._hint = offset
+
+
+class AddressAllocator:
+    """A set of pools: leases come from the first pool with room."""
+
+    def __init__(self, subnets=DEFAULT_POOLS):
+        self.pools = [AddressPool(*parse_subnet(subnet)) for subnet in subnets]
+
+    def pool_of(self, address):
+        for pool in self.pools:
+            if address in pool:
+                return pool
+        return None
+
+    def allocate(self):
+        """Lease an address; returns (address, prefix length), or raises ValueError when all pools are full."""
+        for pool in self.pools:
+            address = pool.allocate()
+            if address is not None:
+                return address, pool.prefix
+        raise ValueError("No free IP addresses left in any pool")
+
+    def reserve(self, address):
+        """Take an address chosen by hand; False if a pool already leased it.
+
+        Addresses outside every pool are not tracked and always succeed.
+        """
+        pool = self.pool_of(address)
+        return pool is None or pool.reserve(address)
+
+    def release(self, address):
+        pool = self.pool_of(address)
+        if pool is not None:
+            pool.release(address)
@@ -0,0 +1,127 @@
+"""Ownership of the timers and canvas items behind packet animations.
+
+Every animation schedules its ``after()`` jobs and draws its canvas items
+through an Animation, which remembers them until they fire or are deleted.
+The AnimationTracker indexes live animations by the devices on their path,
+so removing a device or link cancels the animations crossing it at once:
+their pending jobs are cancelled and their items deleted, instead of firing
+later against a canvas and device table that have moved on.
+"""
+
+
+class Animation:
+    """The pending timers and canvas items of one packet animation."""
+
+    def __init__(self, tracker, path, on_cancel=None):
+        self.tracker = tracker
+        self.path = tuple(path)
+        self.hops = set(zip(self.path, self.path[1:]))
+        self.on_cancel = on_cancel  # Called with the animation if an endpoint goes away
+        self.jobs = set()  # Pending after() ids
+        self.items = set()  # Canvas item ids
+        self.packet = None  # The packet's oval, once drawn
+        self.live = True
+
+    def after(self, ms, func, *args):
+        """Schedule func like root.after, owned by this animation (no-op once it ended)."""
+        if not self.live:
+            return None
+        job = None
+
+        def fire():
+            self.jobs.discard(job)
+            func(*args)
+
+        job = self.tracker.root.after(ms, fire)
+        self.jobs.add(job)
+        return job
+
+    def create(self, kind, *coords, **options):
+        """Draw a canvas item of the given kind ('oval', 'line', ...) owned by this animation."""
+        item = getattr(self.tracker.canvas, f"create_{kind}")(*coords, **options)
+        self.items.add(item)
+        return item
+
+    def delete(self, item):
+        self.tracker.canvas.delete(item)
+        self.items.discard(item)
+
+    def finish(self):
+        """End normally: drop pending jobs and delete the items."""
+        if not self.live:
+            return
+        self._end()
+        self.tracker.finished += 1
+
+    def cancel(self):
+        """End because a device or link on the path was removed."""
+        if not self.live:
+            return
+        self._end()
+        self.tracker.cancelled += 1
+        if self.on_cancel is not None:
+            self.on_cancel(self)
+
+    def _end(self):
+        self.live = False
+        for job in self.jobs:
+            self.tracker.root.after_cancel(job)
+        for item in self.items:
+            self.tracker.canvas.delete(item)
+        self.jobs.clear()
+        self.items.clear()
+        self.packet = None
+        self.tracker._forget(self)
+
+
+class AnimationTracker:
+    """Live animations of one canvas, indexed by the devices on their paths."""
+
+    def __init__(self, root, canvas):
+        self.root = root
+        self.canvas = canvas
+        self.animations = set()
+        self._by_device = {}  # device id -> live animations whose path visits it
+        self.started = 0
+        self.finished = 0
+        self.cancelled = 0
+
+    def start(self, path, on_cancel=None):
+        animation = Animation(self, path, on_cancel)
+        self.animations.add(animation)
+        for device_id in animation.path:
+            self._by_device.setdefault(device_id, set()).add(animation)
+        self.started += 1
+        return animation
+
+    def _forget(self, animation):
+        self.animations.discard(animation)
+        for device_id in animation.path:
+            animations = self._by_device.get(device_id)
+            if animations is not None:
+                animations.discard(animation)
+                if not animations:
+                    del self._by_device[device_id]
+
+    def cancel_device(self, device_id):
+        """Cancel every animation whose path visits the device. Returns how many."""
+        animations = list(self._by_device.get(device_id, ()))
+        for animation in animations:
+            animation.cancel()
+        return len(animations)
+
+    def cancel_broken(self, hop_exists):
+        """Cancel every animation with a hop (a, b) for which hop_exists(a, b) is false. Returns how many."""
+        animations = [animation for animation in self.animations
+                      if not all(hop_exists(*hop) for hop in animation.hops)]
+        for animation in animations:
+            animation.cancel()
+        return len(animations)
+
+    @property
+    def pending_jobs(self):
+        return sum(len(animation.jobs) for animation in self.animations)
+
+    @property
+    def item_count(self):
+        return sum(len(animation.items) for animation in self.animations)
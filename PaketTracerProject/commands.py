@@ -0,0 +1,544 @@
+"""Terminal command interpreter shared by the GUI terminal and headless runs."""
+import threading
+import time
+
+import networkx as nx
+
+from eventlog import TraceRecorder, PROTO_ICMP, PROTO_TCP, PROTO_UDP, INITIAL_TTL
+from failures import describe as describe_failure
+from pcap import PcapWriter
+from routing import PROTOCOLS
+from topology import save_topology
+
+SHOW_DEVICES_PAGE_SIZE = 50
+SHOW_LINKS_PAGE_SIZE = 50
+FAILURES_PAGE_SIZE = 50
+LAG_OFFENDERS_SHOWN = 10
+
+HELP_TEXT = (
+    "Available commands:\n"
+    "- Ping <source_ip> <destination_ip> [count]\n"
+    "- PingAll\n"
+    "- Show Devices [page <n>] [type <type>] [match <name or IP prefix>]\n"
+    "- Show Links [page <n>]\n"
+    "- Failures [page <n>]\n"
+    "- SendPacket <source_ip> <destination_ip> TCP/UDP\n"
+    "- Save <file.json>\n"
+    "- Seed [number]\n"
+    "- Trace Start <file> / Trace Stop\n"
+    "- Capture Start <file.pcap> / Capture Stop\n"
+    "- Routing [RIP/OSPF/Off]\n"
+    "- Lag [reset | threshold <ms>] (GUI only)\n"
+    "- Leaks (GUI only)"
+)
+
+
+class CommandCancelled(Exception):
+    """Raised inside a command when its cancel event is set; the command just stops."""
+
+
+class CommandInterpreter:
+    """Parse and run terminal commands against a network.Network.
+
+    Output is passed line by line to ``write``. Packet animations are handed
+    to ``send_packet(protocol, path, src_device, dest_device)`` if given;
+    without one (headless runs) the delivery is reported straight away.
+    ``lag_monitor`` is the GUI's lagmonitor.LagMonitor, for the 'lag'
+    command, and ``leak_audit()`` hands the 'leaks' command to the GUI,
+    which reports its timers and canvas items from the Tk thread.
+    ``execute`` may run on a worker thread: it only reads the network under
+    its lock and never touches Tk.
+    """
+
+    def __init__(self, network, write, send_packet=None, lag_monitor=None, leak_audit=None):
+        self.network = network
+        self.write = write
+        self.send_packet = send_packet
+        self.lag_monitor = lag_monitor
+        self.leak_audit = leak_audit
+        self.error = None  # Why the last command failed, or None if it succeeded
+        self.recorder = None
+        self.capture = None
+        self._cancel = None
+
+    def execute(self, command, cancel=None):
+        """Run one command line. ``cancel`` is an optional threading.Event.
+
+        Returns True if the command succeeded; otherwise ``error`` says why.
+        """
+        self._cancel = cancel if cancel is not None else threading.Event()
+        self.error = None
+        command = command.strip()
+        # Convert command to lowercase for case-insensitive comparison
+        normalized_command = command.lower()
+        try:
+            if not normalized_command:
+                return
+            if normalized_command == "help":
+                self.write(HELP_TEXT)
+            elif normalized_command == "show devices" or normalized_command.startswith("show devices "):
+                self.show_devices(command)
+            elif normalized_command == "show links" or normalized_command.startswith("show links "):
+                self.show_links(command)
+            elif normalized_command == "failures" or normalized_command.startswith("failures "):
+                self.execute_failures(command)
+            elif normalized_command == "pingall":
+                self.execute_ping_all()
+            elif normalized_command.startswith("ping "):  # Ensure a space follows 'ping'
+                self.execute_ping(command)
+            elif normalized_command.startswith("sendpacket "):  # Ensure a space follows 'sendpacket'
+                self.execute_send_packet(command)
+            elif normalized_command.startswith("save "):
+                self.execute_save(command)
+            elif normalized_command == "seed" or normalized_command.startswith("seed "):
+                self.execute_seed(command)
+            elif normalized_command.startswith("trace "):
+                self.execute_trace(command)
+            elif normalized_command.startswith("capture "):
+                self.execute_capture(command)
+            elif normalized_command == "routing" or normalized_command.startswith("routing "):
+                self.execute_routing(command)
+            elif normalized_command == "lag" or normalized_command.startswith("lag "):
+                self.execute_lag(command)
+            elif normalized_command == "leaks":
+                if self.leak_audit is None:
+                    self.fail("The leak audit only runs in the GUI.")
+                else:
+                    self.leak_audit()
+            else:
+                self.fail("Unknown command. Type 'help' for a list of commands.\n")
+        except CommandCancelled:
+            self.error = "Cancelled"
+        return self.error is None
+
+    def fail(self, message):
+        """Write an error message and mark the running command as failed."""
+        self.error = message.strip()
+        self.write(message)
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise CommandCancelled()
+
+    def show_devices(self, command="show devices"):
+        """List devices one page at a time, optionally filtered by type and name/IP prefix."""
+        options = command.split()[2:]
+        filters = {}
+        while options:
+            key = options.pop(0).lower()
+            if key not in ("page", "type", "match"):
+                self.fail(f"Unknown option '{key}'. Use page, type or match.")
+                return
+            if not options:
+                self.fail("Invalid command. Use: show devices [page <n>] [type <type>] [match <prefix>]")
+                return
+            if key == "match":
+                # The prefix may contain spaces ("router 1"), so it takes the rest of the line
+                filters[key] = " ".join(options)
+                break
+            filters[key] = options.pop(0)
+        try:
+            page = int(filters.get("page", 1))
+        except ValueError:
+            page = 0
+        if page < 1:
+            self.fail("Invalid page. Use a positive page number.")
+            return
+        device_type = filters.get("type", "").lower()
+
+        with self.network.lock:
+            if not self.network.devices:
+                self.write("No devices found in the network.")
+                return
+            matches = self.network.index.search(filters.get("match", ""))
+            if device_type:
+                matches = [device_id for device_id in matches
+                           if self.network.devices[device_id].device_type.lower() == device_type]
+            total = len(matches)
+            start = (page - 1) * SHOW_DEVICES_PAGE_SIZE
+            devices = [self.network.devices[device_id]
+                       for device_id in matches[start:start + SHOW_DEVICES_PAGE_SIZE]]
+
+        if not total:
+            self.write("No devices match.")
+            return
+        pages = (total + SHOW_DEVICES_PAGE_SIZE - 1) // SHOW_DEVICES_PAGE_SIZE
+        if not devices:
+            self.fail(f"Page {page} is past the end; there are {pages} pages.")
+            return
+        for device in devices:
+            self.write(f"{device.device_type} (ID: {device.id}) - IP: {device.ip_address}")
+        if pages > 1:
+            footer = f"Page {page}/{pages} ({total} devices)."
+            if page < pages:
+                footer += f" Use 'show devices page {page + 1}' for more."
+            self.write(footer)
+
+    def show_links(self, command="show links"):
+        """List links busiest first, one page at a time, with their traffic counters."""
+        options = command.split()[2:]
+        if options and (len(options) != 2 or options[0].lower() != "page"):
+            self.fail("Invalid command. Use: show links [page <n>]")
+            return
+        try:
+            page = int(options[1]) if options else 1
+        except ValueError:
+            page = 0
+        if page < 1:
+            self.fail("Invalid page. Use a positive page number.")
+            return
+
+        with self.network.lock:
+            links = sorted(self.network.links, key=lambda link: (-link.bytes, -link.drops, link.id))
+        if not links:
+            self.write("No links in the network.")
+            return
+        pages = (len(links) + SHOW_LINKS_PAGE_SIZE - 1) // SHOW_LINKS_PAGE_SIZE
+        start = (page - 1) * SHOW_LINKS_PAGE_SIZE
+        if start >= len(links):
+            self.fail(f"Page {page} is past the end; there are {pages} pages.")
+            return
+        for link in links[start:start + SHOW_LINKS_PAGE_SIZE]:
+            self.write(f"Link {link.id} ({link.type}) {link.device1.device_type} {link.device1.id} <-> "
+                       f"{link.device2.device_type} {link.device2.id}: {link.packets} packets, "
+                       f"{link.bytes} bytes, {link.drops} drops")
+        if pages > 1:
+            footer = f"Page {page}/{pages} ({len(links)} links)."
+            if page < pages:
+                footer += f" Use 'show links page {page + 1}' for more."
+            self.write(footer)
+
+    def execute_failures(self, command="failures"):
+        """List the links and devices whose failure alone would disconnect devices, worst first."""
+        options = command.split()[1:]
+        if options and (len(options) != 2 or options[0].lower() != "page"):
+            self.fail("Invalid command. Use: failures [page <n>]")
+            return
+        try:
+            page = int(options[1]) if options else 1
+        except ValueError:
+            page = 0
+        if page < 1:
+            self.fail("Invalid page. Use a positive page number.")
+            return
+
+        report = self.network.failure_report()
+        entries = report.entries()
+        self.write(report.summary())
+        if not entries:
+            return
+        pages = (len(entries) + FAILURES_PAGE_SIZE - 1) // FAILURES_PAGE_SIZE
+        start = (page - 1) * FAILURES_PAGE_SIZE
+        if start >= len(entries):
+            self.fail(f"Page {page} is past the end; there are {pages} pages.")
+            return
+        for entry in entries[start:start + FAILURES_PAGE_SIZE]:
+            self.write(describe_failure(entry))
+        if pages > 1:
+            footer = f"Page {page}/{pages} ({len(entries)} single points of failure)."
+            if page < pages:
+                footer += f" Use 'failures page {page + 1}' for more."
+            self.write(footer)
+
+    def _resolve(self, ip1, ip2):
+        src_device = self.network.find_by_ip(ip1)
+        dest_device = self.network.find_by_ip(ip2)
+        if src_device is None or dest_device is None:
+            self.fail("Error: One or both IPs not found in the network.")
+            return None
+        return src_device, dest_device
+
+    def execute_ping(self, command):
+        """Handle the 'ping' command to simulate packet transmission."""
+        try:
+            parts = command.split()
+            if len(parts) not in (3, 4) or parts[0].lower() != "ping":
+                self.fail("Invalid command. Use: ping <source_ip> <destination_ip> [count]")
+                return
+            count = int(parts[3]) if len(parts) == 4 else 4
+            if count < 1:
+                self.fail("Invalid count. Use a positive number of packets.")
+                return
+
+            ip1, ip2 = parts[1], parts[2]
+            resolved = self._resolve(ip1, ip2)
+            if resolved is None:
+                return
+            src_device, dest_device = resolved
+
+            # The route (and its links) is cached; only the per-packet delay varies
+            route = self.network.route(src_device, dest_device)
+            if route is None:
+                self.fail(f"Ping failed: {ip2} is unreachable from {ip1}.")
+                return
+            path, hop_links = route.path, route.links
+
+            hops = len(path) - 1  # Calculate hops (edges in the path)
+            adjusted_ttl = INITIAL_TTL - hops  # Adjust TTL based on hops
+            reply_path, reply_links = path[::-1], hop_links[::-1]
+            transmit = self.network.transmit
+
+            self.write(f"Pinging {ip2} from {ip1} with {count} packets "
+                       f"({hops} hops, path latency {route.latency:.2f}ms):")
+
+            received = 0
+            delays = []
+            for packet_num in range(count):
+                self.check_cancelled()
+
+                # Echo request, then the echo reply back to the source
+                total_delay = transmit(path, PROTO_ICMP, hop_links)
+                if total_delay is not None:
+                    transmit(reply_path, PROTO_ICMP, reply_links, reply=True)
+                    received += 1
+                    delays.append(total_delay)
+                    self.write(
+                        f"Reply from {ip2}: TTL={adjusted_ttl}, Delay={total_delay:.2f}ms (Packet {packet_num + 1})"
+                    )
+                else:
+                    self.write(f"Request timed out (TTL expired).")
+
+            if len(parts) == 4:
+                summary = f"Ping statistics for {ip2}: Sent={count}, Received={received}, Lost={count - received}"
+                if delays:
+                    summary += (f", Min={min(delays):.2f}ms, Max={max(delays):.2f}ms, "
+                                f"Avg={sum(delays) / len(delays):.2f}ms")
+                self.write(summary)
+            if not received:
+                self.error = f"No replies from {ip2}"
+
+        except CommandCancelled:
+            raise
+        except Exception as e:
+            self.fail(f"Error executing ping: {str(e)}")
+
+    def execute_ping_all(self):
+        """Check reachability between every pair of devices (one BFS per source)."""
+        with self.network.lock:
+            graph = self.network.graph.copy()
+            devices = dict(self.network.devices)
+        if len(devices) < 2:
+            self.fail("PingAll needs at least two devices.")
+            return
+
+        self.write(f"Pinging all pairs of {len(devices)} devices:")
+        reachable_pairs = 0
+        total_pairs = 0
+        for device in devices.values():
+            self.check_cancelled()
+            lengths = nx.single_source_shortest_path_length(graph, device.id)
+            reached = len(lengths) - 1
+            reachable_pairs += reached
+            total_pairs += len(devices) - 1
+            if reached:
+                avg_hops = sum(lengths.values()) / reached
+                self.write(f"{device.device_type} {device.id} ({device.ip_address}): "
+                           f"{reached}/{len(devices) - 1} reachable, avg {avg_hops:.1f} hops")
+            else:
+                self.write(f"{device.device_type} {device.id} ({device.ip_address}): isolated")
+        self.write(f"PingAll complete: {reachable_pairs}/{total_pairs} device pairs reachable.")
+
+    def execute_send_packet(self, command):
+        """Handle the 'SendPacket' command to simulate TCP/UDP packet transmission."""
+        try:
+            parts = command.split()
+            if len(parts) != 4 or parts[0].lower() != "sendpacket":
+                self.fail("Invalid command. Use: SendPacket <source_ip> <destination_ip> TCP/UDP")
+                return
+
+            ip1, ip2, protocol = parts[1], parts[2], parts[3].upper()
+            if protocol not in ("TCP", "UDP"):
+                self.fail("Invalid protocol. Use either TCP or UDP.")
+                return
+
+            resolved = self._resolve(ip1, ip2)
+            if resolved is None:
+                return
+            src_device, dest_device = resolved
+
+            route = self.network.route(src_device, dest_device)
+            if route is None:
+                self.fail(f"SendPacket failed: {ip2} is unreachable from {ip1}.")
+                return
+            path, hop_links = route.path, route.links
+
+            self.write(f"Sending {protocol} packet from {ip1} to {ip2}...")
+            # Run the packet (and TCP's acknowledgment) through the simulation
+            # first; the animation only visualises it
+            one_way = self.network.transmit(path, PROTO_TCP if protocol == "TCP" else PROTO_UDP, hop_links)
+            if one_way is None:
+                self.fail(f"{protocol} packet to {ip2} dropped (TTL expired).")
+                return
+            back = None
+            if protocol == "TCP":
+                back = self.network.transmit(path[::-1], PROTO_TCP, hop_links[::-1], reply=True)
+
+            if self.send_packet is not None:
+                self.send_packet(protocol, path, src_device, dest_device)
+            else:
+                self._report_delivery(protocol, path, src_device, dest_device, one_way, back)
+
+        except Exception as e:
+            self.fail(f"Error executing SendPacket: {str(e)}")
+
+    def _report_delivery(self, protocol, path, src_device, dest_device, one_way, back=None):
+        """Headless stand-in for the packet animation: print what it would show."""
+        self.write(f"{protocol} packet delivered to {dest_device.ip_address} "
+                   f"({len(path) - 1} hops, Delay={one_way:.2f}ms)")
+        if back is not None:
+            self.write(f"Acknowledgment received by {src_device.ip_address} (RTT={one_way + back:.2f}ms)")
+
+    def execute_save(self, command):
+        """Handle 'Save <file>': write the topology as JSON."""
+        path = command.split(maxsplit=1)[1]
+        try:
+            save_topology(self.network, path)
+            self.write(f"Topology saved to {path}.")
+        except OSError as e:
+            self.fail(f"Error saving topology: {str(e)}")
+
+    def execute_seed(self, command):
+        """Handle 'Seed' (show the RNG seed) and 'Seed <n>' (restart the RNG streams)."""
+        parts = command.split()
+        if len(parts) == 1:
+            self.write(f"Seed: {self.network.seed}")
+            return
+        try:
+            seed = int(parts[1])
+        except ValueError:
+            self.fail("Invalid seed. Use: Seed <integer>")
+            return
+        with self.network.lock:
+            self.network.reseed(seed)
+        self.write(f"Random streams reseeded with {seed}.")
+
+    def execute_lag(self, command):
+        """Handle 'Lag' (event loop lag and the slowest callbacks), 'Lag Reset' and 'Lag Threshold <ms>'."""
+        monitor = self.lag_monitor
+        if monitor is None:
+            self.fail("The lag monitor only runs in the GUI.")
+            return
+        parts = command.lower().split()
+        if parts[1:] == ["reset"]:
+            monitor.reset()
+            self.write("Lag statistics cleared.")
+            return
+        if len(parts) == 3 and parts[1] == "threshold":
+            try:
+                threshold = float(parts[2])
+            except ValueError:
+                threshold = 0
+            if threshold <= 0:
+                self.fail("Invalid threshold. Use a positive number of milliseconds.")
+                return
+            monitor.threshold_ms = threshold
+            self.write(f"Recording callbacks and stalls of {threshold:g}ms or more.")
+            return
+        if len(parts) != 1:
+            self.fail("Invalid command. Use: lag [reset | threshold <ms>]")
+            return
+
+        self.write(monitor.summary())
+        offenders = monitor.offenders(LAG_OFFENDERS_SHOWN)
+        if not offenders:
+            self.write("No slow callbacks recorded.")
+        else:
+            self.write("Slowest callbacks (worst call, calls over threshold, total):")
+            for offender in offenders:
+                self.write(f"  {offender.max_ms:9.1f}ms {offender.count:6} {offender.total_ms:10.1f}ms  "
+                           f"{offender.location}")
+        stalls = monitor.stalls()
+        if stalls:
+            self.write("Recent stalls:")
+            for stall in stalls:
+                self.write(f"  {time.strftime('%H:%M:%S', time.localtime(stall.wall_time))} "
+                           f"{stall.lag_ms:9.1f}ms late, slowest callback: {stall.culprit}")
+
+    def execute_trace(self, command):
+        """Handle 'Trace Start <file>' and 'Trace Stop'."""
+        parts = command.split(maxsplit=2)
+        action = parts[1].lower()
+        if action == "start" and len(parts) == 3:
+            if self.recorder is not None:
+                self.fail(f"Already tracing to {self.recorder.path}. Use 'trace stop' first.")
+                return
+            try:
+                recorder = TraceRecorder(parts[2], self.network.seed)
+            except (OSError, ValueError) as e:
+                self.fail(f"Error starting trace: {str(e)}")
+                return
+            with self.network.lock:
+                self.network.describe_topology(recorder)
+                self.network.listeners.append(recorder)
+            self.recorder = recorder
+            self.write(f"Tracing events to {recorder.path} (seed {self.network.seed}).")
+        elif action == "stop":
+            self.stop_trace()
+        else:
+            self.fail("Invalid command. Use: Trace Start <file> or Trace Stop")
+
+    def execute_capture(self, command):
+        """Handle 'Capture Start <file.pcap>' and 'Capture Stop'."""
+        parts = command.split(maxsplit=2)
+        action = parts[1].lower()
+        if action == "start" and len(parts) == 3:
+            if self.capture is not None:
+                self.fail(f"Already capturing to {self.capture.path}. Use 'capture stop' first.")
+                return
+            try:
+                capture = PcapWriter(parts[2], self.network)
+            except OSError as e:
+                self.fail(f"Error starting capture: {str(e)}")
+                return
+            with self.network.lock:
+                self.network.listeners.append(capture)
+            self.capture = capture
+            self.write(f"Capturing packets to {capture.path}.")
+        elif action == "stop":
+            self.stop_capture()
+        else:
+            self.fail("Invalid command. Use: Capture Start <file.pcap> or Capture Stop")
+
+    def stop_capture(self):
+        if self.capture is None:
+            self.fail("No capture is running.")
+            return
+        with self.network.lock:
+            self.network.listeners.remove(self.capture)
+            self.capture.close()
+        self.write(f"Capture stopped: {self.capture.count} frames written to {self.capture.path}.")
+        self.capture = None
+
+    def execute_routing(self, command):
+        """Handle 'Routing' (show the control plane) and 'Routing RIP/OSPF/Off' (switch it)."""
+        parts = command.lower().split()
+        if len(parts) == 1:
+            routing = self.network.routing
+            if routing is None:
+                self.write("Routing: off (packets take the shortest path).")
+                return
+            self.write(f"Routing: {routing.name.upper()}.")
+            if routing.last_report is not None:
+                for line in routing.last_report.lines():
+                    self.write(line)
+            return
+        if len(parts) != 2 or parts[1] not in PROTOCOLS + ("off",):
+            self.fail("Invalid command. Use: Routing [RIP/OSPF/Off]")
+            return
+        if parts[1] == "off":
+            self.network.set_routing(None)
+            self.write("Routing off: packets take the shortest path.")
+            return
+        report = self.network.set_routing(parts[1])
+        for line in report.lines():
+            self.write(line)
+
+    def stop_trace(self):
+        if self.recorder is None:
+            self.fail("No trace is running.")
+            return
+        with self.network.lock:
+            self.network.listeners.remove(self.recorder)
+            self.recorder.close()
+        self.write(f"Trace stopped: {self.recorder.count} events written to {self.recorder.path}.")
+        self.recorder = None
@@ -0,0 +1,237 @@
+"""Local control socket: drive a Network with JSON-lines requests.
+
+Clients connect to a Unix-domain socket and send one JSON object per line.
+A request is either a single operation or a batch::
+
+    {"op": "add_device", "type": "PC", "count": 100}
+    {"id": 7, "ops": [{"op": "connect", "a": 1, "b": 2, "type": "Fiber"},
+                      {"op": "ping", "src": "192.168.0.1", "dst": "192.168.0.2", "count": 3}]}
+
+Operations run in order and responses stream back as JSON lines while the
+batch runs: any output lines of an operation (``{"id", "op", "output"}``),
+then its result (``{"id", "op", "ok": true, "result"}`` or ``"ok": false``
+with an ``"error"``), and finally ``{"id", "done": true, "ok", "failed"}``
+for the whole batch. ``op`` in a response is the operation's position in
+the batch. A failed operation does not stop the rest.
+
+Operations:
+
+- add_device: type, optional count (default 1) and ports. Returns the new
+  devices' ids and IPs.
+- connect: a, b (device ids or IPs), optional type (default Copper) and
+  distance in km. Returns the link id and its latency.
+- ping: src, dst, optional count (default 4). Fails if no reply comes back.
+- sendpacket: src, dst, protocol (TCP or UDP). Fails if the packet is not
+  delivered.
+- pingall
+- stats: device, link and packet counts, the clock and the routing mode.
+
+Topology edits go straight into the Network; the ``on_change`` callback
+runs once at the end of each batch that changed it, so a GUI redraws once
+per batch rather than once per operation.
+"""
+import json
+import math
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from commands import CommandInterpreter
+from eventlog import DEVICE_TYPES, CABLE_TYPES
+
+
+class ControlError(Exception):
+    """A bad operation; reported to the client, the batch carries on."""
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be a JSON object")
+            except ValueError as e:
+                if not self.server.control.send(self.wfile, {"ok": False, "error": f"Bad request: {e}"}):
+                    return
+                continue
+            if not self.server.control.run_batch(request, self.wfile):
+                return  # Client went away
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """Serve the control protocol for one Network on a Unix-domain socket."""
+
+    def __init__(self, network, path, on_change=None):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix-domain sockets are not available on this platform")
+        self.network = network
+        self.path = path
+        self.on_change = on_change
+        if os.path.exists(path):
+            os.unlink(path)  # Left behind by an earlier run
+        self._server = _Server(path, _Handler)
+        self._server.control = self
+        self._thread = None
+
+    def start(self):
+        """Serve on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    @staticmethod
+    def send(wfile, message):
+        """Write one response line; False if the client has gone away."""
+        try:
+            wfile.write(json.dumps(message).encode() + b"\n")
+            wfile.flush()
+            return True
+        except OSError:
+            return False
+
+    def run_batch(self, request, wfile):
+        """Run every operation of a request, streaming responses. False if the client left."""
+        batch_id = request.get("id")
+        ops = request["ops"] if "ops" in request else [request]
+        if not isinstance(ops, list):
+            return self.send(wfile, {"ok": False, "error": "ops must be a list"})
+        cancel = threading.Event()
+        started = time.perf_counter()
+        succeeded = failed = 0
+        changed = False
+
+        for position, op in enumerate(ops):
+            def write(line, position=position):
+                # Command output streams back as it is produced
+                if not self.send(wfile, {"id": batch_id, "op": position, "output": line}):
+                    cancel.set()
+
+            try:
+                if not isinstance(op, dict):
+                    raise ControlError("operation must be a JSON object")
+                name = str(op.get("op", "")).lower()
+                handler = getattr(self, f"op_{name}", None)
+                if handler is None:
+                    raise ControlError(f"Unknown operation '{name}'")
+                result, edited = handler(op, write, cancel)
+                changed = changed or edited
+                response = {"id": batch_id, "op": position, "ok": True, "result": result}
+                succeeded += 1
+            except (ControlError, KeyError, TypeError, ValueError) as e:
+                message = f"Missing field {e}" if isinstance(e, KeyError) else str(e)
+                response = {"id": batch_id, "op": position, "ok": False, "error": message}
+                failed += 1
+            if cancel.is_set() or not self.send(wfile, response):
+                break
+
+        if changed and self.on_change is not None:
+            self.on_change()
+        if cancel.is_set():
+            return False
+        return self.send(wfile, {"id": batch_id, "done": True, "ok": succeeded, "failed": failed,
+                                 "ms": round((time.perf_counter() - started) * 1000, 3)})
+
+    # Helpers
+
+    def _device(self, ref):
+        """A device by id (number) or IP address (string)."""
+        if isinstance(ref, bool):
+            # bool is an int subclass: true and false would be devices 1 and 0
+            raise ControlError(f"Device must be an id or an IP address, not {json.dumps(ref)}")
+        if isinstance(ref, int):
+            device = self.network.devices.get(ref)
+        else:
+            device = self.network.find_by_ip(str(ref))
+        if device is None:
+            raise ControlError(f"No device {ref!r}")
+        return device
+
+    def _command(self, command, write, cancel):
+        """Run a terminal command, streaming its output; no packet animations.
+
+        A command that fails (unreachable, unknown protocol, ...) fails the operation.
+        """
+        interpreter = CommandInterpreter(self.network, write)
+        if not interpreter.execute(command, cancel):
+            raise ControlError(interpreter.error)
+
+    # Operations: each returns (result, whether the topology changed)
+
+    def op_add_device(self, op, write, cancel):
+        count = int(op.get("count", 1))
+        if not 1 <= count <= 100000:
+            raise ControlError("count must be between 1 and 100000")
+        device_type = op["type"]
+        if device_type not in DEVICE_TYPES[1:]:
+            raise ControlError(f"Unknown device type '{device_type}'")
+        ports = op.get("ports")
+        ports = ports if ports is None else int(ports)
+        with self.network.batch():
+            devices = [self.network.add_device(device_type, ports) for _ in range(count)]
+        return [{"id": device.id, "ip": device.ip_address} for device in devices], True
+
+    def op_connect(self, op, write, cancel):
+        device1, device2 = self._device(op["a"]), self._device(op["b"])
+        if device1 is device2:
+            raise ControlError("Cannot connect a device to itself")
+        connection_type = op.get("type", "Copper")
+        if connection_type not in CABLE_TYPES[1:]:
+            raise ControlError(f"Unknown cable type '{connection_type}'")
+        distance = float(op.get("distance", 0.0))
+        # float() also takes "nan" and "inf"; NaN would slip past a plain < 0 test
+        if not (math.isfinite(distance) and distance >= 0):
+            raise ControlError("distance must be a finite, non-negative number of km")
+        link = self.network.connect(device1, device2, connection_type, distance)
+        if link is None:
+            raise ControlError(f"No free port on device {device1.id} or {device2.id}")
+        return {"link": link.id, "port_a": int(link.port1), "port_b": int(link.port2),
+                "latency_ms": link.latency}, True
+
+    def op_ping(self, op, write, cancel):
+        src, dst = self._device(op["src"]), self._device(op["dst"])
+        count = int(op.get("count", 4))
+        self._command(f"ping {src.ip_address} {dst.ip_address} {count}", write, cancel)
+        return None, False
+
+    def op_sendpacket(self, op, write, cancel):
+        src, dst = self._device(op["src"]), self._device(op["dst"])
+        self._command(f"sendpacket {src.ip_address} {dst.ip_address} {op['protocol']}", write, cancel)
+        return None, False
+
+    def op_pingall(self, op, write, cancel):
+        self._command("pingall", write, cancel)
+        return None, False
+
+    def op_stats(self, op, write, cancel):
+        network = self.network
+        with network.lock:
+            by_type = {}
+            for device in network.devices.values():
+                by_type[device.device_type] = by_type.get(device.device_type, 0) + 1
+            return {
+                "devices": len(network.devices),
+                "devices_by_type": by_type,
+                "links": len(network.links),
+                "packets": network.packets_sent,
+                "clock_ms": network.clock,
+                "seed": network.seed,
+                "routing": network.routing.name if network.routing is not None else None,
+            }, False
@@ -0,0 +1,212 @@
+"""Binary event trace: recording simulation events and replaying them.
+
+A trace file is a 32-byte header followed by fixed-size 28-byte records, one
+per event, in simulation-time order. Fixed-size records make the log cheap
+to append to and let the reader seek to a timestamp with a binary search
+instead of scanning from the start.
+"""
+import bisect
+import mmap
+import struct
+import time
+from collections import namedtuple
+
+MAGIC = b"PTTRACE1"
+HEADER = struct.Struct("<8sIq12x")  # magic, version, seed (signed, like Python ints)
+RECORD = struct.Struct("<dBBHIIIf")  # time_ms, kind, code, index, a, b, c, value
+VERSION = 1
+
+# Event kinds. Fields a, b, c, code, index and value mean:
+EVENT_DEVICE_ADD = 1     # a=device id, code=device type
+EVENT_DEVICE_REMOVE = 2  # a=device id (its links get LINK_REMOVE events first)
+EVENT_LINK_ADD = 3       # a=link id, b/c=device ids, code=cable type
+EVENT_LINK_REMOVE = 4    # a=link id, b/c=device ids
+EVENT_ENQUEUE = 5        # a=source, b=destination, c=packet id, code=protocol, index=1 for a reply
+EVENT_HOP = 6            # a/b=devices of the hop, c=packet id, index=hop number, value=hop delay
+EVENT_DELIVER = 7        # a=source, b=destination, c=packet id, value=one-way delay
+EVENT_ACK = 8            # a=acknowledging device, b=original sender, c=packet id, value=delay
+EVENT_DROP = 9           # a=dropping device, b=destination, c=packet id, index=hop number, value=delay so far
+
+EVENT_NAMES = {
+    EVENT_DEVICE_ADD: "DEVICE_ADD",
+    EVENT_DEVICE_REMOVE: "DEVICE_REMOVE",
+    EVENT_LINK_ADD: "LINK_ADD",
+    EVENT_LINK_REMOVE: "LINK_REMOVE",
+    EVENT_ENQUEUE: "ENQUEUE",
+    EVENT_HOP: "HOP",
+    EVENT_DELIVER: "DELIVER",
+    EVENT_ACK: "ACK",
+    EVENT_DROP: "DROP",
+}
+TOPOLOGY_EVENTS = (EVENT_DEVICE_ADD, EVENT_DEVICE_REMOVE, EVENT_LINK_ADD, EVENT_LINK_REMOVE)
+
+# Packet protocols use their IP protocol numbers
+PROTO_ICMP = 1
+PROTO_TCP = 6
+PROTO_UDP = 17
+PROTOCOL_NAMES = {PROTO_ICMP: "ICMP", PROTO_TCP: "TCP", PROTO_UDP: "UDP"}
+INITIAL_TTL = 64  # Packets are dropped on the hop where this runs out
+
+# Small code tables for the device and cable type strings; unknown types map to 0
+DEVICE_TYPES = ("Other", "PC", "TV", "Phone", "Router", "Switch", "Hub")
+CABLE_TYPES = ("Other", "Copper", "Fiber")
+
+TraceEvent = namedtuple("TraceEvent", "time kind code index a b c value")
+
+
+def type_code(table, name):
+    return table.index(name) if name in table else 0
+
+
+def format_event(event):
+    """One human-readable line for an event."""
+    name = EVENT_NAMES.get(event.kind, f"EVENT_{event.kind}")
+    if event.kind == EVENT_DEVICE_ADD:
+        detail = f"device {event.a} ({DEVICE_TYPES[event.code] if event.code < len(DEVICE_TYPES) else '?'})"
+    elif event.kind == EVENT_DEVICE_REMOVE:
+        detail = f"device {event.a}"
+    elif event.kind in (EVENT_LINK_ADD, EVENT_LINK_REMOVE):
+        detail = f"link {event.a}: {event.b} <-> {event.c}"
+        if event.kind == EVENT_LINK_ADD:
+            detail += f" ({CABLE_TYPES[event.code] if event.code < len(CABLE_TYPES) else '?'})"
+    else:
+        protocol = PROTOCOL_NAMES.get(event.code, str(event.code))
+        detail = f"{protocol} packet {event.c}: {event.a} -> {event.b}"
+        if event.kind == EVENT_HOP:
+            detail += f" hop {event.index + 1}, {event.value:.2f}ms"
+        elif event.kind in (EVENT_DELIVER, EVENT_ACK):
+            detail += f", {event.value:.2f}ms"
+        elif event.kind == EVENT_DROP:
+            detail += f" dropped at hop {event.index + 1} (TTL expired), {event.value:.2f}ms"
+    return f"{event.time:12.3f}ms {name:<13} {detail}"
+
+
+class TraceRecorder:
+    """Append events to a trace file through a buffered writer.
+
+    Attach it with ``network.listeners.append(recorder)``; the network calls
+    ``record`` for every event while holding its lock.
+    """
+
+    def __init__(self, path, seed):
+        """Create the trace file. ValueError if the seed does not fit in 64 bits."""
+        try:
+            header = HEADER.pack(MAGIC, VERSION, seed)
+        except struct.error:
+            raise ValueError(f"seed {seed} does not fit in a trace header (64-bit signed)") from None
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(header)
+        self._pack = RECORD.pack
+        self.count = 0
+
+    def record(self, time_ms, kind, a=0, b=0, c=0, code=0, index=0, value=0.0):
+        self._file.write(self._pack(time_ms, kind, code, index, a, b, c, value))
+        self.count += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class _EventTimes:
+    """Read-only sequence view of the record timestamps, for bisect."""
+
+    def __init__(self, reader):
+        self._reader = reader
+
+    def __len__(self):
+        return len(self._reader)
+
+    def __getitem__(self, index):
+        return RECORD.unpack_from(self._reader._data, HEADER.size + index * RECORD.size)[0]
+
+
+class TraceReader:
+    """Read a trace file and play it back without recomputing anything.
+
+    The file is memory-mapped, so opening and seeking in a large log does
+    not read it all.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a trace file (too short)")
+            magic, version, self.seed = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} trace file")
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Ignore a torn record at the end of a log that is still being written
+        self._count = (len(self._data) - HEADER.size) // RECORD.size
+        self._times = _EventTimes(self)
+
+    def close(self):
+        self._data.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return TraceEvent(*RECORD.unpack_from(self._data, HEADER.size + index * RECORD.size))
+
+    @property
+    def duration(self):
+        return self._times[self._count - 1] if self._count else 0.0
+
+    def seek(self, time_ms):
+        """Index of the first event at or after time_ms (binary search)."""
+        return bisect.bisect_left(self._times, time_ms)
+
+    def events(self, start_ms=0.0, end_ms=None):
+        """Yield the events in [start_ms, end_ms]."""
+        first = self.seek(start_ms)
+        last = self._count if end_ms is None else bisect.bisect_right(self._times, end_ms)
+        offset = HEADER.size + first * RECORD.size
+        end = HEADER.size + last * RECORD.size
+        for fields in RECORD.iter_unpack(memoryview(self._data)[offset:end]):
+            yield TraceEvent(*fields)
+
+    def replay(self, handler, start_ms=0.0, end_ms=None, speed=None):
+        """Pass events to handler in order.
+
+        With ``speed`` None or 0 events are delivered as fast as possible;
+        otherwise playback is paced so that 1 ms of simulation time takes
+        1/speed ms of wall time.
+        """
+        wall_start = time.perf_counter()
+        for event in self.events(start_ms, end_ms):
+            if speed:
+                due = wall_start + (event.time - start_ms) / speed / 1000.0
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            handler(event)
+
+    def topology_at(self, time_ms):
+        """Devices and links that exist just before time_ms.
+
+        Returns ``(devices, links)`` where devices maps id -> type name and
+        links maps link id -> (device id, device id, cable name). Only the
+        topology events before the seek point are applied.
+        """
+        devices = {}
+        links = {}
+        for event in self.events():
+            if event.time >= time_ms:
+                break
+            if event.kind == EVENT_DEVICE_ADD:
+                devices[event.a] = DEVICE_TYPES[event.code] if event.code < len(DEVICE_TYPES) else "Other"
+            elif event.kind == EVENT_DEVICE_REMOVE:
+                devices.pop(event.a, None)
+            elif event.kind == EVENT_LINK_ADD:
+                links[event.a] = (event.b, event.c, CABLE_TYPES[event.code] if event.code < len(CABLE_TYPES) else "Other")
+            elif event.kind == EVENT_LINK_REMOVE:
+                links.pop(event.a, None)
+        return devices, links
@@ -0,0 +1,120 @@
+"""Single points of failure: bridges and articulation points of the topology.
+
+One iterative depth-first search (Tarjan's lowlink method) finds every link
+whose loss splits its component (a bridge) and every device whose loss does
+(an articulation point) in O(V + E). The number of device pairs each one
+disconnects follows from the sizes of the DFS subtrees it cuts off, so no
+per-pair searches are needed. A pair of devices joined by parallel links is
+never a bridge: losing one cable leaves the other.
+"""
+
+
+class FailureReport:
+    """What the failure of each single link or device would disconnect.
+
+    ``bridges`` holds (pairs lost, link, devices on the smaller side) and
+    ``articulation_points`` (pairs lost, device, parts left), both sorted
+    worst first. Pairs lost by a device failure do not count the pairs with
+    the failed device itself.
+    """
+
+    def __init__(self, devices, connected_pairs, components, bridges, articulation_points):
+        self.devices = devices
+        self.connected_pairs = connected_pairs  # Device pairs that can reach each other now
+        self.components = components
+        self.bridges = bridges
+        self.articulation_points = articulation_points
+        self._entries = None
+
+    def entries(self):
+        """Bridges and articulation points together, worst first, as (pairs lost, kind, item, detail)."""
+        if self._entries is None:
+            entries = [(pairs, "link", link, side) for pairs, link, side in self.bridges]
+            entries += [(pairs, "device", device, parts) for pairs, device, parts in self.articulation_points]
+            entries.sort(key=lambda entry: (-entry[0], entry[1], entry[2].id))
+            self._entries = entries
+        return self._entries
+
+    def summary(self):
+        return (f"Single points of failure: {len(self.bridges)} links, {len(self.articulation_points)} devices "
+                f"({self.devices} devices in {self.components} components, {self.connected_pairs} connected pairs).")
+
+
+def describe(entry):
+    """One line for an entry of FailureReport.entries()."""
+    pairs, kind, item, detail = entry
+    if kind == "link":
+        return (f"Link {item.id} ({item.type}) {item.device1.device_type} {item.device1.id} <-> "
+                f"{item.device2.device_type} {item.device2.id}: cuts {pairs} pairs "
+                f"({detail} devices on the smaller side)")
+    return (f"{item.device_type} {item.id} ({item.ip_address}): cuts {pairs} pairs "
+            f"(splits its component into {detail} parts)")
+
+
+def analyze(network):
+    """Compute the FailureReport of a network's current topology (call under its lock)."""
+    adjacency = network.graph.adj
+    discovered = {}  # node -> DFS discovery time
+    low = {}  # node -> lowest discovery time reachable through its subtree and one back edge
+    size = {}  # node -> size of its DFS subtree
+    bridges = []
+    articulation_points = []
+    connected_pairs = 0
+    components = 0
+    clock = 0
+
+    for root in adjacency:
+        if root in discovered:
+            continue
+        components += 1
+        discovered[root] = low[root] = clock
+        clock += 1
+        size[root] = 1
+        cut_off = {}  # node -> sizes of the child subtrees only it connects to the rest
+        component_bridges = []  # (parent, child)
+        stack = [(root, None, iter(adjacency[root]))]
+        while stack:
+            node, parent, neighbours = stack[-1]
+            for neighbour in neighbours:
+                if neighbour == parent:
+                    continue
+                if neighbour in discovered:
+                    if discovered[neighbour] < low[node]:
+                        low[node] = discovered[neighbour]
+                else:
+                    discovered[neighbour] = low[neighbour] = clock
+                    clock += 1
+                    size[neighbour] = 1
+                    stack.append((neighbour, node, iter(adjacency[neighbour])))
+                    break
+            else:
+                stack.pop()
+                if parent is None:
+                    continue
+                size[parent] += size[node]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+                if low[node] >= discovered[parent]:
+                    cut_off.setdefault(parent, []).append(size[node])
+                    if low[node] > discovered[parent]:
+                        component_bridges.append((parent, node))
+
+        total = size[root]
+        connected_pairs += total * (total - 1) // 2
+        for parent, child in component_bridges:
+            link_count = len(network.links.between(network.devices[parent], network.devices[child]))
+            if link_count == 1:
+                side = size[child]
+                bridges.append((side * (total - side), network.graph[parent][child]["link"], min(side, total - side)))
+        for node, parts in cut_off.items():
+            # The rest of the component stays together on the far side of the node's parent
+            parts = parts + [total - 1 - sum(parts)]
+            parts = [part for part in parts if part]
+            if len(parts) > 1:
+                survivors = total - 1
+                lost = (survivors * survivors - sum(part * part for part in parts)) // 2
+                articulation_points.append((lost, network.devices[node], len(parts)))
+
+    bridges.sort(key=lambda bridge: (-bridge[0], bridge[1].id))
+    articulation_points.sort(key=lambda point: (-point[0], point[1].id))
+    return FailureReport(len(adjacency), connected_pairs, components, bridges, articulation_points)
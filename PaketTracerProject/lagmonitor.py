@@ -0,0 +1,175 @@
+"""Watchdog for the Tk event loop: how late it runs, and which callbacks made it late.
+
+A heartbeat scheduled with ``after()`` every HEARTBEAT_MS measures how late
+the loop gets to it. Every Python callback Tk runs (``after`` jobs, event
+bindings, button commands) goes through tkinter's CallWrapper, so while the
+monitor is installed that class is swapped for one that times each call.
+Callbacks slower than the threshold are recorded with the file, line and
+name of the function, and each late heartbeat is blamed on the slowest
+callback since the previous one. The blocking ``root.after(ms)`` form
+(a sleep inside the loop) is timed and recorded at its call site.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+from collections import deque, namedtuple
+
+HEARTBEAT_MS = 100  # Heartbeat interval; its lateness is the loop's lag
+LAG_THRESHOLD_MS = 100  # Callbacks and heartbeats slower than this are recorded
+RECENT_STALLS = 20  # Late heartbeats kept for the 'lag' command
+
+# Per source location: calls over the threshold, their total and worst time
+Offender = namedtuple("Offender", "location count total_ms max_ms")
+Stall = namedtuple("Stall", "wall_time lag_ms culprit")
+
+
+def source_location(func):
+    """'file.py:line Class.method' of a callback, seeing through tkinter's after() trampoline."""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and func.__closure__:
+        cells = dict(zip(code.co_freevars, func.__closure__))
+        if "func" in cells:
+            func = cells["func"].cell_contents
+    while isinstance(func, functools.partial):
+        func = func.func
+    func = getattr(func, "__func__", func)
+    code = getattr(func, "__code__", None)
+    if code is None:
+        # A builtin or a callable object
+        return getattr(func, "__qualname__", type(func).__qualname__)
+    name = getattr(func, "__qualname__", code.co_name).replace(".<locals>", "")
+    return f"{os.path.basename(code.co_filename)}:{code.co_firstlineno} {name}"
+
+
+class LagMonitor:
+    """Measure event-loop lag and record slow callbacks for one Tk root.
+
+    Call ``install`` before creating the widgets whose handlers should be
+    timed; bindings made earlier keep tkinter's plain wrapper. ``offenders``
+    and ``stalls`` may be read from any thread.
+    """
+
+    def __init__(self, root, threshold_ms=LAG_THRESHOLD_MS, heartbeat_ms=HEARTBEAT_MS):
+        self.root = root
+        self.threshold_ms = threshold_ms
+        self.heartbeat_ms = heartbeat_ms
+        self._lock = threading.Lock()
+        self._original_wrapper = None
+        self._original_after = None
+        self._beat_job = None
+        self._beat_command = f"lagmonitor_beat{id(self)}"
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._offenders = {}  # location -> [count, total ms, max ms]
+            self._stalls = deque(maxlen=RECENT_STALLS)
+            self.beats = 0
+            self.stall_count = 0
+            self.last_lag_ms = 0.0
+            self.max_lag_ms = 0.0
+            self._total_lag_ms = 0.0
+        self._slowest = (0.0, None)  # (seconds, callback) since the last heartbeat
+
+    def install(self):
+        if self._original_wrapper is not None:
+            return
+        monitor = self
+        original = self._original_wrapper = tk.CallWrapper
+
+        class TimedCallWrapper(original):
+            def __call__(self, *args):
+                start = time.perf_counter()
+                try:
+                    return original.__call__(self, *args)
+                finally:
+                    monitor._finished(self.func, time.perf_counter() - start)
+
+        tk.CallWrapper = TimedCallWrapper
+        # Shadow the root's after() to catch the blocking after(ms) form
+        self._original_after = self.root.after
+        self.root.after = self._after
+        # The heartbeat is a plain Tcl command, so it is not itself timed as a callback
+        self.root.tk.createcommand(self._beat_command, self._beat)
+        self._schedule_beat()
+
+    def uninstall(self):
+        if self._original_wrapper is None:
+            return
+        tk.CallWrapper = self._original_wrapper
+        self._original_wrapper = None
+        del self.root.after
+        self.root.tk.call("after", "cancel", self._beat_job)
+        self.root.tk.deletecommand(self._beat_command)
+        self._beat_job = None
+
+    def _schedule_beat(self):
+        self._due = time.perf_counter() + self.heartbeat_ms / 1000
+        self._beat_job = self.root.tk.call("after", self.heartbeat_ms, self._beat_command)
+
+    def _after(self, ms, func=None, *args):
+        if func is not None:
+            return self._original_after(ms, func, *args)
+        start = time.perf_counter()
+        self._original_after(ms)
+        caller = sys._getframe(1)
+        location = (f"{os.path.basename(caller.f_code.co_filename)}:{caller.f_lineno} "
+                    f"{caller.f_code.co_name} (blocking after({ms}))")
+        self._record(location, (time.perf_counter() - start) * 1000)
+
+    def _beat(self):
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self._due) * 1000)
+        seconds, culprit = self._slowest
+        self._slowest = (0.0, None)
+        with self._lock:
+            self.beats += 1
+            self.last_lag_ms = lag_ms
+            self._total_lag_ms += lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag_ms >= self.threshold_ms:
+                self.stall_count += 1
+                blame = (f"{source_location(culprit)} ({seconds * 1000:.0f}ms)" if culprit is not None
+                         else "Tk itself (redraw, geometry or untimed handlers)")
+                self._stalls.append(Stall(time.time(), lag_ms, blame))
+        self._schedule_beat()
+
+    def _finished(self, func, seconds):
+        # Fast path: one comparison; the location is only worked out for slow calls
+        if seconds > self._slowest[0]:
+            self._slowest = (seconds, func)
+        if seconds * 1000 >= self.threshold_ms:
+            self._record(source_location(func), seconds * 1000)
+
+    def _record(self, location, ms):
+        with self._lock:
+            entry = self._offenders.get(location)
+            if entry is None:
+                entry = self._offenders[location] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+
+    @property
+    def mean_lag_ms(self):
+        return self._total_lag_ms / self.beats if self.beats else 0.0
+
+    def offenders(self, limit=None):
+        """Recorded slow callbacks, worst single call first."""
+        with self._lock:
+            offenders = [Offender(location, *entry) for location, entry in self._offenders.items()]
+        offenders.sort(key=lambda offender: (-offender.max_ms, offender.location))
+        return offenders[:limit]
+
+    def stalls(self):
+        """The most recent late heartbeats, oldest first."""
+        with self._lock:
+            return list(self._stalls)
+
+    def summary(self):
+        return (f"Event loop lag: now {self.last_lag_ms:.1f}ms, mean {self.mean_lag_ms:.1f}ms, "
+                f"max {self.max_lag_ms:.1f}ms over {self.beats} heartbeats; "
+                f"{self.stall_count} stalls of {self.threshold_ms:g}ms or more.")
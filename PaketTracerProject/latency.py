@@ -0,0 +1,36 @@
+"""Per-link latency model.
+
+A link's delay is worked out once, when it is created, and stored on the
+Link: a fixed per-hop latency for its cable type (switching and
+serialization overhead at the ends), propagation over its length, the time
+to serialize each byte at the cable's bandwidth, and a uniform jitter of a
+fraction of the latency before serialization. Sending a packet over a hop
+then only reads those attributes.
+"""
+from collections import namedtuple
+
+CableProfile = namedtuple("CableProfile", "fixed_ms bandwidth_mbps ms_per_km jitter")
+
+CABLE_PROFILES = {
+    "Copper": CableProfile(50, 100, 0.0052, 0.05),  # ~0.64c in twisted pair
+    "Fiber": CableProfile(10, 1000, 0.0049, 0.05),  # ~0.68c in glass
+}
+DEFAULT_PROFILE = CableProfile(100, 10, 0.0052, 0.05)  # Unknown cable types are slow
+KM_PER_PIXEL = 1.0  # Length of a link drawn on the canvas, per pixel
+
+
+def configure(link, distance_km=0.0):
+    """Set a link's latency attributes from its cable type and length."""
+    profile = CABLE_PROFILES.get(link.type, DEFAULT_PROFILE)
+    link.distance = distance_km
+    link.latency = profile.fixed_ms + profile.ms_per_km * distance_km
+    link.ms_per_byte = 8 / (profile.bandwidth_mbps * 1000)  # Mbit/s -> ms per byte
+    link.jitter = profile.jitter * link.latency
+
+
+def hop_delay(link, size, rng=None):
+    """Delay of one packet of ``size`` bytes over a link; jittered if an RNG is given."""
+    delay = link.latency + size * link.ms_per_byte
+    if rng is not None:
+        delay += rng.uniform(-link.jitter, link.jitter)
+    return delay
@@ -0,0 +1,410 @@
+"""Automatic device placement: force-directed and tree layouts.
+
+Headless and NumPy-only. Positions are (n, 2) float arrays indexed like the
+``ids`` list the caller built them from; edges are (m, 2) arrays of indices
+into it. Both layouts work in abstract units; ``fit`` scales the result onto
+the canvas.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+COARSE_ITERATIONS = 150  # Iterations on the coarsest graph, starting hot
+REFINE_ITERATIONS = 40  # Iterations after each uncoarsening step, starting cool
+COARSEST_SIZE = 50  # Stop coarsening at this many nodes
+NEAR_CELL_SIZE = 2.0  # Nodes per cell (on average) in the finest quadtree level
+CROWDED_CELL = 16  # A finest cell holding more nodes than this makes the quadtree one level deeper
+MAX_DEPTH = 10  # Deepest quadtree level: a 1024 x 1024 grid
+GRAVITY = 0.5  # Pull towards the centre per unit of distance, so components do not drift apart
+
+
+def unique_edges(edges):
+    """Drop self-loops and parallel links: the layout only cares who is connected."""
+    edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+    edges = np.sort(edges[edges[:, 0] != edges[:, 1]], axis=1)
+    return np.unique(edges, axis=0) if len(edges) else edges
+
+
+def coarsen(n, edges, rng):
+    """Merge neighbours into groups; returns (group of each node, group count).
+
+    A random maximal matching pairs nodes up, then every node left over
+    joins the group of a matched neighbour, so the leaves of a star collapse
+    into its centre instead of stalling the coarsening.
+    """
+    group = np.full(n, -1, dtype=np.intp)
+    count = 0
+    for a, b in edges[rng.permutation(len(edges))].tolist():
+        if group[a] < 0 and group[b] < 0:
+            group[a] = group[b] = count
+            count += 1
+    for a, b in edges.tolist():
+        if group[a] < 0 <= group[b]:
+            group[a] = group[b]
+        elif group[b] < 0 <= group[a]:
+            group[b] = group[a]
+    alone = np.flatnonzero(group < 0)
+    group[alone] = np.arange(count, count + len(alone))
+    return group, count + len(alone)
+
+
+class ForceLayout:
+    """Multilevel Fruchterman-Reingold layout, advanced a few iterations at a time.
+
+    The graph is coarsened by merging neighbours until it is small, laid
+    out there from the devices' current positions, then uncoarsened one
+    level at a time with a short, cool refinement at each. Laying out a big
+    graph from scratch at full size gets stuck in tangles; the coarse levels
+    settle the overall shape first.
+
+    Attraction runs along the edges. Repulsion between all pairs is
+    approximated Barnes-Hut style: nodes are binned into a quadtree of grid
+    levels and each node is pushed by the centroids of the cells on its
+    interaction list at each level (the children of its parent cell's
+    neighbours that are not its own neighbours), plus the exact push of the
+    nodes in its neighbouring cells at the finest level. Every other node is
+    counted exactly once, at the coarsest level where it is well separated,
+    so an iteration costs O(n log n) instead of O(n^2). The quadtree is
+    sized for evenly spread nodes and gets a level deeper whenever a finest
+    cell is crowded, so dense clusters do not fall back to exact sums.
+
+    A weak pull towards the centre keeps disconnected parts (isolated
+    devices, separate islands) from being pushed ever further out, which
+    would stretch the grid and crowd the rest of the graph into a few cells.
+    """
+
+    def __init__(self, positions, edges, seed=None):
+        n = len(positions)
+        self.rng = np.random.default_rng(seed)
+
+        # Coarsening levels, finest first: (node count, edges, group of each node)
+        self.levels = []
+        edges = unique_edges(edges)
+        while n > COARSEST_SIZE and len(edges):
+            group, groups = coarsen(n, edges, self.rng)
+            if groups > 0.9 * n:
+                break  # Mostly isolated nodes left: not worth another level
+            self.levels.append((n, edges, group))
+            n, edges = groups, unique_edges(group[edges])
+        self.levels.append((n, edges, None))
+
+        # Start from where the devices are now: each coarse node at the mean
+        # position of what it stands for, rescaled so the ideal edge length
+        # is 1 and the nodes fill a square of side ~sqrt(n)
+        pos = np.array(positions, dtype=float).reshape(-1, 2)
+        for size, _, group in self.levels[:-1]:
+            merged = np.zeros((np.max(group) + 1, 2))
+            np.add.at(merged, group, pos)
+            pos = merged / np.bincount(group)[:, None]
+        if n:
+            pos -= pos.mean(axis=0)
+            spread = np.abs(pos).max()
+            pos = pos / spread * math.sqrt(n) / 2 if spread > 0 else np.zeros_like(pos)
+            # Break ties between devices stacked on the same spot
+            pos += self.rng.uniform(-0.05, 0.05, pos.shape)
+
+        self.level = len(self.levels) - 1
+        self._start_level(pos, COARSE_ITERATIONS, max(math.sqrt(n), 1.0) / 10)
+
+    def _start_level(self, pos, iterations, temperature):
+        n, self.edges, _ = self.levels[self.level]
+        self.pos = pos
+        self.iterations = iterations
+        self.iteration = 0
+        self.start_temperature = temperature
+        self.depth = max(2, math.ceil(math.log(max(n / NEAR_CELL_SIZE, 1), 4)))
+
+    @property
+    def done(self):
+        return self.level == 0 and self.iteration >= self.iterations
+
+    def positions(self):
+        """Current position of every original node (copied from its group while coarse)."""
+        pos = self.pos
+        for _, _, group in reversed(self.levels[:self.level]):
+            pos = pos[group]
+        return pos
+
+    def step(self, count=1):
+        """Run up to ``count`` iterations, moving to the next finer level as each ends."""
+        for _ in range(count):
+            if self.iteration >= self.iterations:
+                if self.level == 0:
+                    break
+                self._refine()
+            # Linear cooling: large moves early, settling at the end
+            temperature = self.start_temperature * (1 - self.iteration / self.iterations)
+            displacement = self._repulsion() + self._attraction() + self._gravity()
+            length = np.hypot(displacement[:, 0], displacement[:, 1])
+            scale = np.minimum(length, temperature) / np.maximum(length, 1e-9)
+            self.pos += displacement * scale[:, None]
+            self.iteration += 1
+        return self.positions()
+
+    def run(self):
+        while not self.done:
+            self.step(10)
+        return self.positions()
+
+    def _refine(self):
+        """Uncoarsen one level: members start around their group's position."""
+        coarse = len(self.pos)
+        self.level -= 1
+        n, _, group = self.levels[self.level]
+        # Keep the ideal edge length at 1 as the node count grows
+        pos = self.pos[group] * math.sqrt(n / coarse)
+        pos += self.rng.uniform(-0.1, 0.1, pos.shape)
+        self._start_level(pos, REFINE_ITERATIONS, 1.0)
+
+    def _gravity(self):
+        """Pull towards the centre, growing with distance."""
+        return (self.pos.mean(axis=0) - self.pos) * GRAVITY
+
+    def _attraction(self):
+        """Pull along each edge with force d^2 (ideal length 1)."""
+        pos, edges = self.pos, self.edges
+        force = np.zeros_like(pos)
+        if not len(edges):
+            return force
+        delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+        pull = delta * np.hypot(delta[:, 0], delta[:, 1])[:, None]
+        n = len(pos)
+        for axis in (0, 1):
+            force[:, axis] -= np.bincount(edges[:, 0], pull[:, axis], n)
+            force[:, axis] += np.bincount(edges[:, 1], pull[:, axis], n)
+        return force
+
+    def _repulsion(self):
+        """Push every pair apart with force 1/d, summed over the quadtree."""
+        pos = self.pos
+        n = len(pos)
+        force = np.zeros_like(pos)
+        if n < 2:
+            return force
+        x, y = pos[:, 0], pos[:, 1]
+        low = pos.min(axis=0)
+        span = max(np.ptp(pos, axis=0).max(), 1e-9) * (1 + 1e-9)
+
+        for level in range(2, self.depth + 1):
+            size = 1 << level
+            # Grids are padded by two empty cells on every side, so looking
+            # up a cell past the edge needs no bounds check
+            stride = size + 4
+            cell = np.minimum(((pos - low) / span * size).astype(np.intp), size - 1)
+            key = (cell[:, 0] + 2) * stride + cell[:, 1] + 2
+            mass = np.bincount(key, minlength=stride * stride).astype(float)
+            safe_mass = np.maximum(mass, 1)
+            cell_x = np.bincount(key, x, stride * stride) / safe_mass
+            cell_y = np.bincount(key, y, stride * stride) / safe_mass
+
+            if level == self.depth:
+                # Finest level: every node on its own, plus the near field
+                parity = (cell[:, 0] & 1) * 2 + (cell[:, 1] & 1)
+                others = key[:, None] + _interaction_keys(stride)[parity]
+                force += self._push(x, y, others, mass[others], cell_x, cell_y)[0]
+                force += self._near_field(x, y, key, mass, stride)
+                if mass.max() > CROWDED_CELL and self.depth < MAX_DEPTH:
+                    self.depth += 1
+                continue
+
+            # Coarser levels: work out the push once per occupied cell, at its
+            # centroid, with a first-order correction for where each node
+            # sits inside the cell. Far cells vary slowly across a cell, so
+            # the correction keeps this as accurate as a per-node sum.
+            occupied = np.flatnonzero(mass)
+            column, row = np.divmod(occupied, stride)
+            parity = (column & 1) * 2 + (row & 1)
+            others = occupied[:, None] + _interaction_keys(stride)[parity]
+            push, gradient = self._push(cell_x[occupied], cell_y[occupied], others, mass[others],
+                                        cell_x, cell_y, gradient=True)
+            slot = np.empty(len(mass), dtype=np.intp)
+            slot[occupied] = np.arange(len(occupied))
+            slot = slot[key]
+            offset_x, offset_y = x - cell_x[key], y - cell_y[key]
+            a, b = gradient[slot, 0], gradient[slot, 1]
+            force[:, 0] += push[slot, 0] + a * offset_x + b * offset_y
+            force[:, 1] += push[slot, 1] + b * offset_x - a * offset_y
+        return force
+
+    @staticmethod
+    def _push(x, y, others, weight, cell_x, cell_y, gradient=False):
+        """Repulsion at the points (x, y) from the centroids of the cells in ``others``.
+
+        With ``gradient`` also returns the field's derivative there, as the
+        two independent entries (a, b) of its Jacobian [[a, b], [b, -a]].
+        """
+        dx = x[:, None] - cell_x[others]
+        dy = y[:, None] - cell_y[others]
+        distance2 = np.maximum(dx * dx + dy * dy, 1e-4)
+        scaled = weight / distance2
+        push = np.column_stack(((dx * scaled).sum(axis=1), (dy * scaled).sum(axis=1)))
+        if not gradient:
+            return push, None
+        scaled /= distance2
+        return push, np.column_stack((((dy * dy - dx * dx) * scaled).sum(axis=1),
+                                      (-2 * dx * dy * scaled).sum(axis=1)))
+
+    @staticmethod
+    def _near_field(x, y, key, mass, stride):
+        """Exact repulsion from every node in the same or a neighbouring finest cell."""
+        n = len(x)
+        order = np.argsort(key, kind="stable")
+        first = np.concatenate(([0], np.cumsum(mass, dtype=np.intp)))[:-1]
+        count = mass.astype(np.intp)
+        around = key[:, None] + np.array([dx * stride + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)])
+        around_first, around_count = first[around], count[around]
+        self_index = np.arange(n)[:, None]
+        force = np.zeros((n, 2))
+        # One pass per member slot; cells rarely hold more than a few nodes
+        for slot in range(int(count.max())):
+            present = around_count > slot
+            if not present.any():
+                break
+            other = order[np.where(present, around_first + slot, 0)]
+            present &= other != self_index
+            dx = x[:, None] - x[other]
+            dy = y[:, None] - y[other]
+            weight = present / np.maximum(dx * dx + dy * dy, 1e-4)
+            force[:, 0] += (dx * weight).sum(axis=1)
+            force[:, 1] += (dy * weight).sum(axis=1)
+        return force
+
+
+_interaction_cache = {}
+
+
+def _interaction_keys(stride):
+    """Key offsets of each cell's interaction list, by the cell's (x, y) parity.
+
+    A cell's list is the children of its parent's 3x3 neighbourhood that are
+    not adjacent to the cell itself: 27 cells, at offsets that only depend
+    on which corner of its parent the cell is in.
+    """
+    if stride not in _interaction_cache:
+        table = []
+        for parity_x in (0, 1):
+            for parity_y in (0, 1):
+                table.append([
+                    (dx - parity_x) * stride + (dy - parity_y)
+                    for dx in range(-2, 4) for dy in range(-2, 4)
+                    if max(abs(dx - parity_x), abs(dy - parity_y)) > 1
+                ])
+        _interaction_cache[stride] = np.array(table, dtype=np.intp)
+    return _interaction_cache[stride]
+
+
+def is_forest(n, edges):
+    """True if the (deduplicated) graph has no cycles."""
+    edges = unique_edges(edges)
+    parent = list(range(n))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in edges:
+        root_a, root_b = find(a), find(b)
+        if root_a == root_b:
+            return False
+        parent[root_a] = root_b
+    return True
+
+
+def tree_layout(n, edges):
+    """Layered layout for a forest: depth on y, subtrees side by side on x.
+
+    Each tree is rooted at its centre (the node left after repeatedly
+    trimming leaves), so a star or a switch with hosts hanging off it ends
+    up with the hub on top. Leaves take consecutive slots and every parent
+    sits centred over its children. Everything is iterative, so long chains
+    do not hit the recursion limit.
+    """
+    neighbours = [[] for _ in range(n)]
+    for a, b in unique_edges(edges):
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+
+    pos = np.zeros((n, 2))
+    seen = [False] * n
+    next_slot = 0.0
+    for start in range(n):
+        if seen[start]:
+            continue
+        root = _tree_centre(start, neighbours, seen)
+
+        # Breadth-first order gives depths and parents; walking it backwards
+        # visits children before parents
+        order, parent, depth = [root], {root: -1}, {root: 0}
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            for other in sorted(neighbours[node]):
+                if other not in parent:
+                    parent[other] = node
+                    depth[other] = depth[node] + 1
+                    order.append(other)
+                    queue.append(other)
+
+        width = dict.fromkeys(order, 0)
+        for node in reversed(order):
+            width[node] = max(width[node], 1)
+            if parent[node] >= 0:
+                width[parent[node]] += width[node]
+
+        # Hand each child a slice of its parent's slots, left to right
+        left = {root: next_slot}
+        for node in order:
+            offset = left[node]
+            for other in sorted(neighbours[node]):
+                if parent.get(other) == node:
+                    left[other] = offset
+                    offset += width[other]
+            pos[node] = (left[node] + (width[node] - 1) / 2, depth[node])
+        next_slot += width[root] + 1  # Gap between trees
+    return pos
+
+
+def _tree_centre(start, neighbours, seen):
+    """Mark start's component as seen and return its centre node."""
+    component = [start]
+    seen[start] = True
+    for node in component:
+        for other in neighbours[node]:
+            if not seen[other]:
+                seen[other] = True
+                component.append(other)
+    if len(component) <= 2:
+        return start
+
+    degree = {node: len(neighbours[node]) for node in component}
+    leaves = [node for node in component if degree[node] <= 1]
+    remaining = len(component)
+    while remaining > 2:
+        remaining -= len(leaves)
+        trimmed = []
+        for leaf in leaves:
+            for other in neighbours[leaf]:
+                degree[other] -= 1
+                if degree[other] == 1:
+                    trimmed.append(other)
+        leaves = trimmed
+    return leaves[0]
+
+
+def fit(positions, width, height, margin=40, keep_aspect=True):
+    """Scale and shift layout positions into a width x height area."""
+    pos = np.array(positions, dtype=float).reshape(-1, 2)
+    if not len(pos):
+        return pos
+    low = pos.min(axis=0)
+    span = np.ptp(pos, axis=0)
+    room = np.array([max(width - 2 * margin, 1), max(height - 2 * margin, 1)], dtype=float)
+    scale = room / np.where(span > 0, span, 1)
+    if keep_aspect:
+        scale[:] = scale.min()
+    # Centre along any axis the layout does not fill
+    offset = margin + (room - span * scale) / 2
+    return (pos - low) * scale + offset
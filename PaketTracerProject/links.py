@@ -0,0 +1,121 @@
+"""Indexed storage for the links (cables) between devices."""
+import latency
+
+
+class Link:
+    """A single cable between two device ports.
+
+    ``packets``, ``bytes`` and ``drops`` count the traffic the packet engine
+    has put on the link (both directions together). ``distance`` (km),
+    ``latency``, ``ms_per_byte`` and ``jitter`` (ms) are its latency model,
+    set by latency.configure.
+    """
+
+    __slots__ = ("id", "device1", "device2", "port1", "port2", "type", "packets", "bytes", "drops",
+                 "distance", "latency", "ms_per_byte", "jitter")
+
+    def __init__(self, link_id, device1, device2, port1, port2, connection_type, distance_km=0.0):
+        self.id = link_id
+        self.device1 = device1
+        self.device2 = device2
+        self.port1 = port1
+        self.port2 = port2
+        self.type = connection_type
+        self.packets = 0
+        self.bytes = 0
+        self.drops = 0
+        latency.configure(self, distance_km)
+
+    def other(self, device):
+        """Return the device at the opposite end of the link."""
+        return self.device2 if device is self.device1 else self.device1
+
+    def port_of(self, device):
+        """Return the port this link occupies on the given device."""
+        return self.port1 if device is self.device1 else self.port2
+
+    def __repr__(self):
+        return (f"Link({self.id}: {self.device1.id}:{self.port1} <-> "
+                f"{self.device2.id}:{self.port2}, {self.type})")
+
+
+class LinkStore:
+    """All links of a topology, indexed by id, device pair and device.
+
+    Links get stable integer ids. Lookups by pair and by device are dict/set
+    operations, so removing a device only touches its own links, and several
+    parallel links between the same two devices are kept apart.
+    """
+
+    def __init__(self):
+        self._links = {}      # link id -> Link
+        self._by_pair = {}    # (low device id, high device id) -> {link id: Link}
+        self._by_device = {}  # device id -> set of link ids
+        self._next_id = 1
+
+    @staticmethod
+    def _pair(device1, device2):
+        a, b = device1.id, device2.id
+        return (a, b) if a <= b else (b, a)
+
+    def add(self, device1, device2, port1, port2, connection_type, distance_km=0.0):
+        """Create and index a new link, returning it."""
+        link = Link(self._next_id, device1, device2, port1, port2, connection_type, distance_km)
+        self._next_id += 1
+        self._links[link.id] = link
+        self._by_pair.setdefault(self._pair(device1, device2), {})[link.id] = link
+        self._by_device.setdefault(device1.id, set()).add(link.id)
+        self._by_device.setdefault(device2.id, set()).add(link.id)
+        return link
+
+    def remove(self, link):
+        """Drop a link from every index. Removing an unknown link is a no-op."""
+        if self._links.pop(link.id, None) is None:
+            return False
+        pair = self._pair(link.device1, link.device2)
+        pair_links = self._by_pair[pair]
+        del pair_links[link.id]
+        if not pair_links:
+            del self._by_pair[pair]
+        for device in (link.device1, link.device2):
+            incident = self._by_device.get(device.id)
+            if incident is not None:
+                incident.discard(link.id)
+                if not incident:
+                    del self._by_device[device.id]
+        return True
+
+    def remove_device(self, device):
+        """Remove every link touching a device and return them."""
+        removed = [self._links[link_id] for link_id in self._by_device.get(device.id, ())]
+        for link in removed:
+            self.remove(link)
+        return removed
+
+    def get(self, link_id):
+        return self._links.get(link_id)
+
+    def between(self, device1, device2):
+        """Return the links between two devices, oldest first."""
+        return list(self._by_pair.get(self._pair(device1, device2), {}).values())
+
+    def first_between(self, device1, device2):
+        """Return the oldest link between two devices, or None."""
+        pair_links = self._by_pair.get(self._pair(device1, device2))
+        return next(iter(pair_links.values())) if pair_links else None
+
+    def of_device(self, device):
+        """Return the links attached to a device."""
+        return [self._links[link_id] for link_id in self._by_device.get(device.id, ())]
+
+    def degree(self, device):
+        return len(self._by_device.get(device.id, ()))
+
+    def __iter__(self):
+        return iter(self._links.values())
+
+    def __len__(self):
+        return len(self._links)
+
+    def __contains__(self, link):
+        return link.id in self._links
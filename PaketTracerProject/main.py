@@ -2,28 +2,58 @@ import time
 from PIL import Image, ImageTk
 import tkinter as tk
 from tkinter import ttk, messagebox
-import random
-import re
+import threading
 import networkx as nx
-from queue import Queue
+from queue import Queue, Empty, Full
 from pyreadline3.console import event
+from network import Network
+from commands import CommandInterpreter
+from search import device_label
+from widgets import DevicePicker
+from control import ControlServer
+from latency import KM_PER_PIXEL
+from lagmonitor import LagMonitor
+from animations import AnimationTracker
+
+TERMINAL_MAX_LINES = 5000  # Older terminal lines are dropped beyond this
+TERMINAL_POLL_MS = 50  # How often the Tk loop drains output from background commands
+TERMINAL_QUEUE_SIZE = 20000  # Pending output lines before a background command waits for the UI
+LAYOUT_FRAME_MS = 33  # Auto layout animation frame interval (~30 fps)
+LAYOUT_EASING = 0.25  # Fraction of the remaining distance devices move per frame
+LAYOUT_STEPS_PER_UPDATE = 5  # Force layout iterations between published positions
+HEATMAP_REFRESH_MS = 250  # Utilization overlay redraw interval, however fast packets flow
+HEATMAP_DECAY = 0.6  # Share of a link's recent load carried over to the next refresh
+HEATMAP_COLORS = ("#2e7d32", "#9e9d24", "#f9a825", "#ef6c00", "#c62828")  # Quiet to busiest
+HEATMAP_WIDTHS = (3, 4, 5, 7, 9)
+FAILURES_VIEW_ROWS = 200  # Worst single points of failure listed in the Failures tab
 
 class NetworkSimulator:
     def __init__(self, root):
         self.root = root
         self.root.title("Network Simulator")
         self.root.geometry("1000x700")  # Increased window height for terminal
+        # Installed before any widget exists, so every handler bound below is timed
+        self.lag_monitor = LagMonitor(self.root)
+        self.lag_monitor.install()
         self.is_transmitting = False  # Add this in the class initialization
-        # Initialize devices BEFORE setup
-        self.devices = {}
-        self.connections = []
-        self.network_graph = nx.Graph()
+        # Initialize devices BEFORE setup. The simulation state lives in the
+        # headless Network; the simulator only adds the canvas views on top.
+        self.network = Network()
+        self.devices = self.network.devices
+        self.connections = self.network.links
+        self.network_graph = self.network.graph
+        self.views = {}  # device id -> DeviceView, for devices drawn on the canvas
+        self.link_lines = {}  # link id -> canvas line item
         self.current_connection_type = None
         self.connection_start_device = None
         self.selected_device = None
         self.delete_mode = False
         self.delete_connection_mode = False
         self.packet_queue = Queue()  # Queue for managing packet transmissions
+        self.layout_state = None  # The running auto layout, if any
+        self.control = None  # Control socket server, see start_control
+        self.views_stale = threading.Event()  # Set while a view sync is queued
+        self.heatmap = None  # link id -> [bytes seen, load, drawn level] while shown
         # Main frame
         self.main_frame = ttk.Frame(self.root)
         self.main_frame.pack(fill="both", expand=True)
@@ -32,6 +62,9 @@ class NetworkSimulator:
         self.canvas = tk.Canvas(self.main_frame, bg="white", width=700, height=500)
         self.canvas.pack(side="left", fill="both", expand=True)
         self.canvas.bind("<Button-1>", self.on_canvas_click)
+        self.animations = AnimationTracker(self.root, self.canvas)  # Timers and items of packet animations
+        self.transmission = None  # Animation of the packet being sent
+        self.lingering_packet = None  # Animation of the last delivered packet, while its oval is shown
 
         # Frame for controls
         self.device_frame = ttk.Frame(self.main_frame, padding="5", width=480)  # Adjust width as needed
@@ -44,6 +77,18 @@ class NetworkSimulator:
         self.terminal_frame.pack(fill="x", side="bottom")
         self.setup_terminal()
 
+        # Terminal commands run one at a time on a worker thread. Their output
+        # (and any packet animations they start) comes back through
+        # terminal_queue, which the Tk loop drains every TERMINAL_POLL_MS.
+        self.terminal_queue = Queue(maxsize=TERMINAL_QUEUE_SIZE)
+        self.command_jobs = Queue()
+        self.command_cancel = threading.Event()
+        self.command_running = False
+        self.interpreter = CommandInterpreter(self.network, self._post_output, self._post_send_packet,
+                                              lag_monitor=self.lag_monitor, leak_audit=self._post_leak_audit)
+        threading.Thread(target=self._command_worker, daemon=True).start()
+        self.root.after(TERMINAL_POLL_MS, self._drain_terminal_queue)
+
     def setup_terminal(self):
         # Terminal text area
         self.terminal_text = tk.Text(self.terminal_frame, height=10, bg="black", fg="white")
@@ -55,142 +100,128 @@ class NetworkSimulator:
         self.terminal_entry = ttk.Entry(self.terminal_frame)
         self.terminal_entry.pack(fill="x")
         self.terminal_entry.bind("<Return>", self.handle_terminal_command)
+        self.terminal_entry.bind("<Control-c>", self.cancel_terminal_command)
 
     def handle_terminal_command(self, event):
         """Process terminal commands entered by the user."""
         command = self.terminal_entry.get().strip()
         self.terminal_entry.delete(0, tk.END)
-
-        # Convert command to lowercase for case-insensitive comparison
-        normalized_command = command.lower()
-
-        if normalized_command == "help":
-            self.write_to_terminal(
-                "Available commands:\n- Ping <source_ip> <destination_ip>\n- Show Devices\n- SendPacket <source_ip> <destination_ip> TCP/UDP")
-        elif normalized_command == "show devices":
-            self.show_devices()
-        elif normalized_command.startswith("ping "):  # Ensure a space follows 'ping'
-            self.execute_ping(command)
-        elif normalized_command.startswith("sendpacket "):  # Ensure a space follows 'sendpacket'
-            self.execute_send_packet(command)
+        self.run_terminal_command(command)
+
+    def run_terminal_command(self, command):
+        """Queue a command for the background worker."""
+        self.command_jobs.put(command)
+
+    def cancel_terminal_command(self, event=None):
+        """Ctrl+C: cancel the running command, otherwise let the entry copy text."""
+        if not self.command_running:
+            return None
+        self.command_cancel.set()
+        return "break"
+
+    def _command_worker(self):
+        """Worker thread: run queued commands in order."""
+        while True:
+            command = self.command_jobs.get()
+            self.command_cancel.clear()
+            self.command_running = True
+            try:
+                self.interpreter.execute(command, self.command_cancel)
+            except Exception as e:
+                self.terminal_queue.put(f"Error executing command: {str(e)}")
+            finally:
+                self.command_running = False
+                if self.command_cancel.is_set():
+                    self.terminal_queue.put("^C")
+
+    def _post_output(self, item):
+        """Called on the worker thread. Blocks while the UI is behind, unless cancelled."""
+        while not self.command_cancel.is_set():
+            try:
+                self.terminal_queue.put(item, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def _post_send_packet(self, protocol, path, src_device, dest_device):
+        """Called on the worker thread; the animation itself must run on the Tk thread."""
+        self._post_output(lambda: self._animate_send(protocol, path, src_device, dest_device))
+
+    def _post_leak_audit(self):
+        """Called on the worker thread; the audit reads Tk state, so it runs on the Tk thread."""
+        self._post_output(self.report_leaks)
+
+    def report_leaks(self):
+        """Write the live animation, timer and canvas item counts to the terminal.
+
+        Canvas items that belong to no device, link, packet or highlight are
+        counted as unaccounted for; in a steady session that stays at zero.
+        """
+        tracker = self.animations
+        timers = len(self.root.tk.splitlist(self.root.tk.call("after", "info")))
+        items = len(self.canvas.find_all())
+        device_items = 2 * len(self.views)  # Shape and label
+        known = device_items + len(self.link_lines) + tracker.item_count + (self.failure_highlight is not None)
+        self.write_to_terminal("\n".join([
+            f"Animations: {len(tracker.animations)} live ({tracker.started} started, {tracker.finished} finished, "
+            f"{tracker.cancelled} cancelled), {self.packet_queue.qsize()} packets queued.",
+            f"Timers: {timers} pending in Tk, {tracker.pending_jobs} of them owned by animations.",
+            f"Canvas items: {items} ({device_items} devices, {len(self.link_lines)} links, "
+            f"{tracker.item_count} packets, {items - known} unaccounted for).",
+        ]))
+
+    def _animate_send(self, protocol, path, src_device, dest_device):
+        # Devices may have been removed while the command was running
+        if any(device_id not in self.views for device_id in path):
+            self.write_to_terminal("SendPacket aborted: the path changed before the packet was sent.")
+            return
+        if protocol == "TCP":
+            self.simulate_tcp_packet(path, src_device, dest_device)
         else:
-            self.write_to_terminal("Unknown command. Type 'help' for a list of commands.\n")
+            self.simulate_packet(path, src_device, dest_device)
+
+    def _drain_terminal_queue(self):
+        """Move pending output from background commands into the terminal."""
+        lines = []
+        # Bounded per tick so a flood of output cannot starve the event loop
+        for _ in range(1000):
+            try:
+                item = self.terminal_queue.get_nowait()
+            except Empty:
+                break
+            if callable(item):
+                if lines:
+                    self.write_to_terminal("\n".join(lines))
+                    lines = []
+                item()
+            else:
+                lines.append(item)
+        if lines:
+            self.write_to_terminal("\n".join(lines))
+        self.root.after(TERMINAL_POLL_MS, self._drain_terminal_queue)
 
     def write_to_terminal(self, message):
         self.terminal_text.configure(state="normal")
         self.terminal_text.insert("end", message + "\n")
+        # Keep the scrollback bounded for long-running commands
+        line_count = int(self.terminal_text.index("end-1c").split(".")[0])
+        if line_count > TERMINAL_MAX_LINES:
+            self.terminal_text.delete("1.0", f"{line_count - TERMINAL_MAX_LINES}.0")
         self.terminal_text.see("end")  # Scroll to the bottom
         self.terminal_text.configure(state="disabled")
 
-    def execute_ping(self, command):
-        """Handle the 'ping' command to simulate packet transmission."""
-        try:
-            parts = command.strip().split()
-            if len(parts) != 3 or parts[0].lower() != "ping":
-                self.write_to_terminal("Invalid command. Use: ping <source_ip> <destination_ip>")
-                return
-
-            ip1, ip2 = parts[1], parts[2]
-            available_ips = {device.ip_address: device for device in self.devices.values()}
-
-            if ip1 not in available_ips or ip2 not in available_ips:
-                self.write_to_terminal("Error: One or both IPs not found in the network.")
-                return
-
-            src_device = available_ips[ip1]
-            dest_device = available_ips[ip2]
-
-            if nx.has_path(self.network_graph, src_device.id, dest_device.id):
-                path = nx.shortest_path(self.network_graph, src_device.id, dest_device.id)
-                hops = len(path) - 1  # Calculate hops (edges in the path)
-                ttl = 64  # Initial TTL value
-
-                self.write_to_terminal(f"Pinging {ip2} from {ip1} with 4 packets:")
-
-                for packet_num in range(4):
-                    total_delay = 0
-                    for i in range(hops):
-                        device1 = self.devices[path[i]]
-                        device2 = self.devices[path[i + 1]]
-                        edge_data = self.network_graph.get_edge_data(device1.id, device2.id)
-                        connection_type = edge_data.get("type", "Copper")
-                        # Calculate a slightly varied delay per hop for this packet
-                        delay_per_hop = self.get_deterministic_delay(connection_type, variation=True)
-                        total_delay += delay_per_hop
-
-                    adjusted_ttl = ttl - hops  # Adjust TTL based on hops
-                    if adjusted_ttl > 0:
-                        self.write_to_terminal(
-                            f"Reply from {ip2}: TTL={adjusted_ttl}, Delay={total_delay:.2f}ms (Packet {packet_num + 1})"
-                        )
-                    else:
-                        self.write_to_terminal(f"Request timed out (TTL expired).")
-            else:
-                self.write_to_terminal(f"Ping failed: {ip2} is unreachable from {ip1}.")
-
-        except Exception as e:
-            self.write_to_terminal(f"Error executing ping: {str(e)}")
-
-    def get_deterministic_delay(self, connection_type, variation=False):
-        """Return a delay based on the cable type with optional slight variation."""
-        cable_delays = {
-            "Copper": 50,  # Base delay in milliseconds for copper cable
-            "Fiber": 10,  # Base delay in milliseconds for fiber cable
-        }
-        base_delay = cable_delays.get(connection_type, 100)  # Default to a higher delay for unknown cable types
-
-        if variation:
-            # Introduce slight variation: Â±5% of base delay
-            variation_percentage = 0.05
-            min_delay = base_delay * (1 - variation_percentage)
-            max_delay = base_delay * (1 + variation_percentage)
-            return random.uniform(min_delay, max_delay)
-
-        return base_delay
-
-    def execute_send_packet(self, command):
-        """Handle the 'SendPacket' command to simulate TCP/UDP packet transmission with animation."""
-        try:
-            parts = command.strip().split()
-            if len(parts) != 4 or parts[0].lower() != "sendpacket":
-                self.write_to_terminal("Invalid command. Use: SendPacket <source_ip> <destination_ip> TCP/UDP")
-                return
-
-            ip1, ip2, protocol = parts[1], parts[2], parts[3].upper()
-            if protocol not in ("TCP", "UDP"):
-                self.write_to_terminal("Invalid protocol. Use either TCP or UDP.")
-                return
-
-            available_ips = {device.ip_address: device for device in self.devices.values()}
-
-            if ip1 not in available_ips or ip2 not in available_ips:
-                self.write_to_terminal("Error: One or both IPs not found in the network.")
-                return
-
-            src_device = available_ips[ip1]
-            dest_device = available_ips[ip2]
-
-            if not nx.has_path(self.network_graph, src_device.id, dest_device.id):
-                self.write_to_terminal(f"SendPacket failed: {ip2} is unreachable from {ip1}.")
-                return
-
-            path = nx.shortest_path(self.network_graph, src_device.id, dest_device.id)
-            self.write_to_terminal(f"Sending {protocol} packet from {ip1} to {ip2}...")
-
-            if protocol == "TCP":
-                self.simulate_tcp_packet(path, src_device, dest_device)
-            elif protocol == "UDP":
-                self.simulate_packet(path, src_device, dest_device)
-
-        except Exception as e:
-            self.write_to_terminal(f"Error executing SendPacket: {str(e)}")
-
     def simulate_tcp_packet(self, path, src_device, dest_device):
         """Simulate TCP packet traveling from source to destination and back."""
         self.write_to_terminal(f"TCP packet sent from {src_device.ip_address} to {dest_device.ip_address}...")
 
+        # The wait for the acknowledgment is an animation of its own, so it is
+        # dropped if a device on the path is removed in the meantime
+        waiting = self.animations.start(path, on_cancel=lambda animation: self.write_to_terminal(
+            f"TCP acknowledgment from {dest_device.ip_address} lost: a device or link on the path was removed."))
+
         def return_packet():
             """Animate the packet's return to the source."""
+            waiting.finish()
             reversed_path = path[::-1]  # Reverse the path for return
             self.write_to_terminal(
                 f"TCP acknowledgment sent from {dest_device.ip_address} to {src_device.ip_address}...")
@@ -200,54 +231,11 @@ class NetworkSimulator:
         self.simulate_packet(path, src_device, dest_device)
 
         # Schedule the return animation
-        self.root.after(len(path) * 1000, return_packet)
-
-    def simulate_packet(self, path, src_device, dest_device, acknowledge=False):
-        """Simulate packet transmission step-by-step along the path."""
-        self.packet_queue.put((path, src_device, dest_device, acknowledge))
-        if not self.is_transmitting:
-            self._process_packet_queue()
-
-    def _process_packet_queue(self):
-        """Process the next packet in the queue."""
-        if self.packet_queue.empty():
-            return  # Nothing to process
-
-        self.is_transmitting = True
-        self._disable_device_dragging()
-
-        # Clean up any lingering packet representation
-        if hasattr(self, "active_packet") and self.active_packet is not None:
-            self._delete_active_packet()
-
-        # Get the next packet details
-        path, src_device, dest_device, acknowledge = self.packet_queue.get()
-
-        def move_along_path(segment_index):
-            if segment_index < len(path) - 1:
-                device1 = self.devices[path[segment_index]]
-                device2 = self.devices[path[segment_index + 1]]
-
-                is_final = (segment_index == len(path) - 2)
-
-                self.animate_packet(device1, device2, is_final=is_final)
-
-                self.root.after(1000, lambda: move_along_path(segment_index + 1))  # Delay for each segment
-            else:
-                if acknowledge:
-                    # For TCP, reverse the path for acknowledgment
-                    reversed_path = path[::-1]
-                    self.simulate_packet(reversed_path, dest_device, src_device, acknowledge=False)
-                else:
-                    self.is_transmitting = False
-                    self._enable_device_dragging()
-                    self._process_packet_queue()
-
-        move_along_path(0)
+        waiting.after(len(path) * 1000, return_packet)
 
     def simulate_udp_packet(self, dest_device):
         """Simulate UDP packet transmission."""
-        delay = random.uniform(10, 100)  # Simulate delay in milliseconds
+        delay = self.network.rng_delay.uniform(10, 100)  # Simulate delay in milliseconds
         self.write_to_terminal(f"UDP packet sent to {dest_device.ip_address}. Delay={delay:.2f}ms")
 
     def simulate_packet(self, path, src_device, dest_device, acknowledge=False):
@@ -258,19 +246,29 @@ class NetworkSimulator:
 
     def _process_packet_queue(self):
         """Process the next packet in the queue."""
-        if self.packet_queue.empty():
-            return  # Nothing to process
+        while True:
+            if self.packet_queue.empty():
+                return  # Nothing to process
+            # Get the next packet details
+            path, src_device, dest_device, acknowledge = self.packet_queue.get()
+            # Devices may have been removed while the packet waited its turn
+            if all(device_id in self.views for device_id in path):
+                break
+            self.write_to_terminal(
+                f"Packet from {src_device.ip_address} dropped: a device on its path was removed.")
 
         self.is_transmitting = True
         self._disable_device_dragging()
 
         # Clean up any lingering packet representation
-        if hasattr(self, "active_packet") and self.active_packet is not None:
-            self._delete_active_packet()
-
-        # Get the next packet details
-        path, src_device, dest_device, acknowledge = self.packet_queue.get()
-
+        if self.lingering_packet is not None:
+            self.lingering_packet.finish()
+            self.lingering_packet = None
+
+        # The packet's timers and oval belong to its animation, which is
+        # cancelled if a device or link on the path is removed mid-flight
+        animation = self.animations.start(path, on_cancel=self._transmission_cancelled)
+        self.transmission = animation
         animation_time_per_segment = 1000
 
         def move_to_next_segment(segment_index, reverse=False):
@@ -280,93 +278,71 @@ class NetworkSimulator:
                 device2 = self.devices[path[segment_index + 1]]
 
                 is_final = (segment_index == len(path) - 2)
-                self.animate_packet(device1, device2, is_final=is_final and not reverse)
+                self.animate_packet(animation, device1, device2, is_final=is_final and not reverse)
 
-                self.root.after(
-                    animation_time_per_segment,
-                    lambda: move_to_next_segment(segment_index + 1, reverse)
-                )
+                animation.after(animation_time_per_segment, move_to_next_segment, segment_index + 1, reverse)
             elif acknowledge and not reverse:
-                # For TCP, reverse the path for acknowledgment
-                reversed_path = path[::-1]
+                # For TCP, run the path again for the acknowledgment
                 move_to_next_segment(0, reverse=True)
             elif reverse:
                 # Once acknowledgment completes
                 self.write_to_terminal(f"Acknowledgment received by {src_device.ip_address}.")
-                self.is_transmitting = False
-                self._enable_device_dragging()
-
-                # Resume processing the main queue
-                self._process_packet_queue()
+                self._transmission_done(animation)
             else:
                 # For UDP, just finish
-                self.is_transmitting = False
-                self._enable_device_dragging()
-                self._process_packet_queue()
+                self._transmission_done(animation)
 
         move_to_next_segment(0)
 
-
-    def _process_acknowledgment(self, path, src_device, dest_device):
-        """Directly process the acknowledgment transmission."""
-        self.is_transmitting = True  # Lock the system for acknowledgment
-        self._disable_device_dragging()
-
-        animation_time_per_segment = 1000
-
-        def move_to_next_segment(segment_index):
-            """Handle movement for the current segment, then move to the next."""
-            if segment_index < len(path) - 1:
-                device1 = self.devices[path[segment_index]]
-                device2 = self.devices[path[segment_index + 1]]
-
-                is_final = (segment_index == len(path) - 2)
-                self.animate_packet(device1, device2, is_final=is_final)
-
-                self.root.after(animation_time_per_segment, lambda: move_to_next_segment(segment_index + 1))
-            else:
-                # Once acknowledgment completes
-                self.write_to_terminal(f"Acknowledgment received by {dest_device.ip_address}.")
-                self.is_transmitting = False
-                self._enable_device_dragging()
-
-                # Resume processing the main queue
-                self._process_packet_queue()
-
-        move_to_next_segment(0)
+    def _transmission_done(self, animation):
+        """The packet arrived: its oval lingers until its timer runs out or the next packet starts."""
+        self.transmission = None
+        if animation.items:
+            self.lingering_packet = animation
+        else:
+            animation.finish()
+        self.is_transmitting = False
+        self._enable_device_dragging()
+
+        # Resume processing the main queue
+        self._process_packet_queue()
+
+    def _transmission_cancelled(self, animation):
+        """A device or link on a packet's path was removed; its timers and oval are already gone."""
+        if animation is self.lingering_packet:
+            self.lingering_packet = None
+        if animation is not self.transmission:
+            return
+        self.transmission = None
+        self.write_to_terminal("Packet dropped: a device or link on its path was removed.")
+        self.is_transmitting = False
+        self._enable_device_dragging()
+        self._process_packet_queue()
 
     def _disable_device_dragging(self):
         """Disable dragging for all devices."""
-        for device in self.devices.values():
-            self.canvas.tag_unbind(device.shape_id, "<B1-Motion>")
-            self.canvas.tag_unbind(device.text_id, "<B1-Motion>")
+        for view in self.views.values():
+            self.canvas.tag_unbind(view.shape_id, "<B1-Motion>")
+            self.canvas.tag_unbind(view.text_id, "<B1-Motion>")
         self.write_to_terminal("Device dragging disabled during transmission.")
 
     def _enable_device_dragging(self):
         """Re-enable dragging for all devices."""
-        for device in self.devices.values():
-            self.canvas.tag_bind(device.shape_id, "<B1-Motion>", device.on_device_drag)
-            self.canvas.tag_bind(device.text_id, "<B1-Motion>", device.on_device_drag)
+        for view in self.views.values():
+            self.canvas.tag_bind(view.shape_id, "<B1-Motion>", view.on_device_drag)
+            self.canvas.tag_bind(view.text_id, "<B1-Motion>", view.on_device_drag)
         self.write_to_terminal("Device dragging re-enabled.")
 
-    def get_connection_delay(self, connection_type):
-        """Return delay based on connection type."""
-        if connection_type == "Copper":
-            return random.randint(10, 50)
-        elif connection_type == "Fiber":
-            return random.randint(1, 10)
-        return random.randint(50, 100)
-
-    def animate_packet(self, device1, device2, is_final=False):
+    def animate_packet(self, animation, device1, device2, is_final=False):
         """Smoothly animate a packet moving along the connection line between two devices."""
         x1, y1 = self.get_device_center(device1)
         x2, y2 = self.get_device_center(device2)
 
         # Create the packet representation if it doesn't exist
-        if not hasattr(self, "active_packet") or self.active_packet is None:
-            self.active_packet = self.canvas.create_oval(x1 - 5, y1 - 5, x1 + 5, y1 + 5, fill="red")
+        if animation.packet is None:
+            animation.packet = animation.create("oval", x1 - 5, y1 - 5, x1 + 5, y1 + 5, fill="red")
         else:
-            self.canvas.coords(self.active_packet, x1 - 5, y1 - 5, x1 + 5, y1 + 5)
+            self.canvas.coords(animation.packet, x1 - 5, y1 - 5, x1 + 5, y1 + 5)
 
         # Define the number of steps for smooth movement
         steps = 50  # Adjust for smoothness
@@ -379,43 +355,41 @@ class NetworkSimulator:
             current_y = y1 + (y2 - y1) * progress
 
             self.canvas.coords(
-                self.active_packet, current_x - 5, current_y - 5, current_x + 5, current_y + 5
+                animation.packet, current_x - 5, current_y - 5, current_x + 5, current_y + 5
             )
 
             if step < steps:
-                self.root.after(interval, lambda: move_step(step + 1))
+                animation.after(interval, move_step, step + 1)
             else:
                 # Once the packet reaches the destination:
                 if is_final:
                     # Turn the packet green if it's the final destination
-                    self.canvas.itemconfig(self.active_packet, fill="green")
+                    self.canvas.itemconfig(animation.packet, fill="green")
                     # Delete the packet after a short delay
-                    self.root.after(2500, lambda: self._delete_active_packet())
+                    animation.after(2500, self._expire_packet, animation)
 
         # Start the animation
         move_step(0)
 
-    def _delete_active_packet(self):
-        """Delete the active packet and clear its reference."""
-        if self.active_packet is not None:
-            self.canvas.delete(self.active_packet)
-            self.active_packet = None
+    def _expire_packet(self, animation):
+        """Delete a delivered packet's oval; the animation ends with it unless it is still moving."""
+        if animation is self.transmission:
+            animation.delete(animation.packet)
+            animation.packet = None
+        else:
+            if animation is self.lingering_packet:
+                self.lingering_packet = None
+            animation.finish()
 
     def simulate_broadcast(self, hub_device):
         """Simulate broadcast behavior for hubs."""
         neighbors = list(self.network_graph.neighbors(hub_device.id))
         for neighbor_id in neighbors:
             neighbor_device = self.devices[neighbor_id]
-            self.animate_packet(hub_device, neighbor_device)
-            delay = self.get_connection_delay(self.network_graph.get_edge_data(hub_device.id, neighbor_id)["type"])
-            self.root.after(delay)
-
-    def show_devices(self):
-        if not self.devices:
-            self.write_to_terminal("No devices found in the network.")
-            return
-        for device in self.devices.values():
-            self.write_to_terminal(f"{device.device_type} (ID: {device.id}) - IP: {device.ip_address}")
+            animation = self.animations.start((hub_device.id, neighbor_id))
+            self.animate_packet(animation, hub_device, neighbor_device, is_final=True)
+            delay = self.network_graph[hub_device.id][neighbor_id]["link"].latency
+            self.root.after(int(delay))
 
     def setup_sidebar(self):
         notebook = ttk.Notebook(self.device_frame)
@@ -427,13 +401,16 @@ class NetworkSimulator:
         connections_frame = ttk.Frame(notebook)
         device_config_frame = ttk.Frame(notebook)
         ping_frame = ttk.Frame(notebook)
+        failures_frame = ttk.Frame(notebook)
 
         notebook.add(network_devices_frame, text="Network Devices")
         notebook.add(end_devices_frame, text="End Devices")
         notebook.add(connections_frame, text="Connections")
         notebook.add(device_config_frame, text="Device Configuration")
         notebook.add(ping_frame, text="Pinging")
+        notebook.add(failures_frame, text="Failures")
         self.setup_pinging_tab(ping_frame)
+        self.setup_failures_tab(failures_frame)
         style = ttk.Style()
         style.configure('TNotebook.Tab', padding=(5, 5))
         # Network Devices
@@ -469,6 +446,15 @@ class NetworkSimulator:
             fill="x", padx=5, pady=2
         )
 
+        # Arrange the whole topology
+        ttk.Separator(connections_frame).pack(fill="x", padx=5, pady=8)
+        ttk.Button(connections_frame, text="Auto Layout", command=self.auto_layout).pack(
+            fill="x", padx=5, pady=2
+        )
+        self.heatmap_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(connections_frame, text="Utilization Heatmap", variable=self.heatmap_var,
+                        command=self.toggle_heatmap).pack(fill="x", padx=5, pady=2)
+
         # Device Configuration Tab
         self.setup_device_config_tab(device_config_frame)
 
@@ -488,14 +474,14 @@ class NetworkSimulator:
         """Handle clicks on the canvas for connection deletion."""
 
         if self.delete_connection_mode:
-            result = self.detect_connection(event.x, event.y)
-            if result:
-                line, d1, d2, port1, port2 = result
+            link = self.detect_connection(event.x, event.y)
+            if link:
+                d1, d2 = link.device1, link.device2
                 confirm = messagebox.askyesno("Delete Connection",
                                               f"Are you sure you want to delete the connection between {d1.device_type} "
                                               f"and {d2.device_type}?")
                 if confirm:
-                    self.delete_connection_between_devices(d1, d2)
+                    self.delete_connection_between_devices(d1, d2, link)
             else:
                 messagebox.showwarning("Delete Connection", "No connection found near the clicked area.")
             return
@@ -505,29 +491,14 @@ class NetworkSimulator:
         self.connection_delete_start = None
         messagebox.showinfo("Delete Mode", "Delete mode cancelled.")
 
-    def delete_connection_between_devices(self, device1, device2):
-        # Find the connection to delete
-        connection_to_remove = None
-        for line, d1, d2, port1, port2 in self.connections:
-            if (d1 == device1 and d2 == device2) or (d1 == device2 and d2 == device1):
-                connection_to_remove = (line, d1, d2, port1, port2)
-                break
-
-        if connection_to_remove:
-            line, d1, d2, port1, port2 = connection_to_remove
+    def delete_connection_between_devices(self, device1, device2, link=None):
+        # Find the connection to delete (a specific one if several are parallel)
+        if link is None:
+            link = self.connections.first_between(device1, device2)
 
-            # Remove from canvas
-            self.canvas.delete(line)
-
-            # Remove from connections list
-            self.connections.remove(connection_to_remove)
-
-            # Remove from network graph
-            self.network_graph.remove_edge(d1.id, d2.id)
-
-            # Release ports
-            d1.release_port(port1)
-            d2.release_port(port2)
+        if link:
+            d1, d2 = link.device1, link.device2
+            self._remove_link(link)
 
             messagebox.showinfo("Connection Deleted",
                                 f"Deleted connection between {d1.device_type} and {d2.device_type}")
@@ -562,27 +533,15 @@ class NetworkSimulator:
         if self.current_connection_type:
             self.start_connection(device)
         else:
-            device.on_device_drag_start(event)
+            self.views[device.id].on_device_drag_start(event)
 
     def delete_connection(self, device1, device2):
         """Enhanced connection deletion logic."""
-        connection_to_remove = None
-        for line, d1, d2, port1, port2 in self.connections:
-            if (d1 == device1 and d2 == device2) or (d1 == device2 and d2 == device1):
-                connection_to_remove = (line, d1, d2, port1, port2)
-                break
-
-        if connection_to_remove:
-            line, d1, d2, port1, port2 = connection_to_remove
+        link = self.connections.first_between(device1, device2)
 
-            # Remove connection visuals
-            self.canvas.delete(line)
-            self.connections.remove(connection_to_remove)
-            self.network_graph.remove_edge(d1.id, d2.id)
-
-            # Free up ports
-            d1.release_port(port1)
-            d2.release_port(port2)
+        if link:
+            d1, d2 = link.device1, link.device2
+            self._remove_link(link)
 
             messagebox.showinfo("Connection Deleted",
                                 f"Deleted connection between {d1.device_type} and {d2.device_type}")
@@ -593,40 +552,25 @@ class NetworkSimulator:
         self.delete_connection_mode = False
         self.connection_delete_start = None
 
-    def remove_device(self, device):
-            """Enhanced remove_device method to handle connections."""
-            # Remove from canvas
-            self.canvas.delete(device.shape_id)
-            self.canvas.delete(device.text_id)
-
-            # Remove all connections to this device
-            connections_to_remove = [c for c in self.connections if device in (c[1], c[2])]
-            for line, dev1, dev2, port1, port2 in connections_to_remove:
-                self.canvas.delete(line)
-                self.connections.remove((line, dev1, dev2, port1, port2))
-                self.network_graph.remove_edge(dev1.id, dev2.id)
-
-                # Free up the used ports
-                if dev1 == device:
-                    dev2.release_port(port2)
-                else:
-                    dev1.release_port(port1)
+    def _remove_link(self, link):
+        """Remove a single link from the canvas and the network."""
+        self.canvas.delete(self.link_lines.pop(link.id, None))
+        self.network.disconnect(link)
+        # Packets crossing it stop, unless a parallel link is left
+        self.animations.cancel_broken(self.network_graph.has_edge)
 
-            # Remove from network graph
-            if device.id in self.network_graph:
-                self.network_graph.remove_node(device.id)
-
-            # Remove from devices
-            del self.devices[device.id]
+        # Re-spread any parallel links that are left
+        self._redraw_pair(link.device1, link.device2)
+        self.report_convergence()
 
     # Modify Device class to support new click handling
 
     def setup_device_config_tab(self, frame):
         # Device Selection
         ttk.Label(frame, text="Select Device:", font=('Helvetica', 10, 'bold')).pack(pady=(10, 5))
-        self.device_selection = ttk.Combobox(frame, state="readonly")
+        self.device_selection = DevicePicker(frame, self.network, rows=6,
+                                             on_select=lambda device_id: self.load_device_config(None))
         self.device_selection.pack(fill="x", padx=10, pady=5)
-        self.device_selection.bind("<<ComboboxSelected>>", self.load_device_config)
 
         # Configuration Fields
         config_fields = [
@@ -661,20 +605,20 @@ class NetworkSimulator:
         self.update_device_selection()
 
     def update_device_selection(self):
-        device_list = [f"{device.id}: {device.device_type}" for device in self.devices.values()]
-        self.device_selection['values'] = device_list
+        # Only the picker's visible rows are redrawn; the index is already up to date
+        self.device_selection.refresh()
 
-        if device_list:
-            self.device_selection.current(0)
-            self.load_device_config(None)
+        # Keep the current selection unless its device is gone
+        if self.device_selection.get() is None:
+            self.device_selection.select_first()
+        self.load_device_config(None)
 
     def load_device_config(self, event):
-        if not self.devices:
-            return
-
         # Get selected device
-        selection = self.device_selection.get()
-        device_id = int(selection.split(':')[0])
+        device_id = self.device_selection.get()
+        if device_id is None:
+            self.selected_device = None
+            return
         device = self.devices[device_id]
 
         # Populate configuration fields
@@ -697,7 +641,7 @@ class NetworkSimulator:
         # Update available ports dynamically
         self.config_entries['available_ports'].config(state='normal')
         self.config_entries['available_ports'].delete(0, tk.END)
-        self.config_entries['available_ports'].insert(0, str(device.available_ports))  # Reflect actual port list
+        self.config_entries['available_ports'].insert(0, str(device.available_ports))  # Free ports as ranges
         self.config_entries['available_ports'].config(state='readonly')
 
         # Store currently selected device for saving or removing
@@ -711,13 +655,13 @@ class NetworkSimulator:
         ip_address = self.config_entries['ip_address'].get()
         subnet_mask = self.config_entries['subnet_mask'].get()
 
-        if not (self.selected_device.validate_ip(ip_address) and
-                self.selected_device.validate_ip(subnet_mask)):
-            messagebox.showwarning("Invalid Input", "Enter valid IP and Subnet.")
+        try:
+            self.network.set_address(self.selected_device, ip_address, subnet_mask)
+        except ValueError as e:
+            messagebox.showwarning("Invalid Input", str(e))
             return
-
-        self.selected_device.ip_address = ip_address
-        self.selected_device.subnet_mask = subnet_mask
+        self.device_selection.refresh()
+        self.update_ping_dropdowns()
 
         messagebox.showinfo("Configuration Saved",
                             f"Updated {self.selected_device.device_type} (ID: {self.selected_device.id})\n"
@@ -736,38 +680,59 @@ class NetworkSimulator:
             self.update_device_selection()
 
     def add_device(self, device_type):
-        device = Device(device_type, self.canvas, self)
-        self.devices[device.id] = device
-        self.network_graph.add_node(device.id, type=device_type, mac=device.mac_address)
+        device = self.network.add_device(device_type)
+        self.views[device.id] = DeviceView(device, self.canvas, self)
 
         # Update device selection and ping dropdowns
         self.update_device_selection()
         self.update_ping_dropdowns()
 
+    def start_control(self, path):
+        """Accept scripted commands on a Unix-domain socket (see control.py)."""
+        self.control = ControlServer(self.network, path, on_change=self._post_sync_views)
+        self.control.start()
+        self.write_to_terminal(f"Control socket listening on {path}")
+
+    def _post_sync_views(self):
+        """Called on a control thread after a batch edited the topology."""
+        # Batches that finish before the UI catches up share one redraw
+        if not self.views_stale.is_set():
+            self.views_stale.set()
+            self.terminal_queue.put(self._sync_views)
+
+    def _sync_views(self):
+        """Bring the canvas and pickers in line with the Network in one pass."""
+        self.views_stale.clear()
+        with self.network.lock:
+            for device_id in [i for i in self.views if i not in self.devices]:
+                self.views.pop(device_id).destroy()
+                self.animations.cancel_device(device_id)
+            for link_id in [i for i in self.link_lines if self.connections.get(i) is None]:
+                self.canvas.delete(self.link_lines.pop(link_id))
+            self.animations.cancel_broken(self.network_graph.has_edge)
+            for device in self.devices.values():
+                if device.id not in self.views:
+                    self.views[device.id] = DeviceView(device, self.canvas, self)
+            for link in self.connections:
+                if link.id not in self.link_lines:
+                    self.link_lines[link.id] = self.canvas.create_line(
+                        *self._link_coords(link), fill="black", width=2)
+        self.report_convergence()
+        self.update_device_selection()
+        self.update_ping_dropdowns()
+
     def remove_device(self, device):
         # Remove from canvas
-        self.canvas.delete(device.shape_id)
-        self.canvas.delete(device.text_id)
-
-        # Remove connections
-        connections_to_remove = [c for c in self.connections if device in (c[1], c[2])]
-        for line, dev1, dev2, port1, port2 in connections_to_remove:
-            self.canvas.delete(line)
-            self.connections.remove((line, dev1, dev2, port1, port2))
-            self.network_graph.remove_edge(dev1.id, dev2.id)
-
-            # Free up the used ports
-            if dev1 == device:
-                dev2.release_port(port2)
-            else:
-                dev1.release_port(port1)
-
-        # Remove from network graph
-        if device.id in self.network_graph:
-            self.network_graph.remove_node(device.id)
+        view = self.views.pop(device.id, None)
+        if view is not None:
+            view.destroy()
 
-        # Remove from devices
-        del self.devices[device.id]
+        # Remove from the network; only this device's own links are visited
+        for link in self.network.remove_device(device):
+            self.canvas.delete(self.link_lines.pop(link.id, None))
+        # Stop packets headed through it before their timers fire
+        self.animations.cancel_device(device.id)
+        self.report_convergence()
 
         # Update device selection and ping dropdowns
         self.update_device_selection()
@@ -801,27 +766,34 @@ class NetworkSimulator:
             messagebox.showwarning("Connection Error", "One or both devices have no available ports.")
             return
 
-        port1 = device1.choose_port()
-        port2 = device2.choose_port()
-        if port1 is not None and port2 is not None:
-            device1.use_port(port1)
-            device2.use_port(port2)
-            line = self.draw_connection(device1, device2)
-            self.connections.append((line, device1, device2, port1, port2))
-            self.network_graph.add_edge(device1.id, device2.id, type=self.current_connection_type)
+        # The cable is as long as it is drawn, for its propagation delay. The
+        # length is fixed here: moving the devices later only redraws the line
+        (x1, y1), (x2, y2) = self.get_device_center(device1), self.get_device_center(device2)
+        distance = ((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5 * KM_PER_PIXEL
+        link = self.network.connect(device1, device2, self.current_connection_type, distance)
+        if link is not None:
+            self.link_lines[link.id] = self.draw_connection(device1, device2)
+            self._redraw_pair(device1, device2)
+            self.report_convergence()
         else:
             messagebox.showwarning("Connection Error", "Could not establish connection. Ports are unavailable.")
 
+    def report_convergence(self):
+        """After a topology edit, show what it cost the routing protocol (if one is on)."""
+        routing = self.network.routing
+        if routing is not None and routing.last_report is not None:
+            for line in routing.last_report.lines():
+                self.write_to_terminal(line)
+
     def detect_connection(self, x, y):
         """Detect if a click is near any connection."""
         threshold = 10  # Maximum distance from the line to count as a click
-        for line, d1, d2, port1, port2 in self.connections:
-            x1, y1 = self.get_device_center(d1)
-            x2, y2 = self.get_device_center(d2)
+        for link_id, line in self.link_lines.items():
+            x1, y1, x2, y2 = self.canvas.coords(line)
 
             # Calculate the distance from the point (x, y) to the line segment (x1, y1)-(x2, y2)
             if self.is_point_near_line(x, y, x1, y1, x2, y2, threshold):
-                return line, d1, d2, port1, port2
+                return self.connections.get(link_id)
         return None
 
     def is_point_near_line(self, px, py, x1, y1, x2, y2, threshold):
@@ -842,14 +814,111 @@ class NetworkSimulator:
         x2, y2 = self.get_device_center(device2)
         return self.canvas.create_line(x1, y1, x2, y2, fill="black", width=2)
 
-    def update_connections(self):
-        for line, device1, device2, _, _ in self.connections:
-            x1, y1 = self.get_device_center(device1)
-            x2, y2 = self.get_device_center(device2)
-            self.canvas.coords(line, x1, y1, x2, y2)
+    def update_connections(self, device=None):
+        """Redraw link lines; only the given device's links if one is passed."""
+        # The control socket may be adding links on its own thread
+        with self.network.lock:
+            links = self.connections.of_device(device) if device is not None else list(self.connections)
+            for link in links:
+                line = self.link_lines.get(link.id)
+                if line is not None:
+                    self._place_line(line, link)
+
+    def toggle_heatmap(self):
+        """Show or hide the link utilization overlay."""
+        if self.heatmap_var.get():
+            if self.heatmap is None:
+                self.heatmap = {}
+                self._refresh_heatmap()
+        else:
+            self.heatmap = None
+            for line in self.link_lines.values():
+                self.canvas.itemconfigure(line, fill="black", width=2)
+
+    def _refresh_heatmap(self):
+        """Recolour links by their recent traffic, relative to the busiest link.
+
+        Runs every HEATMAP_REFRESH_MS and reads the links' packet counters, so
+        its cost depends on the number of links, not on the packet rate. Only
+        lines whose style changed are reconfigured.
+        """
+        state = self.heatmap
+        if state is None:
+            return
+        with self.network.lock:
+            links = [(link.id, link.bytes) for link in self.connections]
+
+        hottest = 0.0
+        for link_id, sent in links:
+            entry = state.get(link_id)
+            if entry is None:
+                # Traffic from before the overlay was switched on does not count
+                entry = state[link_id] = [sent, 0.0, None]
+            entry[1] = entry[1] * HEATMAP_DECAY + (sent - entry[0])
+            entry[0] = sent
+            hottest = max(hottest, entry[1])
+
+        live = set()
+        for link_id, _ in links:
+            live.add(link_id)
+            entry = state[link_id]
+            line = self.link_lines.get(link_id)
+            if line is None:
+                continue
+            if entry[1] < 1:
+                level = None  # Idle: the plain black line
+            else:
+                level = min(int(entry[1] / hottest * len(HEATMAP_COLORS)), len(HEATMAP_COLORS) - 1)
+            if level != entry[2]:
+                entry[2] = level
+                if level is None:
+                    self.canvas.itemconfigure(line, fill="black", width=2)
+                else:
+                    self.canvas.itemconfigure(line, fill=HEATMAP_COLORS[level], width=HEATMAP_WIDTHS[level])
+        for link_id in [i for i in state if i not in live]:
+            del state[link_id]
+        self.root.after(HEATMAP_REFRESH_MS, self._refresh_heatmap)
+
+    def _link_coords(self, link):
+        """Line endpoints for a link, fanned out sideways if it has parallel links.
+
+        None if either device has no view yet (added over the control socket
+        and not drawn until the next view sync).
+        """
+        center1, center2 = self.get_device_center(link.device1), self.get_device_center(link.device2)
+        if center1 is None or center2 is None:
+            return None
+        (x1, y1), (x2, y2) = center1, center2
+        with self.network.lock:
+            parallel = self.connections.between(link.device1, link.device2)
+        if len(parallel) > 1:
+            length = max(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5, 1)
+            # Offset perpendicular to the line, 6px apart, centred on it
+            offset = (parallel.index(link) - (len(parallel) - 1) / 2) * 6
+            # Use a pair-independent direction so both ends agree
+            sign = 1 if link.device1.id <= link.device2.id else -1
+            dx, dy = -(y2 - y1) / length * offset * sign, (x2 - x1) / length * offset * sign
+            x1, y1, x2, y2 = x1 + dx, y1 + dy, x2 + dx, y2 + dy
+        return x1, y1, x2, y2
+
+    def _redraw_pair(self, device1, device2):
+        with self.network.lock:
+            for link in self.connections.between(device1, device2):
+                line = self.link_lines.get(link.id)
+                if line is not None:
+                    self._place_line(line, link)
+
+    def _place_line(self, line, link):
+        coords = self._link_coords(link)
+        if coords is not None:
+            self.canvas.coords(line, *coords)
 
     def get_device_center(self, device):
-        coords = self.canvas.coords(device.shape_id)
+        """Centre of a device's view on the canvas, or None if it is not drawn."""
+        view = self.views.get(device.id)
+        if view is None:
+            return None
+        coords = self.canvas.coords(view.shape_id)
         if len(coords) == 2:  # It's an image
             x1, y1 = coords
             x2, y2 = x1 + 50, y1 + 50
@@ -857,19 +926,115 @@ class NetworkSimulator:
             x1, y1, x2, y2 = coords
         return (x1 + x2) / 2, (y1 + y2) / 2
 
+    def auto_layout(self):
+        """Arrange all devices: layered if the topology is a tree (or forest), force-directed otherwise.
+
+        The force layout runs on a background thread and publishes its
+        progress; the Tk loop eases the devices towards the latest positions
+        every LAYOUT_FRAME_MS, so they animate into place while it converges.
+        Link lengths (and so delays) stay as they were drawn.
+        """
+        # numpy is only needed here, so it is not loaded until the first layout
+        import numpy as np
+        from layout import is_forest, tree_layout, fit
+
+        self.stop_layout()
+        ids = list(self.views)
+        if not ids:
+            return
+        index = {device_id: i for i, device_id in enumerate(ids)}
+        with self.network.lock:
+            positions = np.array([self.get_device_center(self.views[device_id].device) for device_id in ids])
+            edges = [(index[link.device1.id], index[link.device2.id]) for link in self.connections
+                     if link.device1.id in index and link.device2.id in index]
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:  # Not mapped yet
+            width, height = int(self.canvas.cget("width")), int(self.canvas.cget("height"))
+
+        state = {"ids": ids, "drawn": positions, "target": None, "finished": False,
+                 "cancel": threading.Event()}
+        if is_forest(len(ids), edges):
+            state["target"] = fit(tree_layout(len(ids), edges), width, height, keep_aspect=False)
+            state["finished"] = True
+        else:
+            seed = self.network.rng_layout.getrandbits(32)
+            threading.Thread(target=self._layout_worker, args=(state, positions, edges, seed, width, height),
+                             daemon=True).start()
+        self.layout_state = state
+        self.root.after(LAYOUT_FRAME_MS, self._animate_layout, state)
+
+    def stop_layout(self):
+        """Stop a running auto layout, leaving the devices where they are."""
+        if self.layout_state is not None:
+            self.layout_state["cancel"].set()
+            self.layout_state = None
+
+    @staticmethod
+    def _layout_worker(state, positions, edges, seed, width, height):
+        """Background thread: run the force layout, publishing positions as it goes."""
+        from layout import ForceLayout, fit
+
+        layout = ForceLayout(positions, edges, seed)
+        while not layout.done and not state["cancel"].is_set():
+            state["target"] = fit(layout.step(LAYOUT_STEPS_PER_UPDATE), width, height)
+        state["finished"] = True
+
+    def _animate_layout(self, state):
+        """One animation frame: move every device part of the way to its target."""
+        import numpy as np
+
+        if state["cancel"].is_set():
+            return
+        # Read finished first: once it is set, target holds the final layout
+        finished = state["finished"]
+        target = state["target"]
+        settled = False
+        if target is not None:
+            drawn = state["drawn"]
+            step = (target - drawn) * LAYOUT_EASING
+            # Steps under half a pixel are skipped, so snap once everything is within 2
+            settled = finished and np.abs(target - drawn).max() < 2
+            if settled:
+                step = target - drawn
+            moving = np.flatnonzero(np.abs(step).max(axis=1) > (0 if settled else 0.5))
+            moved = []
+            for i in moving.tolist():
+                view = self.views.get(state["ids"][i])
+                if view is not None:
+                    view.move(step[i, 0], step[i, 1])
+                    moved.append(view.device)
+            drawn[moving] += step[moving]
+            self._redraw_links_of(moved)
+        if settled:
+            self.layout_state = None
+            return
+        self.root.after(LAYOUT_FRAME_MS, self._animate_layout, state)
+
+    def _redraw_links_of(self, devices):
+        """Redraw each link touching any of the devices, once."""
+        done = set()
+        with self.network.lock:
+            for device in devices:
+                for link in self.connections.of_device(device):
+                    line = self.link_lines.get(link.id)
+                    if line is not None and link.id not in done:
+                        done.add(link.id)
+                        self._place_line(line, link)
+
     def setup_pinging_tab(self, frame):
         # Title
         ttk.Label(frame, text="Ping and Packet Tool", font=("Helvetica", 12, "bold")).pack(pady=10)
 
-        # Dropdown for Source Device
+        # Source Device (type a name or IP prefix to filter)
         ttk.Label(frame, text="Source Device:").pack(anchor="w", padx=10, pady=5)
-        self.source_device_combobox = ttk.Combobox(frame, state="readonly")
-        self.source_device_combobox.pack(fill="x", padx=10, pady=5)
+        self.source_device_picker = DevicePicker(frame, self.network, rows=4)
+        self.source_device_picker.pack(fill="x", padx=10, pady=5)
 
-        # Dropdown for Destination Device
+        # Destination Device
         ttk.Label(frame, text="Destination Device:").pack(anchor="w", padx=10, pady=5)
-        self.destination_device_combobox = ttk.Combobox(frame, state="readonly")
-        self.destination_device_combobox.pack(fill="x", padx=10, pady=5)
+        self.destination_device_picker = DevicePicker(frame, self.network, rows=4)
+        self.destination_device_picker.pack(fill="x", padx=10, pady=5)
 
         # Dropdown for Protocol Selection
         ttk.Label(frame, text="Protocol:").pack(anchor="w", padx=10, pady=5)
@@ -892,24 +1057,82 @@ class NetworkSimulator:
         # Initialize the dropdowns
         self.update_ping_dropdowns()
 
-    def send_packet_devices(self):
-        source_device_name = self.source_device_combobox.get()
-        destination_device_name = self.destination_device_combobox.get()
-        protocol = self.protocol_combobox.get()
-
-        if not source_device_name or not destination_device_name:
-            self.ping_output_label.config(text="Error: Both Source and Destination Devices must be selected.")
+    def setup_failures_tab(self, frame):
+        ttk.Label(frame, text="Single Points of Failure", font=("Helvetica", 12, "bold")).pack(pady=10)
+        ttk.Button(frame, text="Analyze", command=self.analyze_failures).pack(fill="x", padx=10, pady=5)
+        self.failures_summary = ttk.Label(frame, text="Links and devices whose loss alone disconnects devices.",
+                                          wraplength=300, justify="left")
+        self.failures_summary.pack(fill="x", padx=10, pady=5)
+
+        self.failures_tree = ttk.Treeview(frame, columns=("pairs", "item"), show="headings", height=15)
+        self.failures_tree.heading("pairs", text="Pairs cut")
+        self.failures_tree.heading("item", text="Link or device")
+        self.failures_tree.column("pairs", width=80, anchor="e")
+        self.failures_tree.column("item", width=300)
+        self.failures_tree.pack(fill="both", expand=True, padx=10, pady=5)
+        self.failures_tree.bind("<<TreeviewSelect>>", self.highlight_failure)
+        self.failure_items = {}  # tree row id -> (kind, link or device)
+        self.failure_highlight = None  # Canvas item marking the selected row
+
+    def analyze_failures(self):
+        """Find the single points of failure off the Tk thread, then list the worst."""
+        self.failures_summary.config(text="Analyzing...")
+
+        def worker():
+            report = self.network.failure_report()  # Cached until the next topology edit
+            self.terminal_queue.put(lambda: self._show_failures(report))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _show_failures(self, report):
+        self.failures_tree.delete(*self.failures_tree.get_children())
+        self.failure_items = {}
+        entries = report.entries()
+        for pairs, kind, item, detail in entries[:FAILURES_VIEW_ROWS]:
+            if kind == "link":
+                label = f"Link {item.device1.device_type} {item.device1.id} <-> {item.device2.device_type} {item.device2.id}"
+            else:
+                label = f"{item.device_type} {item.id} ({item.ip_address})"
+            row = self.failures_tree.insert("", "end", values=(pairs, label))
+            self.failure_items[row] = (kind, item)
+        summary = report.summary()
+        if len(entries) > FAILURES_VIEW_ROWS:
+            summary += f" Showing the worst {FAILURES_VIEW_ROWS}; type 'failures' in the terminal for all."
+        self.failures_summary.config(text=summary)
+
+    def highlight_failure(self, event=None):
+        """Circle the selected device or trace the selected link in red."""
+        self.canvas.delete(self.failure_highlight)
+        self.failure_highlight = None
+        selection = self.failures_tree.selection()
+        if not selection or selection[0] not in self.failure_items:
             return
+        kind, item = self.failure_items[selection[0]]
+        if kind == "link":
+            coords = self._link_coords(item) if item.id in self.link_lines else None
+            if coords is not None:
+                self.failure_highlight = self.canvas.create_line(*coords, fill="red", width=6)
+        elif item.id in self.views:
+            x, y = self.get_device_center(item)
+            self.failure_highlight = self.canvas.create_oval(x - 40, y - 40, x + 40, y + 40, outline="red", width=3)
+
+    def _picked_devices(self):
+        """The devices selected in the ping tab, or None after reporting the problem."""
+        source_id = self.source_device_picker.get()
+        destination_id = self.destination_device_picker.get()
+
+        if source_id is None or destination_id is None:
+            self.ping_output_label.config(text="Error: Both Source and Destination Devices must be selected.")
+            return None
+        return self.devices[source_id], self.devices[destination_id]
 
-        # Resolve device names to IP addresses
-        source_device = next((device for device in self.devices.values()
-                              if f"{device.device_type} {device.id}" == source_device_name), None)
-        destination_device = next((device for device in self.devices.values()
-                                   if f"{device.device_type} {device.id}" == destination_device_name), None)
-
-        if not source_device or not destination_device:
-            self.ping_output_label.config(text="Error: Device not found.")
+    def send_packet_devices(self):
+        protocol = self.protocol_combobox.get()
+        picked = self._picked_devices()
+        if picked is None:
             return
+        source_device, destination_device = picked
+        source_device_name, destination_device_name = device_label(source_device), device_label(destination_device)
 
         source_ip = source_device.ip_address
         destination_ip = destination_device.ip_address
@@ -917,8 +1140,8 @@ class NetworkSimulator:
         # Construct the send packet command
         command = f"SendPacket {source_ip} {destination_ip} {protocol}"
         try:
-            # Use the existing send packet function
-            self.execute_send_packet(command)
+            # Use the existing send packet command
+            self.run_terminal_command(command)
             self.ping_output_label.config(
                 text=f"{protocol} packet from {source_device_name} to {destination_device_name} executed. Check the terminal for details."
             )
@@ -926,36 +1149,18 @@ class NetworkSimulator:
             self.ping_output_label.config(text=f"Error: {str(e)}")
 
     def update_ping_dropdowns(self):
-        """Update the device name options in the ping dropdown menus."""
-        device_names = [f"{device.device_type} {device.id}" for device in self.devices.values()]
-
-        # Update the source device dropdown
-        self.source_device_combobox['values'] = device_names
-        if device_names:
-            self.source_device_combobox.current(0)  # Select the first device by default
-
-        # Update the destination device dropdown
-        self.destination_device_combobox['values'] = device_names
-        if device_names:
-            self.destination_device_combobox.current(0)  # Select the first device by default
+        """Refresh the visible rows of the ping tab's device pickers."""
+        for picker in (self.source_device_picker, self.destination_device_picker):
+            picker.refresh()
+            if picker.get() is None:
+                picker.select_first()  # Select the first device by default
 
     def ping_devices(self):
-        source_device_name = self.source_device_combobox.get()
-        destination_device_name = self.destination_device_combobox.get()
-
-        if not source_device_name or not destination_device_name:
-            self.ping_output_label.config(text="Error: Both Source and Destination Devices must be selected.")
-            return
-
-        # Resolve device names to IP addresses
-        source_device = next((device for device in self.devices.values()
-                              if f"{device.device_type} {device.id}" == source_device_name), None)
-        destination_device = next((device for device in self.devices.values()
-                                   if f"{device.device_type} {device.id}" == destination_device_name), None)
-
-        if not source_device or not destination_device:
-            self.ping_output_label.config(text="Error: Device not found.")
+        picked = self._picked_devices()
+        if picked is None:
             return
+        source_device, destination_device = picked
+        source_device_name, destination_device_name = device_label(source_device), device_label(destination_device)
 
         source_ip = source_device.ip_address
         destination_ip = destination_device.ip_address
@@ -963,8 +1168,8 @@ class NetworkSimulator:
         # Construct the ping command
         command = f"ping {source_ip} {destination_ip}"
         try:
-            # Use the existing ping function
-            self.execute_ping(command)
+            # Use the existing ping command
+            self.run_terminal_command(command)
             self.ping_output_label.config(
                 text=f"Ping from {source_device_name} to {destination_device_name} executed. Check the terminal for details."
             )
@@ -972,22 +1177,17 @@ class NetworkSimulator:
             self.ping_output_label.config(text=f"Error: {str(e)}")
 
 
-class Device:
-    id_counter = 1  # Shared counter for unique IDs
+class DeviceView:
+    """Canvas representation of a network.Device; only exists for drawn devices."""
 
-    def __init__(self, device_type, canvas, simulator):
-        self.device_type = device_type
+    icons = {}  # device type -> shared PhotoImage, or None if it has no icon file
+
+    def __init__(self, device, canvas, simulator):
+        self.device = device
         self.canvas = canvas
         self.simulator = simulator
-        self.id = Device.id_counter
-        Device.id_counter += 1
         self.icon = None
-        # Isolated initialization of ports
-        self.available_ports = self.initialize_ports(device_type)
-
-        self.mac_address = self.generate_mac()
-        self.ip_address = f"192.168.0.{self.id}"
-        self.subnet_mask = "255.255.255.0"
+        self.start_x = self.start_y = 0
 
         self.create_device()
 
@@ -997,48 +1197,41 @@ class Device:
         self.canvas.tag_bind(self.text_id, "<B1-Motion>", self.on_device_drag)
         self.canvas.tag_bind(self.text_id, "<Button-1>", self.on_device_click)
 
-    def initialize_ports(self, device_type):
-        """Initialize the correct number of ports based on device type."""
-        if device_type == "PC":
-            return list(range(1, 2))  # PCs have 1 port
-        elif device_type == "Router":
-            return list(range(1, 7))  # Routers have 6 ports
-        elif device_type == "Switch":
-            return list(range(1, 9))  # Switches have 8 ports
-        elif device_type == "Hub":
-            return list(range(1, 5))  # Hubs have 4 ports
-        else:
-            return list(range(1, 2))  # Default to 1 port for unknown devices
-
     def create_device(self):
-        x, y = 100 + random.randint(0, 300), 100 + random.randint(0, 300)
+        rng = self.simulator.network.rng_layout
+        x, y = 100 + rng.randint(0, 300), 100 + rng.randint(0, 300)
 
         # Construct the icon path based on device type
-        icon_path = "C:\\Users\\poopy\\PycharmProjects\\pythonProject6\\.venv\\Images\\" + f"{self.device_type.lower()}.png"
+        icon_path = "C:\\Users\\poopy\\PycharmProjects\\pythonProject6\\.venv\\Images\\" + f"{self.device.device_type.lower()}.png"
 
 
 
-        try:
-            # Load and resize the icon image
-            img = Image.open(icon_path).resize((50, 50), Image.Resampling.LANCZOS)
+        # Each icon is loaded and resized once, then shared by every device of its type
+        if self.device.device_type not in DeviceView.icons:
+            try:
+                img = Image.open(icon_path).resize((50, 50), Image.Resampling.LANCZOS)
+                DeviceView.icons[self.device.device_type] = ImageTk.PhotoImage(img)
+            except FileNotFoundError:
+                DeviceView.icons[self.device.device_type] = None
+        self.icon = DeviceView.icons[self.device.device_type]
 
-            self.icon = ImageTk.PhotoImage(img)
+        if self.icon is not None:
             self.shape_id = self.canvas.create_image(x, y, image=self.icon, anchor=tk.NW)
-        except FileNotFoundError:
+        else:
             # Fallback to a blue circle if image not found
-            self.shape_id = self.canvas.create_oval(x, y, x + 50, y + 50, fill="blue", tags=f"device_{self.id}")
+            self.shape_id = self.canvas.create_oval(x, y, x + 50, y + 50, fill="blue", tags=f"device_{self.device.id}")
 
         # Add device text
         self.text_id = self.canvas.create_text(
             x + 25, y + 65,  # Adjusted position for text below the icon
-            text=f"{self.device_type}\nPorts: {len(self.available_ports)}",
+            text=f"{self.device.device_type}\nPorts: {len(self.device.available_ports)}",
             fill="black"
         )
 
     def on_device_click(self, event):
         if self.simulator.current_connection_type:
             # If in connection mode, start connection process
-            self.simulator.start_connection(self)
+            self.simulator.start_connection(self.device)
         else:
             # Store initial click position for dragging
             self.start_x = event.x
@@ -1050,48 +1243,45 @@ class Device:
         self.start_y = event.y
 
     def on_device_drag(self, event):
+        # Grabbing a device stops the auto layout from pulling it back
+        self.simulator.stop_layout()
+
         # Move device and update its position
         dx = event.x - self.start_x
         dy = event.y - self.start_y
 
-        self.canvas.move(self.shape_id, dx, dy)
-        self.canvas.move(self.text_id, dx, dy)
+        self.move(dx, dy)
 
         # Update starting position for next drag event
         self.start_x = event.x
         self.start_y = event.y
 
         # Update any connections to this device
-        self.simulator.update_connections()
-
-    def generate_mac(self):
-        return ":".join(f"{random.randint(0, 255):02x}" for _ in range(6))
-
-    def validate_ip(self, ip):
-        return re.match(r"^\d{1,3}(\.\d{1,3}){3}$", ip) and all(0 <= int(part) <= 255 for part in ip.split("."))
-
-    def has_available_ports(self):
-        # Check if any ports are available
-        return len(self.available_ports) > 0
+        self.simulator.update_connections(self.device)
 
-    def choose_port(self):
-        # Choose the first available port, or None if no ports are left
-        return self.available_ports[0] if self.available_ports else None
+    def move(self, dx, dy):
+        self.canvas.move(self.shape_id, dx, dy)
+        self.canvas.move(self.text_id, dx, dy)
 
-    def use_port(self, port):
-        # Mark the port as used
-        if port in self.available_ports:
-            self.available_ports.remove(port)
+    def destroy(self):
+        """Remove the device's canvas items."""
+        self.canvas.delete(self.shape_id)
+        self.canvas.delete(self.text_id)
 
-    def release_port(self, port):
-        # Re-enable a port (if needed)
-        if port not in self.available_ports:
-            self.available_ports.append(port)
 
 
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Network simulator GUI")
+    parser.add_argument("--control", metavar="SOCKET",
+                        help="also accept JSON-lines commands on this Unix-domain socket")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     root = tk.Tk()
     app = NetworkSimulator(root)
-    root.mainloop()
\ No newline at end of file
+    if args.control:
+        app.start_control(args.control)
+    root.mainloop()
+    if app.control is not None:
+        app.control.close()
\ No newline at end of file
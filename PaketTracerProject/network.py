@@ -0,0 +1,443 @@
+"""Headless simulation core: device records and the topology that owns them.
+
+Nothing in here touches Tk. The GUI keeps its own view objects for the
+devices and links it draws and looks the records up by id.
+"""
+import random
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import networkx as nx
+
+from addressing import AddressAllocator, format_ip, parse_ip, parse_mask, prefix_mask
+from eventlog import (
+    EVENT_DEVICE_ADD, EVENT_DEVICE_REMOVE, EVENT_LINK_ADD, EVENT_LINK_REMOVE,
+    EVENT_ENQUEUE, EVENT_HOP, EVENT_DELIVER, EVENT_ACK, EVENT_DROP,
+    PROTO_ICMP, PROTO_TCP, PROTO_UDP, INITIAL_TTL,
+    DEVICE_TYPES, CABLE_TYPES, type_code,
+)
+from latency import hop_delay
+from links import LinkStore
+from ports import PortAllocator, PORT_COUNTS, DEFAULT_PORT_COUNT
+from routing import create_control_plane
+from failures import analyze as analyze_failures
+from search import DeviceIndex
+
+# Bytes a packet puts on the wire, by (protocol, reply): the Ethernet frame
+# sizes pcap.py writes. TCP replies are bare ACKs.
+PACKET_BYTES = {
+    (PROTO_ICMP, False): 74, (PROTO_ICMP, True): 74,
+    (PROTO_TCP, False): 86, (PROTO_TCP, True): 54,
+    (PROTO_UDP, False): 74, (PROTO_UDP, True): 74,
+}
+ROUTE_CACHE_SIZE = 100000  # Cached routes kept before the cache starts over
+
+# A resolved route: device ids, the link of each hop, and the sum of the
+# links' latencies (without serialization and jitter)
+Route = namedtuple("Route", "path links latency")
+
+
+class Device:
+    """Simulation state of one device, stored in slots to keep it small.
+
+    The record with its port allocator, MAC and IP is about 200 bytes. A
+    device added to a Network costs about 1 KB in all: its search index keys
+    (~330 B) and networkx node (~230 B) come on top, plus its entries in the
+    Network's id and IP dicts.
+    """
+
+    __slots__ = ("id", "device_type", "_mac", "_ip", "_prefix", "available_ports")
+
+    def __init__(self, device_id, device_type, port_count=None, mac=None, ip=0, prefix=24):
+        self.id = device_id
+        self.device_type = device_type
+        # Isolated initialization of ports
+        self.available_ports = self.initialize_ports(device_type, port_count)
+
+        self._mac = self.generate_mac() if mac is None else mac
+        # Leased from Network.addresses; change it through Network.set_address
+        self._ip = ip
+        self._prefix = prefix
+
+    @staticmethod
+    def initialize_ports(device_type, port_count=None):
+        """Initialize the port allocator, sized from PORT_COUNTS unless overridden."""
+        if port_count is None:
+            port_count = PORT_COUNTS.get(device_type, DEFAULT_PORT_COUNT)
+        return PortAllocator(port_count)
+
+    @property
+    def mac_address(self):
+        # Stored as a 48-bit integer, formatted on demand
+        return ":".join(f"{(self._mac >> shift) & 0xff:02x}" for shift in range(40, -1, -8))
+
+    @mac_address.setter
+    def mac_address(self, mac):
+        self._mac = int(mac.replace(":", "").replace("-", ""), 16)
+
+    @property
+    def mac_bytes(self):
+        # The 6 bytes that go on the wire
+        return self._mac.to_bytes(6, "big")
+
+    @property
+    def ip_address(self):
+        # Stored as a 32-bit integer, formatted on demand
+        return format_ip(self._ip)
+
+    @property
+    def ip_int(self):
+        return self._ip
+
+    @property
+    def subnet_mask(self):
+        # Stored as a prefix length
+        return format_ip(prefix_mask(self._prefix))
+
+    @staticmethod
+    def generate_mac():
+        return random.getrandbits(48)
+
+    @staticmethod
+    def validate_ip(ip):
+        try:
+            parse_ip(ip)
+        except ValueError:
+            return False
+        return True
+
+    def has_available_ports(self):
+        # Check if any ports are available
+        return len(self.available_ports) > 0
+
+    def choose_port(self):
+        # Choose the lowest free port, or None if no ports are left
+        return self.available_ports.lowest_free()
+
+    def use_port(self, port):
+        # Mark the port as used
+        self.available_ports.use(port)
+
+    def release_port(self, port):
+        # Re-enable a port (if needed)
+        self.available_ports.release(port)
+
+    def __repr__(self):
+        return f"Device({self.id}, {self.device_type})"
+
+
+class Network:
+    """Devices, links and the routing graph of one simulated topology.
+
+    All randomness comes from per-network RNG streams derived from ``seed``,
+    so the same seed and the same commands reproduce a run exactly. Every
+    topology edit and packet event is passed to the objects in
+    ``listeners`` (see eventlog.TraceRecorder), stamped with ``clock``, the
+    simulation time in milliseconds.
+
+    Packets take a global shortest path unless a routing protocol is
+    switched on with ``set_routing``; then they follow the devices'
+    forwarding tables, and each topology edit is run through the protocol
+    (see routing.py), leaving a ConvergenceReport in
+    ``routing.last_report``. Edits made inside ``batch()`` are run through
+    it once, when the batch ends.
+    """
+
+    def __init__(self, seed=None):
+        self.devices = {}
+        self.links = LinkStore()
+        self.graph = nx.Graph()
+        self.index = DeviceIndex()  # Prefix search over device names and IPs
+        self.addresses = AddressAllocator()  # DHCP-style pools new devices lease their IP from
+        self._by_ip = {}  # IP address as an integer -> device
+        self._next_id = 1  # Shared counter for unique IDs
+        self._next_packet_id = 1
+        self.clock = 0.0
+        self.listeners = []
+        self.routing = None  # Optional routing.ControlPlane
+        self._batch_depth = 0  # Nesting of batch() blocks
+        self._routing_causes = []  # Edits not yet run through the routing protocol, during a batch
+        self._routes = {}  # (source id, destination id) -> Route, dropped on every topology edit
+        self._failure_report = None  # failures.FailureReport, dropped on every topology edit
+        # Held by topology edits and by background commands while they read
+        # the graph, so a command never sees a half-applied edit
+        self.lock = threading.RLock()
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        """Restart the RNG streams from a seed (a fresh random one if None)."""
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 63)
+        self.seed = seed
+        # Separate streams, so e.g. adding a device does not shift packet delays
+        self.rng_delay = random.Random(f"{seed}/delay")
+        self.rng_mac = random.Random(f"{seed}/mac")
+        self.rng_layout = random.Random(f"{seed}/layout")
+
+    def _emit(self, kind, a=0, b=0, c=0, code=0, index=0, value=0.0):
+        for listener in self.listeners:
+            listener.record(self.clock, kind, a, b, c, code, index, value)
+
+    def describe_topology(self, listener):
+        """Send the current devices and links to one listener as ADD events.
+
+        Used when a recorder is attached mid-session, so its trace starts
+        with the topology that already exists.
+        """
+        with self.lock:
+            for device in self.devices.values():
+                listener.record(self.clock, EVENT_DEVICE_ADD, device.id, 0, 0,
+                                type_code(DEVICE_TYPES, device.device_type), 0, 0.0)
+            for link in self.links:
+                listener.record(self.clock, EVENT_LINK_ADD, link.id, link.device1.id, link.device2.id,
+                                type_code(CABLE_TYPES, link.type), 0, 0.0)
+
+    def add_device(self, device_type, port_count=None):
+        with self.lock:
+            ip, prefix = self.addresses.allocate()
+            device = Device(self._next_id, device_type, port_count, mac=self.rng_mac.getrandbits(48),
+                            ip=ip, prefix=prefix)
+            self._next_id += 1
+            self.devices[device.id] = device
+            self._by_ip[ip] = device
+            self.graph.add_node(device.id)
+            self.index.add(device)
+            self._topology_edited()
+            self._emit(EVENT_DEVICE_ADD, device.id, code=type_code(DEVICE_TYPES, device_type))
+            self._sync_routing(f"{device_type} {device.id} added")
+        return device
+
+    def remove_device(self, device):
+        """Remove a device and all its links. Returns the removed links."""
+        with self.lock:
+            removed = self.links.remove_device(device)
+            for link in removed:
+                # Free up the port on the far end
+                other = link.other(device)
+                other.release_port(link.port_of(other))
+                self._emit(EVENT_LINK_REMOVE, link.id, link.device1.id, link.device2.id)
+
+            # Remove from network graph (drops its edges too)
+            if device.id in self.graph:
+                self.graph.remove_node(device.id)
+
+            del self.devices[device.id]
+            del self._by_ip[device.ip_int]
+            self.addresses.release(device.ip_int)
+            self.index.remove(device)
+            self._topology_edited()
+            self._emit(EVENT_DEVICE_REMOVE, device.id)
+            self._sync_routing(f"{device.device_type} {device.id} removed")
+        return removed
+
+    def connect(self, device1, device2, connection_type, distance_km=0.0):
+        """Cable two devices together on their lowest free ports.
+
+        ``distance_km`` is the cable's length, for its propagation delay.
+        Returns the new link, or None if either device has no free port.
+        """
+        with self.lock:
+            port1 = device1.choose_port()
+            port2 = device2.choose_port()
+            if port1 is None or port2 is None:
+                return None
+            device1.use_port(port1)
+            device2.use_port(port2)
+            link = self.links.add(device1, device2, port1, port2, connection_type, distance_km)
+            self._sync_graph_edge(device1, device2)
+            self._emit(EVENT_LINK_ADD, link.id, device1.id, device2.id, code=type_code(CABLE_TYPES, connection_type))
+            self._sync_routing(f"link {device1.id}-{device2.id} up")
+        return link
+
+    def disconnect(self, link):
+        """Remove a single link and free its ports."""
+        d1, d2 = link.device1, link.device2
+        with self.lock:
+            if not self.links.remove(link):
+                return False
+            # Free up ports, under the lock: connect() allocates from the same bitmaps
+            d1.release_port(link.port1)
+            d2.release_port(link.port2)
+            self._sync_graph_edge(d1, d2)
+            self._emit(EVENT_LINK_REMOVE, link.id, d1.id, d2.id)
+            self._sync_routing(f"link {d1.id}-{d2.id} down")
+        return True
+
+    def _sync_graph_edge(self, device1, device2):
+        """Keep one graph edge per connected device pair, for its oldest link."""
+        self._topology_edited()
+        link = self.links.first_between(device1, device2)
+        if link is None:
+            if self.graph.has_edge(device1.id, device2.id):
+                self.graph.remove_edge(device1.id, device2.id)
+        else:
+            self.graph.add_edge(device1.id, device2.id, type=link.type, link=link)
+
+    def _topology_edited(self):
+        self._routes.clear()
+        self._failure_report = None
+
+    @property
+    def packets_sent(self):
+        """Packets (requests and replies) put on the wire so far."""
+        return self._next_packet_id - 1
+
+    def failure_report(self):
+        """Bridges and articulation points with the pairs each disconnects (see failures.py).
+
+        Computed in O(V + E) on first use and cached until the next topology edit.
+        """
+        with self.lock:
+            if self._failure_report is None:
+                self._failure_report = analyze_failures(self)
+            return self._failure_report
+
+    def set_routing(self, protocol):
+        """Switch the control plane to 'rip' or 'ospf', or off with None.
+
+        A new protocol starts cold and converges on the current topology;
+        returns its ConvergenceReport (None when switching off).
+        """
+        with self.lock:
+            self._routes.clear()
+            self._routing_causes = []  # A new protocol converges on the whole topology anyway
+            if protocol is None:
+                self.routing = None
+                return None
+            self.routing = create_control_plane(self, protocol)
+            return self.routing.sync(f"{protocol.upper()} start")
+
+    @contextmanager
+    def batch(self):
+        """Hold the lock for a run of edits and converge routing once, after the last.
+
+        Without it, every device or link added with a protocol running
+        re-diffs the whole topology; loading a file or adding devices in
+        bulk goes through this instead. Batches nest; a route lookup inside
+        one converges the edits made so far first.
+        """
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._flush_routing()
+
+    def _sync_routing(self, cause):
+        if self.routing is None:
+            return
+        if self._batch_depth:
+            self._routing_causes.append(cause)
+        else:
+            self.routing.sync(cause)
+
+    def _flush_routing(self):
+        causes, self._routing_causes = self._routing_causes, []
+        if causes and self.routing is not None:
+            if len(causes) == 1:
+                self.routing.sync(causes[0])
+            else:
+                self.routing.sync(f"{len(causes)} edits ({causes[0]} ... {causes[-1]})")
+
+    def set_address(self, device, ip_address, subnet_mask=None):
+        """Change a device's IP (and mask) and keep the pools and search index in step.
+
+        Raises ValueError for a malformed address or mask, or an IP that is
+        already in use.
+        """
+        ip = parse_ip(ip_address)
+        prefix = device._prefix if subnet_mask is None else parse_mask(subnet_mask)
+        with self.lock:
+            if ip != device.ip_int:
+                owner = self._by_ip.get(ip)
+                if owner is not None:
+                    raise ValueError(f"{ip_address} is already used by {owner.device_type} {owner.id}")
+                if not self.addresses.reserve(ip):
+                    raise ValueError(f"{ip_address} is the network or broadcast address of a pool")
+                self.addresses.release(device.ip_int)
+                del self._by_ip[device.ip_int]
+                self._by_ip[ip] = device
+                device._ip = ip
+            device._prefix = prefix
+            self.index.update(device)
+
+    def find_by_ip(self, ip):
+        """Return the device with the given IP address, or None."""
+        try:
+            ip = parse_ip(ip)
+        except ValueError:
+            return None
+        with self.lock:
+            return self._by_ip.get(ip)
+
+    def shortest_path(self, src_device, dest_device):
+        """Return the list of device ids from src to dest, or None if unreachable."""
+        with self.lock:
+            if self.routing is not None:
+                self._flush_routing()
+                return self.routing.path(src_device.id, dest_device.id)
+            if not nx.has_path(self.graph, src_device.id, dest_device.id):
+                return None
+            return nx.shortest_path(self.graph, src_device.id, dest_device.id)
+
+    def route(self, src_device, dest_device):
+        """The Route packets take from src to dest, or None if unreachable.
+
+        Routes are cached until the next topology edit, so repeated packets
+        between the same devices skip the path search and link lookups.
+        """
+        key = (src_device.id, dest_device.id)
+        with self.lock:
+            route = self._routes.get(key)
+            if route is None:
+                path = self.shortest_path(src_device, dest_device)
+                if path is None:
+                    return None
+                links = self.path_links(path)
+                route = Route(path, links, sum(link.latency for link in links))
+                if len(self._routes) >= ROUTE_CACHE_SIZE:
+                    self._routes.clear()
+                self._routes[key] = route
+        return route
+
+    def path_links(self, path):
+        """The link that carries each hop along a path of device ids."""
+        with self.lock:
+            return [self.graph[path[i]][path[i + 1]]["link"] for i in range(len(path) - 1)]
+
+    def transmit(self, path, protocol, hop_links=None, reply=False):
+        """Carry one packet along a path of device ids, advancing the clock per hop.
+
+        Emits ENQUEUE, one HOP per link and DELIVER (ACK for a reply) to the
+        listeners, and counts the packet on every link it crosses. Returns the
+        packet's total one-way delay in milliseconds, or None if its TTL ran
+        out on the way; then it is counted as a drop on the link it would have
+        been sent out on next, and DROP is emitted instead of DELIVER.
+        """
+        if hop_links is None:
+            hop_links = self.path_links(path)
+        size = PACKET_BYTES.get((protocol, reply), 0)
+        with self.lock:
+            packet_id = self._next_packet_id
+            self._next_packet_id += 1
+            src, dest = path[0], path[-1]
+            self._emit(EVENT_ENQUEUE, src, dest, packet_id, protocol, 1 if reply else 0)
+            total_delay = 0
+            for hop, link in enumerate(hop_links):
+                if hop == INITIAL_TTL - 1:
+                    # The device at this hop would forward it with a TTL of zero
+                    link.drops += 1
+                    self._emit(EVENT_DROP, path[hop], dest, packet_id, protocol, hop, total_delay)
+                    return None
+                # The link's own latency and this packet's serialization and jitter
+                delay = hop_delay(link, size, self.rng_delay)
+                total_delay += delay
+                self.clock += delay
+                link.packets += 1
+                link.bytes += size
+                self._emit(EVENT_HOP, path[hop], path[hop + 1], packet_id, protocol, min(hop, 0xffff), delay)
+            self._emit(EVENT_ACK if reply else EVENT_DELIVER, src, dest, packet_id, protocol, 0, total_delay)
+        return total_delay
@@ -0,0 +1,206 @@
+"""Headless command-line entry point.
+
+Run a file of terminal commands against a topology without opening any
+windows, e.g. from the PaketTracerProject directory::
+
+    python -m packettracer run script.txt --topology lab.json
+    python -m packettracer run script.txt --topology lab.json --output results.txt
+    python -m packettracer run script.txt --seed 42 --trace run.trace
+    python -m packettracer run script.txt --topology lab.json --pcap run.pcap
+    python -m packettracer replay run.trace --from 1500 --speed 10
+    python -m packettracer serve --socket /tmp/packettracer.sock --topology lab.json
+    python -m packettracer traffic --topology big.json --flows 200000 --workers 8
+"""
+import argparse
+import sys
+
+from commands import CommandInterpreter
+from control import ControlServer
+from eventlog import TraceReader, format_event
+from network import Network
+from parallel import ParallelSimulation, random_flows
+from topology import load_topology
+
+
+def run(args):
+    """Execute every command in the script, in order.
+
+    Returns 0 if every command succeeded, 1 if any failed (so a script can
+    fail a CI job) and 2 if the script, topology or output cannot be opened.
+    """
+    network = Network(args.seed)
+    try:
+        if args.topology:
+            load_topology(args.topology, network)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"packettracer: cannot load topology {args.topology}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        script = sys.stdin if args.script == "-" else open(args.script, encoding="utf-8")
+    except OSError as e:
+        print(f"packettracer: cannot read script {args.script}: {e}", file=sys.stderr)
+        return 2
+    try:
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    except OSError as e:
+        print(f"packettracer: cannot write output {args.output}: {e}", file=sys.stderr)
+        if script is not sys.stdin:
+            script.close()
+        return 2
+    failed = 0
+    try:
+        def write(line):
+            out.write(line + "\n")
+
+        interpreter = CommandInterpreter(network, write)
+        setup = []
+        if args.trace:
+            # Started before the first command so the trace has the whole run
+            setup.append(f"trace start {args.trace}")
+        if args.pcap:
+            setup.append(f"capture start {args.pcap}")
+        for command in setup:
+            if not interpreter.execute(command):
+                failed += 1
+        for line in script:
+            command = line.strip()
+            if not command or command.startswith("#"):
+                continue  # Blank lines and comments
+            if args.echo:
+                write(f"> {command}")
+            if not interpreter.execute(command):
+                failed += 1
+        if interpreter.recorder is not None:
+            interpreter.stop_trace()
+        if interpreter.capture is not None:
+            interpreter.stop_capture()
+    finally:
+        if script is not sys.stdin:
+            script.close()
+        if out is not sys.stdout:
+            out.close()
+    if failed:
+        print(f"packettracer: {failed} command(s) failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+def replay(args):
+    """Print the events of a trace file, optionally paced and from a timestamp."""
+    try:
+        reader = TraceReader(args.trace)
+    except (OSError, ValueError) as e:
+        print(f"packettracer: cannot read trace {args.trace}: {e}", file=sys.stderr)
+        return 2
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        out.write(f"# seed {reader.seed}, {len(reader)} events, {reader.duration:.3f}ms\n")
+        if args.start:
+            devices, links = reader.topology_at(args.start)
+            out.write(f"# topology at {args.start:.3f}ms: {len(devices)} devices, {len(links)} links\n")
+        reader.replay(lambda event: out.write(format_event(event) + "\n"),
+                      start_ms=args.start, end_ms=args.end, speed=args.speed)
+    finally:
+        reader.close()
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def serve(args):
+    """Accept JSON-lines commands on a Unix-domain socket until interrupted."""
+    network = Network(args.seed)
+    try:
+        if args.topology:
+            load_topology(args.topology, network)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"packettracer: cannot load topology {args.topology}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        server = ControlServer(network, args.socket)
+    except OSError as e:
+        print(f"packettracer: cannot listen on {args.socket}: {e}", file=sys.stderr)
+        return 2
+    print(f"packettracer: listening on {args.socket}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def traffic(args):
+    """Simulate random bulk traffic over the topology on several worker processes."""
+    network = Network(args.seed)
+    try:
+        load_topology(args.topology, network)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"packettracer: cannot load topology {args.topology}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        flows = random_flows(network, args.flows, args.duration, args.protocol)
+    except ValueError as e:
+        print(f"packettracer: {e}", file=sys.stderr)
+        return 2
+    report = ParallelSimulation(network, args.workers).run(flows)
+    for line in report.lines():
+        print(line)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="packettracer", description="Headless Network Simulator.")
+    subcommands = parser.add_subparsers(dest="subcommand", required=True)
+
+    run_parser = subcommands.add_parser("run", help="run a file of terminal commands")
+    run_parser.add_argument("script", help="file with one terminal command per line ('-' for stdin)")
+    run_parser.add_argument("--topology", help="topology JSON file to load first")
+    run_parser.add_argument("--output", help="write results here instead of stdout")
+    run_parser.add_argument("--echo", action="store_true", help="print each command before its output")
+    run_parser.add_argument("--seed", type=int, help="seed for the simulation's random streams")
+    run_parser.add_argument("--trace", help="record every simulation event to this trace file")
+    run_parser.add_argument("--pcap", help="write every simulated packet to this pcap file")
+    run_parser.set_defaults(func=run)
+
+    replay_parser = subcommands.add_parser("replay", help="play back a recorded trace")
+    replay_parser.add_argument("trace", help="trace file written by --trace or 'trace start'")
+    replay_parser.add_argument("--from", dest="start", type=float, default=0.0,
+                               help="seek to this simulation time (ms) first")
+    replay_parser.add_argument("--to", dest="end", type=float, help="stop after this simulation time (ms)")
+    replay_parser.add_argument("--speed", type=float, default=0.0,
+                               help="playback speed relative to simulation time (0 = as fast as possible)")
+    replay_parser.add_argument("--output", help="write events here instead of stdout")
+    replay_parser.set_defaults(func=replay)
+
+    serve_parser = subcommands.add_parser("serve", help="take JSON-lines commands on a control socket")
+    serve_parser.add_argument("--socket", required=True, help="path of the Unix-domain socket to create")
+    serve_parser.add_argument("--topology", help="topology JSON file to load first")
+    serve_parser.add_argument("--seed", type=int, help="seed for the simulation's random streams")
+    serve_parser.set_defaults(func=serve)
+
+    traffic_parser = subcommands.add_parser("traffic", help="simulate bulk traffic on parallel workers")
+    traffic_parser.add_argument("--topology", required=True, help="topology JSON file to load")
+    traffic_parser.add_argument("--flows", type=int, default=10000, help="number of packets to send")
+    traffic_parser.add_argument("--duration", type=float, default=1000.0,
+                                help="spread the packets' start times over this many ms")
+    traffic_parser.add_argument("--protocol", choices=("ICMP", "TCP", "UDP", "MIX"), default="ICMP",
+                                type=str.upper, help="packet protocol (MIX picks one per packet)")
+    traffic_parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    traffic_parser.add_argument("--seed", type=int, help="seed for the flows and the simulation")
+    traffic_parser.set_defaults(func=traffic)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
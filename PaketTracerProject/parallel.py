@@ -0,0 +1,462 @@
+"""Partitioned parallel simulation of bulk traffic on very large topologies.
+
+The topology is split into shards (whole connected components where they
+fit, otherwise contiguous BFS regions refined to cut few links) and each
+shard runs in its own worker process. Workers simulate the packets inside
+their shard in timestamp order and hand packets that cross a cut link to
+the shard on the other side.
+
+Synchronization is conservative and runs in rounds: a packet needs at least
+the lookahead (the smallest possible delay of any cut link) to reach another
+shard, so every worker can safely process all events earlier than the
+global earliest event time plus the lookahead before the next exchange. The
+result does not depend on the number of workers: per-hop jitter is a hash
+of the seed, packet and hop instead of a shared random stream.
+
+The traffic model is the one Network.transmit uses (the links' latency
+model, see latency.py), plus FIFO queueing: a link direction sends one
+packet at a time, so packets wait for the link to finish serializing the
+previous one. Packets take shortest paths (routing
+protocols are not consulted) and the network's listeners are not told about
+individual packets; the links' counters and the clock are updated at the end.
+"""
+import heapq
+import math
+import multiprocessing
+import random
+import time
+from collections import deque
+
+from eventlog import PROTO_ICMP, PROTO_TCP, PROTO_UDP, INITIAL_TTL
+from network import PACKET_BYTES
+
+REFINE_PASSES = 2  # Boundary refinement sweeps after the initial partition
+IMBALANCE = 1.03  # A shard may grow to this much above the average size while refining
+
+MASK64 = (1 << 64) - 1
+
+
+def _unit_hash(seed, packet_id, hop):
+    """A uniform number in [0, 1) from (seed, packet, hop), via the splitmix64 finalizer."""
+    x = (seed * 0x9E3779B97F4A7C15 + packet_id * 0xBF58476D1CE4E5B9 + hop * 0x94D049BB133111EB) & MASK64
+    x = (x ^ (x >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94D049BB133111EB & MASK64
+    return (x ^ (x >> 31)) / 18446744073709551616.0
+
+
+def transit_adjacency(adjacency):
+    """Adjacency without degree-1 nodes, which can be endpoints but never carry transit traffic."""
+    return {node: [neighbour for neighbour in neighbours if len(adjacency[neighbour]) > 1]
+            for node, neighbours in adjacency.items() if len(neighbours) > 1}
+
+
+def shortest_path(adjacency, transit, src, dst):
+    """Hop-count shortest path by bidirectional BFS, or None if unreachable.
+
+    The search runs on ``transit`` (see transit_adjacency); a leaf endpoint
+    is first replaced by its only neighbour, so end devices hanging off
+    routers and switches are never explored.
+    """
+    head, tail = [], []
+    if len(adjacency[src]) == 1 and src != dst:
+        head.append(src)
+        src = adjacency[src][0]
+    if len(adjacency[dst]) == 1 and src != dst:
+        tail.append(dst)
+        dst = adjacency[dst][0]
+    if src == dst:
+        return head + [src] + tail
+    forward, backward = {src: None}, {dst: None}
+    forward_fringe, backward_fringe = [src], [dst]
+    while forward_fringe and backward_fringe:
+        # Grow the smaller side by one level
+        if len(forward_fringe) <= len(backward_fringe):
+            fringe, forward_fringe = forward_fringe, []
+            for node in fringe:
+                for neighbour in transit.get(node, ()):
+                    if neighbour not in forward:
+                        forward[neighbour] = node
+                        forward_fringe.append(neighbour)
+                    if neighbour in backward:
+                        return head + _join(forward, backward, neighbour) + tail
+        else:
+            fringe, backward_fringe = backward_fringe, []
+            for node in fringe:
+                for neighbour in transit.get(node, ()):
+                    if neighbour not in backward:
+                        backward[neighbour] = node
+                        backward_fringe.append(neighbour)
+                    if neighbour in forward:
+                        return head + _join(forward, backward, neighbour) + tail
+    return None
+
+
+def _join(forward, backward, meet):
+    path = []
+    node = meet
+    while node is not None:
+        path.append(node)
+        node = forward[node]
+    path.reverse()
+    node = backward[meet]
+    while node is not None:
+        path.append(node)
+        node = backward[node]
+    return path
+
+
+def partition(adjacency, shards):
+    """Assign every node to one of ``shards`` shards of near-equal size.
+
+    Nodes are laid out component by component, largest first, in BFS order
+    and the order is cut into equal runs, so small components stay whole and
+    large ones are split along BFS levels. Boundary nodes are then moved to
+    the neighbouring shard holding most of their neighbours, as long as that
+    shard stays within IMBALANCE of the average. Runs in O(V + E) per pass.
+    Returns {node: shard index}.
+    """
+    order = []
+    seen = set()
+    components = []
+    for start in adjacency:
+        if start in seen:
+            continue
+        # Start from a far node of the component so BFS levels make thin slices
+        component = _bfs(adjacency, start)
+        seen.update(component)
+        components.append(_bfs(adjacency, component[-1]))
+    components.sort(key=len, reverse=True)
+    for component in components:
+        order.extend(component)
+
+    total = len(order)
+    size = max(1, math.ceil(total / shards))
+    owner = {node: min(position // size, shards - 1) for position, node in enumerate(order)}
+    counts = [0] * shards
+    for shard in owner.values():
+        counts[shard] += 1
+
+    limit = math.ceil(total / shards * IMBALANCE)
+    for _ in range(REFINE_PASSES):
+        moved = 0
+        for node in order:
+            home = owner[node]
+            tally = {}
+            for neighbour in adjacency[node]:
+                shard = owner[neighbour]
+                tally[shard] = tally.get(shard, 0) + 1
+            if not tally or (len(tally) == 1 and home in tally):
+                continue  # Isolated or interior node
+            best = max(tally, key=lambda shard: (tally[shard], shard == home))
+            if best != home and tally[best] > tally.get(home, 0) and counts[best] < limit and counts[home] > 1:
+                owner[node] = best
+                counts[best] += 1
+                counts[home] -= 1
+                moved += 1
+        if not moved:
+            break
+    return owner
+
+
+def _bfs(adjacency, start):
+    order = [start]
+    seen = {start}
+    queue = deque((start,))
+    while queue:
+        for neighbour in adjacency[queue.popleft()]:
+            if neighbour not in seen:
+                seen.add(neighbour)
+                order.append(neighbour)
+                queue.append(neighbour)
+    return order
+
+
+def random_flows(network, count, duration_ms, protocol="ICMP", seed=None):
+    """``count`` packets between random device pairs, started over ``duration_ms``.
+
+    ``protocol`` is ICMP, TCP, UDP or MIX. Returns a list of
+    (start time ms, source id, destination id, protocol number) sorted by time.
+    """
+    protocols = {"ICMP": (PROTO_ICMP,), "TCP": (PROTO_TCP,), "UDP": (PROTO_UDP,),
+                 "MIX": (PROTO_ICMP, PROTO_TCP, PROTO_UDP)}[protocol.upper()]
+    with network.lock:
+        devices = list(network.devices)
+    if len(devices) < 2:
+        raise ValueError("Traffic needs at least two devices.")
+    rng = random.Random(network.seed if seed is None else seed)
+    flows = []
+    for _ in range(count):
+        src, dst = rng.sample(devices, 2)
+        flows.append((rng.uniform(0, duration_ms), src, dst, rng.choice(protocols)))
+    flows.sort()
+    return flows
+
+
+class TrafficReport:
+    """Totals of one parallel traffic run."""
+
+    def __init__(self, flows, shards, cut_links, lookahead):
+        self.flows = flows
+        self.shards = shards
+        self.cut_links = cut_links
+        self.lookahead = lookahead
+        self.delivered = 0     # Packets (replies included) that reached their destination
+        self.completed = 0     # Flows finished: UDP delivered, ICMP/TCP reply back at the source
+        self.dropped = 0       # TTL expired
+        self.unreachable = 0   # No path at the start
+        self.latency_sum = 0.0  # Over completed flows: one-way for UDP, round trip otherwise
+        self.latency_max = 0.0
+        self.events = 0
+        self.rounds = 0
+        self.crossings = 0  # Packets handed from one shard to another
+        self.end_ms = 0.0   # Simulation time of the last event, from the start of the run
+        self.serial_fallback = False  # Ran on one worker because no cut left a positive lookahead
+        self.seconds = 0.0
+
+    def merge(self, totals):
+        delivered, completed, dropped, unreachable, latency_sum, latency_max, events, end = totals
+        self.delivered += delivered
+        self.completed += completed
+        self.dropped += dropped
+        self.unreachable += unreachable
+        self.latency_sum += latency_sum
+        self.latency_max = max(self.latency_max, latency_max)
+        self.events += events
+        self.end_ms = max(self.end_ms, end)
+
+    def lines(self):
+        lookahead = "unbounded" if self.lookahead == math.inf else f"{self.lookahead:.2f}ms"
+        lines = [
+            f"Traffic: {self.flows} flows on {self.shards} shards "
+            f"({self.cut_links} links cut, lookahead {lookahead}).",
+            f"Completed {self.completed}, dropped {self.dropped} (TTL expired), unreachable {self.unreachable}; "
+            f"{self.delivered} packets delivered.",
+        ]
+        if self.serial_fallback:
+            lines.append("Ran on one worker: some links have no minimum delay, so shards cannot run ahead safely.")
+        if self.completed:
+            lines.append(f"Latency: avg {self.latency_sum / self.completed:.2f}ms, max {self.latency_max:.2f}ms "
+                         f"(round trip for ICMP/TCP, one way for UDP).")
+        rate = self.events / self.seconds if self.seconds else 0
+        lines.append(f"Simulated {self.end_ms:.1f}ms in {self.seconds:.2f}s: {self.events} hop events "
+                     f"({rate:.0f}/s), {self.rounds} sync rounds, {self.crossings} shard crossings.")
+        return lines
+
+
+class Shard:
+    """The part of the simulation one worker owns: its nodes' events and outgoing links.
+
+    Events are (time, packet id, hop index, protocol, path, send time).
+    A hop index of -1 marks a flow not yet started; its "path" is then
+    (source, destination). Request packet ids are even and their replies
+    odd, so ordering ties break the same way on any number of workers.
+    """
+
+    def __init__(self, index, owner, adjacency, transit, hops, flows, seed):
+        self.index = index
+        self.owner = owner
+        self.adjacency = adjacency
+        self.transit = transit
+        self.hops = hops  # (from node, to node) -> (link id, latency, jitter, ms per byte)
+        self.seed = seed
+        self.queue = [(start, flow_id * 2, -1, protocol, (src, dst), start)
+                      for flow_id, (start, src, dst, protocol) in flows]
+        heapq.heapify(self.queue)
+        self.busy = {}  # (from node, to node) -> time the link finishes its current packet
+        self.links = {}  # link id -> [packets, bytes, drops]
+        self.totals = [0, 0, 0, 0, 0.0, 0.0, 0, 0.0]  # See TrafficReport.merge
+
+    def next_time(self):
+        return self.queue[0][0] if self.queue else math.inf
+
+    def advance(self, until, inbox=()):
+        """Process every event before ``until``; return the events for other shards."""
+        queue, owner, hops, busy, links, totals = (
+            self.queue, self.owner, self.hops, self.busy, self.links, self.totals)
+        for event in inbox:
+            heapq.heappush(queue, event)
+        outbox = []
+        while queue and queue[0][0] < until:
+            now, packet_id, hop, protocol, path, sent = heapq.heappop(queue)
+            totals[7] = now
+            if hop < 0:
+                path = shortest_path(self.adjacency, self.transit, path[0], path[1])
+                if path is None:
+                    totals[3] += 1
+                    continue
+                hop = 0
+            node = path[hop]
+
+            if hop == len(path) - 1:
+                totals[0] += 1
+                if packet_id % 2 == 0 and protocol != PROTO_UDP:
+                    # Echo reply / ACK straight back along the reversed path
+                    heapq.heappush(queue, (now, packet_id + 1, 0, protocol, path[::-1], sent))
+                    continue
+                latency = now - sent
+                totals[1] += 1
+                totals[4] += latency
+                if latency > totals[5]:
+                    totals[5] = latency
+                continue
+
+            following = path[hop + 1]
+            link_id, latency, jitter, ms_per_byte = hops[node, following]
+            counters = links.get(link_id)
+            if counters is None:
+                counters = links[link_id] = [0, 0, 0]
+            if hop == INITIAL_TTL - 1:
+                counters[2] += 1
+                totals[2] += 1
+                continue
+
+            size = PACKET_BYTES.get((protocol, packet_id % 2 == 1), 0)
+            depart = busy.get((node, following), 0.0)
+            if depart < now:
+                depart = now
+            done = depart + size * ms_per_byte
+            busy[node, following] = done
+            jitter *= 2 * _unit_hash(self.seed, packet_id, hop) - 1
+            event = (done + latency + jitter, packet_id, hop + 1, protocol, path, sent)
+            counters[0] += 1
+            counters[1] += size
+            totals[6] += 1
+
+            shard = owner[following]
+            if shard == self.index:
+                heapq.heappush(queue, event)
+            else:
+                outbox.append((shard, event))
+        return outbox, self.next_time()
+
+    def results(self):
+        return self.totals, self.links
+
+
+def _worker(connection, shard):
+    """Worker process: advance the shard each round until told to stop."""
+    while True:
+        message = connection.recv()
+        if message is None:
+            connection.send(shard.results())
+            connection.close()
+            return
+        until, inbox = message
+        connection.send(shard.advance(until, inbox))
+
+
+class ParallelSimulation:
+    """Run bulk traffic over a snapshot of a Network, one shard per worker process."""
+
+    def __init__(self, network, workers=None):
+        self.network = network
+        self.workers = max(1, workers or multiprocessing.cpu_count())
+
+    def _snapshot(self):
+        """Adjacency lists and per-direction link parameters of the current topology."""
+        network = self.network
+        with network.lock:
+            adjacency = {node: list(network.graph[node]) for node in network.graph}
+            hops = {}
+            for u, v, data in network.graph.edges(data=True):
+                link = data["link"]
+                parameters = (link.id, link.latency, link.jitter, link.ms_per_byte)
+                hops[u, v] = parameters
+                hops[v, u] = parameters
+            seed = network.seed
+        return adjacency, hops, seed
+
+    def run(self, flows):
+        """Simulate the flows (see random_flows) and return a TrafficReport.
+
+        Flow start times are relative to the network clock, which ends up
+        at the time of the last event; link counters are added to the links.
+        """
+        started = time.perf_counter()
+        adjacency, hops, seed = self._snapshot()
+        shards = min(self.workers, max(1, len(adjacency)))
+        owner = partition(adjacency, shards)
+
+        # Lookahead: the least time a packet can take over any cut link
+        cut = {parameters for (u, v), parameters in hops.items() if owner[u] != owner[v]}
+        lookahead = min((latency - jitter for _, latency, jitter, _ in cut), default=math.inf)
+        serial = shards > 1 and lookahead <= 0
+        if serial:
+            # A cut link that can take no time gives the shards no safe window
+            # to run ahead in, so the rounds would never advance: run on one worker
+            shards = 1
+            owner = dict.fromkeys(adjacency, 0)
+            cut = set()
+            lookahead = math.inf
+        report = TrafficReport(len(flows), shards, len(cut), lookahead)
+        report.serial_fallback = serial
+
+        shard_flows = [[] for _ in range(shards)]
+        for flow_id, flow in enumerate(flows):
+            shard_flows[owner[flow[1]]].append((flow_id, flow))
+        transit = transit_adjacency(adjacency)
+        parts = [Shard(i, owner, adjacency, transit, hops, shard_flows[i], seed) for i in range(shards)]
+
+        if shards == 1:
+            parts[0].advance(math.inf)
+            results = [parts[0].results()]
+        else:
+            results = self._run_workers(parts, lookahead, report)
+
+        for totals, links in results:
+            report.merge(totals)
+            with self.network.lock:
+                for link_id, (packets, sent, drops) in links.items():
+                    link = self.network.links.get(link_id)
+                    if link is not None:
+                        link.packets += packets
+                        link.bytes += sent
+                        link.drops += drops
+        with self.network.lock:
+            self.network.clock += report.end_ms
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _run_workers(self, parts, lookahead, report):
+        # Fork where the platform has it, so workers inherit the snapshot instead of unpickling it
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        connections, processes = [], []
+        for shard in parts:
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(child, shard), daemon=True)
+            process.start()
+            child.close()
+            connections.append(parent)
+            processes.append(process)
+
+        try:
+            next_times = [shard.next_time() for shard in parts]
+            pending = [[] for _ in parts]
+            while True:
+                earliest = min(next_times + [event[0] for inbox in pending for event in inbox])
+                if earliest == math.inf:
+                    break
+                until = earliest + lookahead
+                # Shards with nothing before the horizon sit the round out
+                active = [i for i in range(len(parts)) if pending[i] or next_times[i] < until]
+                for i in active:
+                    connections[i].send((until, pending[i]))
+                    pending[i] = []
+                for i in active:
+                    outbox, next_times[i] = connections[i].recv()
+                    report.crossings += len(outbox)
+                    for shard, event in outbox:
+                        pending[shard].append(event)
+                report.rounds += 1
+
+            results = []
+            for connection in connections:
+                connection.send(None)
+                results.append(connection.recv())
+            return results
+        finally:
+            for process in processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
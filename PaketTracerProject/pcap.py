@@ -0,0 +1,171 @@
+"""Stream simulated traffic to a pcap file that Wireshark can open.
+
+Every hop of every simulated packet becomes one Ethernet frame carrying a
+real IPv4 + ICMP/TCP/UDP packet between the two end devices' IP addresses,
+with the MAC addresses of the two devices on that hop. Frames are built by
+patching a few fields into a per-protocol template instead of packing whole
+headers, so capturing keeps up with the simulation.
+"""
+import struct
+
+from eventlog import (
+    EVENT_ENQUEUE, EVENT_HOP, EVENT_DELIVER, EVENT_ACK, EVENT_DROP,
+    PROTO_ICMP, PROTO_TCP, PROTO_UDP, INITIAL_TTL,
+)
+
+PCAP_HEADER = struct.Struct("<IHHiIII")  # magic, version, zone, sigfigs, snaplen, linktype
+PCAP_MAGIC = 0xa1b2c3d4  # Microsecond timestamps
+LINKTYPE_ETHERNET = 1
+SNAPLEN = 65535
+
+SERVER_PORT = 9  # TCP/UDP "discard": the simulated packets carry no real application
+CLIENT_PORT_BASE = 49152  # Ephemeral ports, one per source device
+PAYLOAD = b"abcdefghijklmnopqrstuvwabcdefghi"  # 32 bytes, like a Windows ping
+
+# Offsets into a frame buffer, which starts with the 16-byte pcap record header
+RECORD = struct.Struct("<IIII")  # seconds, microseconds, captured length, length
+ETH = RECORD.size
+IP = ETH + 14
+L4 = IP + 20
+IP_ID = IP + 4
+IP_TTL = IP + 8
+IP_CHECKSUM = IP + 10
+IP_ADDRESSES = IP + 12
+
+TIMESTAMP = struct.Struct("<II")
+CHECKSUM = struct.Struct(">H")
+
+TCP_PSH_ACK = 0x18
+TCP_ACK = 0x10
+
+BUFFER_SIZE = 1 << 20
+
+
+def _template(protocol, reply):
+    """Frame buffer for one kind of packet, with every constant field filled in.
+
+    Returns (frame, L4 length). TCP replies are bare ACKs without payload.
+    """
+    if protocol == PROTO_ICMP:
+        l4 = struct.pack(">BBHHH", 0 if reply else 8, 0, 0, 0, 0) + PAYLOAD
+    elif protocol == PROTO_TCP:
+        l4 = struct.pack(">HHIIBBHHH", 0, 0, 0, 0, 5 << 4, TCP_ACK if reply else TCP_PSH_ACK, 65535, 0, 0)
+        if not reply:
+            l4 += PAYLOAD
+    else:
+        l4 = struct.pack(">HHHH", 0, 0, 8 + len(PAYLOAD), 0) + PAYLOAD
+    ip_length = 20 + len(l4)
+    frame = bytearray(RECORD.size + 14 + ip_length)
+    struct.pack_into(">H", frame, ETH + 12, 0x0800)  # EtherType IPv4
+    # Version/IHL, total length, don't-fragment flag, protocol
+    struct.pack_into(">BBHHHBB", frame, IP, 0x45, 0, ip_length, 0, 0x4000, INITIAL_TTL, protocol)
+    frame[L4:] = l4
+    return frame, len(l4)
+
+
+def _ones_complement(total):
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+class PcapWriter:
+    """Network listener that writes every packet hop as a pcap frame.
+
+    Attach it with ``network.listeners.append(writer)`` like a
+    TraceRecorder. A packet's headers are filled in once, when it is
+    enqueued; each hop then only patches the timestamp, the MAC addresses,
+    the TTL and the IP checksum before the frame is written.
+    """
+
+    def __init__(self, path, network):
+        self.path = path
+        self.network = network
+        self._file = open(path, "wb", buffering=BUFFER_SIZE)
+        self._file.write(PCAP_HEADER.pack(PCAP_MAGIC, 2, 4, 0, 0, SNAPLEN, LINKTYPE_ETHERNET))
+        self._templates = {
+            (protocol, reply): _template(protocol, reply)
+            for protocol in (PROTO_ICMP, PROTO_TCP, PROTO_UDP) for reply in (False, True)
+        }
+        self._packets = {}  # packet id -> (frame, IP header sum without the TTL word, protocol)
+        self.count = 0
+
+    def record(self, time_ms, kind, a=0, b=0, c=0, code=0, index=0, value=0.0):
+        # The per-hop path runs for every frame, so it is kept to a few slice
+        # and pack_into calls with the ones' complement sum inlined
+        if kind == EVENT_HOP:
+            packet = self._packets.get(c)
+            if packet is None:
+                return  # Enqueued before the capture started
+            frame, ip_sum, protocol = packet
+            devices = self.network.devices
+            microseconds = int(time_ms * 1000)
+            TIMESTAMP.pack_into(frame, 0, microseconds // 1000000, microseconds % 1000000)
+            frame[ETH:ETH + 12] = devices[b].mac_bytes + devices[a].mac_bytes
+            ttl = INITIAL_TTL - index if index < INITIAL_TTL else 1
+            frame[IP_TTL] = ttl
+            total = ip_sum + (ttl << 8 | protocol)
+            total = (total & 0xffff) + (total >> 16)
+            total += total >> 16
+            CHECKSUM.pack_into(frame, IP_CHECKSUM, ~total & 0xffff)
+            self._file.write(frame)
+            self.count += 1
+        elif kind == EVENT_ENQUEUE:
+            self._enqueue(a, b, c, code, bool(index))
+        elif kind == EVENT_DELIVER or kind == EVENT_ACK or kind == EVENT_DROP:
+            self._packets.pop(c, None)
+
+    def _enqueue(self, src, dest, packet_id, protocol, reply):
+        """Fill in everything about a packet that stays the same on every hop."""
+        template = self._templates.get((protocol, reply))
+        src_device = self.network.devices.get(src)
+        dest_device = self.network.devices.get(dest)
+        if template is None or src_device is None or dest_device is None:
+            return
+        template, l4_length = template
+        frame = bytearray(template)
+        src_ip, dest_ip = src_device.ip_int, dest_device.ip_int
+        ident = packet_id & 0xffff
+        struct.pack_into(">H", frame, IP_ID, ident)
+        struct.pack_into(">II", frame, IP_ADDRESSES, src_ip, dest_ip)
+        struct.pack_into("<II", frame, 8, len(frame) - RECORD.size, len(frame) - RECORD.size)
+
+        # A reply answers the packet sent just before it (see CommandInterpreter)
+        client = dest if reply else src
+        asked = packet_id - 1 if reply else packet_id
+        if protocol == PROTO_ICMP:
+            struct.pack_into(">HH", frame, L4 + 4, client & 0xffff, asked & 0xffff)
+            pseudo = 0
+            checksum_at = L4 + 2
+        else:
+            client_port = CLIENT_PORT_BASE + client % (65536 - CLIENT_PORT_BASE)
+            ports = (SERVER_PORT, client_port) if reply else (client_port, SERVER_PORT)
+            struct.pack_into(">HH", frame, L4, *ports)
+            if protocol == PROTO_TCP:
+                sequence = asked * len(PAYLOAD) & 0xffffffff
+                if reply:
+                    struct.pack_into(">II", frame, L4 + 4, 1, sequence + len(PAYLOAD) & 0xffffffff)
+                else:
+                    struct.pack_into(">II", frame, L4 + 4, sequence, 1)
+                checksum_at = L4 + 16
+            else:
+                checksum_at = L4 + 6
+            # Pseudo-header: addresses, protocol and L4 length
+            pseudo = ((src_ip >> 16) + (src_ip & 0xffff) + (dest_ip >> 16) + (dest_ip & 0xffff)
+                      + protocol + l4_length)
+        # Every L4 length here is even, so the segment is whole 16-bit words
+        checksum = _ones_complement(pseudo + sum(struct.unpack_from(f">{l4_length // 2}H", frame, L4)))
+        if protocol == PROTO_UDP and checksum == 0:
+            checksum = 0xffff  # Zero means "no checksum" in UDP
+        struct.pack_into(">H", frame, checksum_at, checksum)
+
+        # The IP checksum covers every header word; all but TTL/protocol are fixed now
+        ip_sum = sum(struct.unpack_from(">10H", frame, IP)) - (frame[IP_TTL] << 8 | frame[IP_TTL + 1])
+        self._packets[packet_id] = (frame, ip_sum, protocol)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
@@ -0,0 +1,483 @@
+"""Opt-in routing control plane: RIP-like distance vector and OSPF-like link state.
+
+By default packets take a global shortest path. With a control plane
+attached (Network.set_routing), every device keeps a forwarding table built
+by the protocol, packets follow those tables hop by hop, and each topology
+edit is played through the protocol as a discrete-event simulation on the
+simulation clock: control messages cross links with the link's delay, and
+the run ends when no messages are left in flight. The result is a
+ConvergenceReport with the convergence time, control traffic and transient
+blackholes.
+
+Every device takes part (there are no subnets, so each device is its own
+destination) and the metric is the hop count in both protocols, like the
+default path selection.
+"""
+import heapq
+
+PROTOCOLS = ("rip", "ospf")
+
+PROCESSING_DELAY_MS = 1  # Time for a device to handle one control message
+
+RIP_INFINITY = 16  # Hop count meaning "unreachable", as in RIP
+RIP_UPDATE_HOLD_MS = 1000  # Minimum gap between one device's triggered updates
+RIP_ENTRIES_PER_MESSAGE = 25
+RIP_HEADER_BYTES = 32  # IP + UDP + RIP header
+RIP_ENTRY_BYTES = 20
+
+OSPF_SPF_DELAY_MS = 50  # Wait after the first LSA change before running SPF
+OSPF_SPF_HOLD_MS = 200  # Minimum gap between two SPF runs on one device
+OSPF_LSU_BYTES = 68  # IP + OSPF + LSA headers of an update carrying one LSA
+OSPF_LINK_BYTES = 12  # Per neighbour listed in a router LSA
+OSPF_ACK_BYTES = 64  # IP + OSPF header + the acknowledged LSA's header
+
+
+class ConvergenceReport:
+    """What one topology change cost the control plane."""
+
+    def __init__(self, protocol, cause, start):
+        self.protocol = protocol
+        self.cause = cause
+        self.start = start  # Simulation time of the change, ms
+        self.converged_at = start  # Time of the last forwarding table change
+        self.messages = 0
+        self.bytes = 0
+        self.route_changes = 0
+        self.blackholes = 0  # (device, destination) routes lost and later restored
+        self.blackhole_ms = 0.0  # Their total time without a route
+        self.longest_blackhole_ms = 0.0
+        self.unrestored = 0  # Lost routes to still-reachable destinations never restored
+
+    @property
+    def convergence_ms(self):
+        return self.converged_at - self.start
+
+    def add_blackhole(self, duration):
+        self.blackholes += 1
+        self.blackhole_ms += duration
+        self.longest_blackhole_ms = max(self.longest_blackhole_ms, duration)
+
+    def lines(self):
+        lines = [
+            f"{self.protocol.upper()} after {self.cause}: converged in {self.convergence_ms:.1f}ms "
+            f"({self.route_changes} route changes).",
+            f"Control traffic: {self.messages} messages, {self.bytes} bytes.",
+        ]
+        if self.blackholes:
+            lines.append(f"Transient blackholes: {self.blackholes} routes lost for "
+                         f"{self.blackhole_ms:.1f}ms in total (longest {self.longest_blackhole_ms:.1f}ms).")
+        else:
+            lines.append("Transient blackholes: none.")
+        if self.unrestored:
+            lines.append(f"{self.unrestored} routes to reachable devices were lost and not restored.")
+        return lines
+
+
+class ControlPlane:
+    """Shared machinery: topology diffing, the event queue and route bookkeeping.
+
+    Subclasses react to devices and links coming and going and to the
+    messages they send each other; they change forwarding entries only
+    through ``_set_route`` so blackholes and convergence are measured in
+    one place.
+    """
+
+    name = None
+
+    def __init__(self, network):
+        self.network = network
+        self.adjacency = {}  # device id -> {neighbour id: link delay in ms}
+        self.routes = {}     # device id -> {destination id: next hop id}
+        self.last_report = None
+        self._queue = []
+        self._sequence = 0  # Tie-breaker, so simultaneous events run in order
+        self._now = 0.0
+        self._report = None
+        self._lost = {}
+        self._component = {}
+
+    def sync(self, cause):
+        """Apply the network's current topology and simulate until the protocol is quiet.
+
+        Called by the Network (under its lock) after every topology edit.
+        """
+        graph = self.network.graph
+        self._now = self.network.clock
+        self._report = ConvergenceReport(self.name, cause, self._now)
+        self._lost = {}  # (device, destination) -> time the route was lost
+        self._component = self._components(graph)
+
+        added = [node for node in graph if node not in self.adjacency]
+        removed = [node for node in self.adjacency if node not in graph]
+        for node in added:
+            self.adjacency[node] = {}
+            self.routes[node] = {}
+            self._device_up(node)
+        changed = set(added)
+        for node, neighbours in self.adjacency.items():
+            if node in graph:
+                for neighbour in [n for n in neighbours if n not in graph[node]]:
+                    del neighbours[neighbour]
+                    self._link_down(node, neighbour)
+                    changed.add(node)
+        for node, neighbours in self.adjacency.items():
+            if node in graph:
+                for neighbour in graph[node]:
+                    if neighbour not in neighbours:
+                        neighbours[neighbour] = graph.edges[node, neighbour]["link"].latency
+                        self._link_up(node, neighbour)
+                        changed.add(node)
+        for node in removed:
+            del self.adjacency[node]
+            del self.routes[node]
+            self._device_down(node)
+        self._topology_changed(changed)
+        self._run()
+        # The protocol ran on the simulation clock; later events come after it
+        self.network.clock = max(self.network.clock, self._now)
+
+        report = self._report
+        for node, destination in self._lost:
+            if self._reachable(node, destination):
+                report.unrestored += 1
+        self.last_report = report
+        return report
+
+    def path(self, src, dest):
+        """Device ids from src to dest following the forwarding tables, or None.
+
+        None also covers a forwarding loop, which a converged table never has.
+        """
+        path = [src]
+        seen = {src}
+        node = src
+        while node != dest:
+            node = self.routes.get(node, {}).get(dest)
+            if node is None or node in seen:
+                return None
+            path.append(node)
+            seen.add(node)
+        return path
+
+    # Event queue
+
+    def _schedule(self, time, handler, *args):
+        self._sequence += 1
+        heapq.heappush(self._queue, (time, self._sequence, handler, args))
+
+    def _send(self, sender, receiver, size, handler, *args):
+        """Count one control message and deliver it to handler after the link delay."""
+        self._report.messages += 1
+        self._report.bytes += size
+        delay = self.adjacency[sender][receiver]
+        self._schedule(self._now + delay + PROCESSING_DELAY_MS, handler, sender, receiver, *args)
+
+    def _run(self):
+        while self._queue:
+            self._now, _, handler, args = heapq.heappop(self._queue)
+            handler(*args)
+
+    def _linked(self, sender, receiver):
+        """A message is only accepted over a link that still exists."""
+        return sender in self.adjacency.get(receiver, ())
+
+    # Forwarding entries
+
+    def _set_route(self, node, destination, next_hop):
+        table = self.routes[node]
+        if table.get(destination) == next_hop:
+            return
+        report = self._report
+        report.route_changes += 1
+        report.converged_at = self._now
+        if next_hop is None:
+            del table[destination]
+            if self._reachable(node, destination):
+                self._lost.setdefault((node, destination), self._now)
+        else:
+            table[destination] = next_hop
+            lost_at = self._lost.pop((node, destination), None)
+            if lost_at is not None:
+                report.add_blackhole(self._now - lost_at)
+
+    def _reachable(self, node, destination):
+        component = self._component.get(node)
+        return component is not None and component == self._component.get(destination)
+
+    @staticmethod
+    def _components(graph):
+        """Connected component number of every device, by iterative BFS."""
+        component = {}
+        for start in graph:
+            if start in component:
+                continue
+            number = len(component)
+            component[start] = number
+            frontier = [start]
+            while frontier:
+                node = frontier.pop()
+                for neighbour in graph[node]:
+                    if neighbour not in component:
+                        component[neighbour] = number
+                        frontier.append(neighbour)
+        return component
+
+    # Protocol hooks
+
+    def _device_up(self, node):
+        pass
+
+    def _device_down(self, node):
+        pass
+
+    def _link_down(self, node, neighbour):
+        pass
+
+    def _link_up(self, node, neighbour):
+        pass
+
+    def _topology_changed(self, nodes):
+        """Called once per sync with every device whose links changed."""
+
+
+class DistanceVector(ControlPlane):
+    """RIP-like: hop-count vectors with split horizon and poisoned reverse.
+
+    A device that loses a link drops the routes through it at once. Changes
+    go out as triggered updates carrying only the changed routes, at most
+    one per RIP_UPDATE_HOLD_MS per device; a new neighbour gets the whole
+    table. Routes longer than RIP_INFINITY - 1 hops are unreachable.
+
+    Real RIP also re-sends every table every 30 seconds, which is how a
+    device whose route got worse or was lost hears about alternatives
+    nobody had reason to announce. Instead of running that timer forever,
+    such a device sends its neighbours a request for those routes and they
+    answer from their tables: the same routes are found, just without the
+    wait.
+    """
+
+    name = "rip"
+
+    def __init__(self, network):
+        super().__init__(network)
+        self.metrics = {}  # device id -> {destination id: hop count}
+        self._pending = {}  # device id -> destinations changed since its last update
+        self._last_update = {}
+
+    def _device_up(self, node):
+        self.metrics[node] = {node: 0}
+
+    def _device_down(self, node):
+        del self.metrics[node]
+        self._pending.pop(node, None)
+        self._last_update.pop(node, None)
+
+    def _link_down(self, node, neighbour):
+        metrics = self.metrics[node]
+        lost = []
+        for destination, next_hop in list(self.routes[node].items()):
+            if next_hop == neighbour:
+                metrics[destination] = RIP_INFINITY
+                self._set_route(node, destination, None)
+                self._changed(node, destination)
+                lost.append(destination)
+        self._request(node, lost)
+
+    def _link_up(self, node, neighbour):
+        if self.metrics[node].get(neighbour, RIP_INFINITY) > 1:
+            self.metrics[node][neighbour] = 1
+            self._set_route(node, neighbour, neighbour)
+            self._changed(node, neighbour)
+        # The new neighbour hears the whole table straight away
+        table = [d for d, metric in self.metrics[node].items() if metric < RIP_INFINITY]
+        self._advertise(node, neighbour, table)
+
+    def _changed(self, node, destination):
+        pending = self._pending.setdefault(node, set())
+        if not pending:
+            # First change since the last update: schedule one
+            earliest = self._last_update.get(node, float("-inf")) + RIP_UPDATE_HOLD_MS
+            self._schedule(max(self._now, earliest), self._flush, node)
+        pending.add(destination)
+
+    def _flush(self, node):
+        destinations = self._pending.pop(node, None)
+        if not destinations or node not in self.adjacency:
+            return
+        self._last_update[node] = self._now
+        for neighbour in self.adjacency[node]:
+            self._advertise(node, neighbour, destinations)
+
+    def _advertise(self, node, neighbour, destinations):
+        metrics, routes = self.metrics[node], self.routes[node]
+        entries = [
+            # Poisoned reverse: never offer a neighbour the route it gave us
+            (d, RIP_INFINITY if routes.get(d) == neighbour else metrics.get(d, RIP_INFINITY))
+            for d in destinations
+        ]
+        for start in range(0, len(entries), RIP_ENTRIES_PER_MESSAGE):
+            chunk = entries[start:start + RIP_ENTRIES_PER_MESSAGE]
+            self._send(node, neighbour, RIP_HEADER_BYTES + RIP_ENTRY_BYTES * len(chunk),
+                       self._receive, chunk)
+
+    def _request(self, node, destinations):
+        """Ask every neighbour for its routes to destinations that just got worse."""
+        for start in range(0, len(destinations), RIP_ENTRIES_PER_MESSAGE):
+            chunk = destinations[start:start + RIP_ENTRIES_PER_MESSAGE]
+            for neighbour in self.adjacency[node]:
+                self._send(node, neighbour, RIP_HEADER_BYTES + RIP_ENTRY_BYTES * len(chunk),
+                           self._answer, chunk)
+
+    def _answer(self, sender, node, destinations):
+        if not self._linked(sender, node):
+            return
+        metrics = self.metrics[node]
+        known = [d for d in destinations if metrics.get(d, RIP_INFINITY) < RIP_INFINITY]
+        if known:
+            self._advertise(node, sender, known)
+
+    def _receive(self, sender, node, entries):
+        if not self._linked(sender, node):
+            return
+        metrics, routes = self.metrics[node], self.routes[node]
+        worse = []
+        for destination, metric in entries:
+            if destination == node:
+                continue
+            metric = min(metric + 1, RIP_INFINITY)
+            current = metrics.get(destination, RIP_INFINITY)
+            if routes.get(destination) == sender:
+                # News from our own next hop always wins, better or worse
+                if metric == current:
+                    continue
+                if metric > current:
+                    worse.append(destination)
+                metrics[destination] = metric
+                self._set_route(node, destination, sender if metric < RIP_INFINITY else None)
+            elif metric < current:
+                metrics[destination] = metric
+                self._set_route(node, destination, sender)
+            else:
+                continue
+            self._changed(node, destination)
+        self._request(node, worse)
+
+
+class LinkState(ControlPlane):
+    """OSPF-like: flooded router LSAs and a shortest-path-first run per device.
+
+    A device whose links change originates a new LSA (its neighbour list
+    with a higher sequence number) and floods it; every LSA received is
+    acknowledged, installed if newer and flooded on. SPF runs
+    OSPF_SPF_DELAY_MS after the first change, at most once per
+    OSPF_SPF_HOLD_MS. A link only counts when both ends list each other.
+    New neighbours exchange their whole databases.
+    """
+
+    name = "ospf"
+
+    def __init__(self, network):
+        super().__init__(network)
+        self.lsdb = {}  # device id -> {origin id: (sequence, neighbour ids)}
+        self._sequence_of = {}  # device id -> its own latest LSA sequence
+        self._spf_pending = set()
+        self._last_spf = {}
+
+    def _device_up(self, node):
+        self.lsdb[node] = {}
+        self._sequence_of.setdefault(node, 0)
+
+    def _device_down(self, node):
+        del self.lsdb[node]
+        self._spf_pending.discard(node)
+        self._last_spf.pop(node, None)
+
+    def _link_down(self, node, neighbour):
+        # The interface is gone: routes through it are withdrawn until SPF
+        for destination, next_hop in list(self.routes[node].items()):
+            if next_hop == neighbour:
+                self._set_route(node, destination, None)
+
+    def _link_up(self, node, neighbour):
+        # Database exchange: send the neighbour everything we know
+        for origin, (sequence, neighbours) in list(self.lsdb[node].items()):
+            self._send_lsa(node, neighbour, origin, sequence, neighbours)
+
+    def _topology_changed(self, nodes):
+        for node in sorted(nodes):
+            if node in self.lsdb:
+                self._originate(node)
+        # Flush the LSAs of devices that no longer exist
+        for database in self.lsdb.values():
+            for origin in [origin for origin in database if origin not in self.adjacency]:
+                del database[origin]
+
+    def _originate(self, node):
+        self._sequence_of[node] += 1
+        lsa = (self._sequence_of[node], frozenset(self.adjacency[node]))
+        self.lsdb[node][node] = lsa
+        for neighbour in self.adjacency[node]:
+            self._send_lsa(node, neighbour, node, *lsa)
+        self._schedule_spf(node)
+
+    def _send_lsa(self, node, neighbour, origin, sequence, neighbours):
+        self._send(node, neighbour, OSPF_LSU_BYTES + OSPF_LINK_BYTES * len(neighbours),
+                   self._receive, origin, sequence, neighbours)
+
+    def _receive(self, sender, node, origin, sequence, neighbours):
+        if not self._linked(sender, node):
+            return
+        # Acknowledge every LSA; acks need no processing, only counting
+        self._report.messages += 1
+        self._report.bytes += OSPF_ACK_BYTES
+        database = self.lsdb[node]
+        current = database.get(origin)
+        if origin == node or (current is not None and current[0] >= sequence):
+            return
+        database[origin] = (sequence, neighbours)
+        for neighbour in self.adjacency[node]:
+            if neighbour != sender:
+                self._send_lsa(node, neighbour, origin, sequence, neighbours)
+        self._schedule_spf(node)
+
+    def _schedule_spf(self, node):
+        if node in self._spf_pending:
+            return
+        self._spf_pending.add(node)
+        earliest = self._last_spf.get(node, float("-inf")) + OSPF_SPF_HOLD_MS
+        self._schedule(max(self._now + OSPF_SPF_DELAY_MS, earliest), self._spf, node)
+
+    def _spf(self, node):
+        if node not in self.lsdb:
+            return
+        self._spf_pending.discard(node)
+        self._last_spf[node] = self._now
+        database = self.lsdb[node]
+
+        # Breadth-first search over two-way links, remembering each
+        # destination's first hop
+        first_hop = {}
+        frontier = [node]
+        visited = {node}
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                for other in sorted(database.get(current, (0, ()))[1]):
+                    if other in visited or current not in database.get(other, (0, ()))[1]:
+                        continue
+                    visited.add(other)
+                    first_hop[other] = other if current == node else first_hop[current]
+                    next_frontier.append(other)
+            frontier = next_frontier
+
+        for destination in set(self.routes[node]) | set(first_hop):
+            self._set_route(node, destination, first_hop.get(destination))
+
+
+def create_control_plane(network, protocol):
+    """A fresh control plane for 'rip' or 'ospf'."""
+    if protocol == "rip":
+        return DistanceVector(network)
+    if protocol == "ospf":
+        return LinkState(network)
+    raise ValueError(f"Unknown routing protocol '{protocol}'")
@@ -0,0 +1,185 @@
+"""Incremental prefix index over device names and IP addresses."""
+import bisect
+import itertools
+
+
+def device_label(device):
+    """The name a device is shown and searched by, e.g. ``Router 12``."""
+    return f"{device.device_type} {device.id}"
+
+
+BLOCK_SIZE = 1000  # Target entries per block of a SortedBlocks; blocks split at twice this
+
+
+class SortedBlocks:
+    """A sorted sequence of tuples kept as a list of short sorted blocks.
+
+    Inserting or deleting only shifts the entries of one block, so an edit
+    costs O(log n + BLOCK_SIZE) however large the sequence grows, where one
+    flat sorted list would move every later entry. Positions are found
+    through the blocks' start offsets, recomputed (O(n / BLOCK_SIZE)) on the
+    first positional read after an edit.
+    """
+
+    def __init__(self):
+        self._blocks = []  # Sorted, non-empty lists
+        self._maxes = []   # Last entry of each block
+        self._offsets = None  # Position of each block's first entry, or None when stale
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _block_of(self, entry):
+        i = bisect.bisect_left(self._maxes, entry)
+        return min(i, len(self._blocks) - 1)
+
+    def add(self, entry):
+        if not self._blocks:
+            self._blocks.append([entry])
+            self._maxes.append(entry)
+        else:
+            i = self._block_of(entry)
+            block = self._blocks[i]
+            bisect.insort(block, entry)
+            self._maxes[i] = block[-1]
+            if len(block) > 2 * BLOCK_SIZE:
+                self._blocks[i:i + 1] = [block[:BLOCK_SIZE], block[BLOCK_SIZE:]]
+                self._maxes[i:i + 1] = [block[BLOCK_SIZE - 1], block[-1]]
+        self._len += 1
+        self._offsets = None
+
+    def remove(self, entry):
+        """Remove an entry that is present."""
+        i = self._block_of(entry)
+        block = self._blocks[i]
+        del block[bisect.bisect_left(block, entry)]
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+        self._len -= 1
+        self._offsets = None
+
+    def _block_offsets(self):
+        if self._offsets is None:
+            self._offsets = list(itertools.accumulate((len(block) for block in self._blocks), initial=0))
+        return self._offsets
+
+    def bisect_left(self, entry, lo=0):
+        """Position of the first entry >= entry (searching from position lo)."""
+        if not self._blocks:
+            return 0
+        i = bisect.bisect_left(self._maxes, entry)
+        if i == len(self._blocks):
+            return self._len
+        offsets = self._block_offsets()
+        return max(lo, offsets[i] + bisect.bisect_left(self._blocks[i], entry))
+
+    def __getitem__(self, position):
+        offsets = self._block_offsets()
+        i = bisect.bisect_right(offsets, position) - 1
+        return self._blocks[i][position - offsets[i]]
+
+    def iter_from(self, start, stop):
+        """Entries from position start up to stop, walking the blocks in order."""
+        if start >= stop:
+            return
+        offsets = self._block_offsets()
+        i = bisect.bisect_right(offsets, start) - 1
+        skip = start - offsets[i]
+        remaining = stop - start
+        for block in itertools.islice(self._blocks, i, None):
+            for entry in itertools.islice(block, skip, skip + remaining):
+                yield entry
+            remaining -= len(block) - skip
+            if remaining <= 0:
+                return
+            skip = 0
+
+
+class DeviceMatches:
+    """A lazy, sliceable view of the device ids matching a search.
+
+    Only the bounds of the match are computed up front, so ``len()`` and
+    reading a window of results cost O(window), not O(matches). The entries
+    are tuples ending in the device id.
+    """
+
+    def __init__(self, entries, start, stop):
+        self._entries = entries
+        self._start = start
+        self._stop = stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return [entry[-1] for entry in self._entries.iter_from(self._start + start, self._start + stop)]
+            return [self._entries[self._start + i][-1] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._entries[self._start + index][-1]
+
+    def __iter__(self):
+        return (entry[-1] for entry in self._entries.iter_from(self._start, self._stop))
+
+
+class DeviceIndex:
+    """Sorted keys for prefix search, updated one device at a time.
+
+    Every device has two lower-cased keys: its label (``router 12``) and its
+    IP address. Both live in one sorted sequence, so all keys starting with
+    a prefix form one contiguous run found with two binary searches. Labels
+    start with a letter and IPs with a digit, so a non-empty prefix never
+    matches the same device twice. The sequences are SortedBlocks, so adding
+    or removing a device does not get slower as the index grows.
+    """
+
+    def __init__(self):
+        self._keys = SortedBlocks()  # (key, device id)
+        self._ids = SortedBlocks()   # (device id,) for every device, for the empty query
+        self._device_keys = {}  # device id -> its keys, for removal
+
+    @staticmethod
+    def _keys_for(device):
+        return (device_label(device).lower(), str(device.ip_address).lower())
+
+    def add(self, device):
+        keys = self._keys_for(device)
+        self._device_keys[device.id] = keys
+        for key in keys:
+            self._keys.add((key, device.id))
+        self._ids.add((device.id,))
+
+    def remove(self, device):
+        keys = self._device_keys.pop(device.id, None)
+        if keys is None:
+            return
+        for key in keys:
+            self._keys.remove((key, device.id))
+        self._ids.remove((device.id,))
+
+    def update(self, device):
+        """Re-index a device after its name or IP changed."""
+        self.remove(device)
+        self.add(device)
+
+    def search(self, prefix=""):
+        """Device ids whose label or IP starts with prefix (all devices if empty)."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return DeviceMatches(self._ids, 0, len(self._ids))
+        start = self._keys.bisect_left((prefix,))
+        # Every key with this prefix sorts before prefix + the highest code point
+        stop = self._keys.bisect_left((prefix + "\U0010ffff",), start)
+        return DeviceMatches(self._keys, start, stop)
+
+    def __len__(self):
+        return len(self._ids)
@@ -0,0 +1,95 @@
+"""Address parsing and the DHCP-style pools devices lease their IPs from."""
+import pytest
+
+from addressing import AddressAllocator, AddressPool, format_ip, parse_ip, parse_mask, parse_subnet
+from network import Network
+
+
+def test_parse_and_format_round_trip():
+    for text in ("0.0.0.0", "10.1.2.3", "192.168.0.254", "255.255.255.255"):
+        assert format_ip(parse_ip(text)) == text
+    for text in ("10.1.2", "10.1.2.256", "10.1.2.-1", "a.b.c.d", "1.2.3.4.5", "1.2.3.0004"):
+        with pytest.raises(ValueError):
+            parse_ip(text)
+
+
+def test_masks_and_subnets():
+    assert parse_mask("255.255.255.0") == 24
+    assert parse_mask("255.0.0.0") == 8
+    assert parse_mask("0.0.0.0") == 0
+    with pytest.raises(ValueError):
+        parse_mask("255.0.255.0")
+    assert parse_subnet("10.9.8.7/8") == (parse_ip("10.0.0.0"), 8)
+    with pytest.raises(ValueError):
+        parse_subnet("10.0.0.0/33")
+
+
+def test_pool_leases_lowest_host_address_and_skips_network_and_broadcast():
+    pool = AddressPool(*parse_subnet("192.168.1.0/29"))
+    leased = [format_ip(pool.allocate()) for _ in range(6)]
+    assert leased == [f"192.168.1.{host}" for host in range(1, 7)]
+    assert pool.allocate() is None
+    assert pool.free == 0
+
+
+def test_released_addresses_are_reused_lowest_first():
+    pool = AddressPool(*parse_subnet("10.0.0.0/24"))
+    addresses = [pool.allocate() for _ in range(20)]
+    pool.release(addresses[12])
+    pool.release(addresses[4])
+    pool.release(addresses[4])  # Releasing twice is a no-op
+    assert pool.free == 254 - 18
+    assert pool.allocate() == addresses[4]
+    assert pool.allocate() == addresses[12]
+    assert pool.allocate() == addresses[19] + 1
+
+
+def test_small_pools_have_no_network_or_broadcast_address():
+    pool = AddressPool(*parse_subnet("10.0.0.0/31"))
+    assert [format_ip(pool.allocate()), format_ip(pool.allocate())] == ["10.0.0.0", "10.0.0.1"]
+    assert pool.allocate() is None
+
+
+def test_allocator_rolls_over_to_the_next_pool_and_back():
+    allocator = AddressAllocator(("192.168.0.0/30", "10.0.0.0/8"))
+    leases = [allocator.allocate() for _ in range(4)]
+    assert [(format_ip(address), prefix) for address, prefix in leases] == [
+        ("192.168.0.1", 30), ("192.168.0.2", 30), ("10.0.0.1", 8), ("10.0.0.2", 8)]
+    allocator.release(leases[1][0])
+    assert allocator.allocate() == leases[1]
+
+
+def test_allocator_raises_when_every_pool_is_full():
+    allocator = AddressAllocator(("192.168.0.0/30",))
+    allocator.allocate()
+    allocator.allocate()
+    with pytest.raises(ValueError):
+        allocator.allocate()
+
+
+def test_network_rolls_over_from_the_default_24():
+    network = Network(seed=1)
+    devices = [network.add_device("PC") for _ in range(256)]
+    assert devices[0].ip_address == "192.168.0.1"
+    assert devices[253].ip_address == "192.168.0.254"
+    assert (devices[254].ip_address, devices[254].subnet_mask) == ("10.0.0.1", "255.0.0.0")
+    network.remove_device(devices[7])
+    assert network.add_device("PC").ip_address == "192.168.0.8"
+
+
+def test_set_address_rejects_duplicates_and_pool_network_and_broadcast_addresses():
+    network = Network(seed=1)
+    first, second = network.add_device("PC"), network.add_device("PC")
+    for taken in (first.ip_address, "192.168.0.0", "192.168.0.255", "10.0.0.0", "10.255.255.255"):
+        with pytest.raises(ValueError):
+            network.set_address(second, taken)
+    assert second.ip_address == "192.168.0.2"
+
+    network.set_address(second, "192.168.0.200")
+    assert network.find_by_ip("192.168.0.200") is second
+    assert network.find_by_ip("192.168.0.2") is None
+    # The old address went back to the pool; the new one stays leased
+    assert network.add_device("PC").ip_address == "192.168.0.2"
+    assert network.add_device("PC").ip_address == "192.168.0.3"
+    network.set_address(second, "172.16.0.1", "255.255.0.0")  # Outside every pool
+    assert (second.ip_address, second.subnet_mask) == ("172.16.0.1", "255.255.0.0")
@@ -0,0 +1,55 @@
+"""Terminal commands report failure through CommandInterpreter.execute and error."""
+import pytest
+
+from commands import CommandInterpreter
+from network import Network
+
+
+@pytest.fixture
+def interpreter():
+    network = Network(seed=1)
+    a, b = network.add_device("PC"), network.add_device("PC")
+    network.add_device("PC")
+    network.connect(a, b, "Copper")
+    lines = []
+    interpreter = CommandInterpreter(network, lines.append)
+    interpreter.lines = lines
+    return interpreter
+
+
+@pytest.mark.parametrize("command", [
+    "help", "show devices", "show devices type pc match 192", "show links", "failures", "pingall",
+    "ping 192.168.0.1 192.168.0.2 1", "sendpacket 192.168.0.1 192.168.0.2 UDP", "seed", "seed -5",
+    "routing", "routing rip", "routing off",
+])
+def test_commands_that_succeed(interpreter, command):
+    assert interpreter.execute(command), interpreter.lines
+    assert interpreter.error is None
+
+
+@pytest.mark.parametrize("command", [
+    "frobnicate", "show devices colour red", "show devices page", "show devices page 0", "show devices page 9",
+    "show links page x", "show links page 9", "failures page 0", "failures page 9",
+    "ping 192.168.0.1 192.168.0.3", "ping 192.168.0.1 10.9.9.9", "ping 192.168.0.1", "ping 1 2 many",
+    "sendpacket 192.168.0.1 192.168.0.2 SCTP", "sendpacket 192.168.0.1 192.168.0.3 TCP",
+    "save /nonexistent/dir/lab.json", "seed x", "trace what", "trace stop", "trace start /nonexistent/t.trace",
+    "capture what", "capture stop", "capture start /nonexistent/c.pcap", "routing eigrp", "lag", "leaks",
+])
+def test_commands_that_fail(interpreter, command):
+    assert not interpreter.execute(command)
+    assert interpreter.error
+    assert interpreter.error in "\n".join(interpreter.lines)
+
+
+def test_starting_a_second_trace_fails(interpreter, tmp_path):
+    assert interpreter.execute(f"trace start {tmp_path / 'a.trace'}")
+    assert not interpreter.execute(f"trace start {tmp_path / 'b.trace'}")
+    assert interpreter.execute("trace stop")
+    assert interpreter.execute(f"save {tmp_path / 'lab.json'}")
+
+
+def test_a_large_seed_cannot_be_traced(interpreter, tmp_path):
+    assert interpreter.execute(f"seed {1 << 70}")
+    assert not interpreter.execute(f"trace start {tmp_path / 'a.trace'}")
+    assert "64-bit" in interpreter.error
+    assert not (tmp_path / "a.trace").exists()
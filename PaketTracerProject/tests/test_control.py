@@ -0,0 +1,87 @@
+"""The JSON-lines control socket, driven through a real Unix-domain socket."""
+import json
+import os
+import shutil
+import socket
+import tempfile
+
+import pytest
+
+from control import ControlServer
+from network import Network
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix-domain sockets")
+
+
+@pytest.fixture
+def client():
+    # Socket paths are limited to ~100 bytes, so not under pytest's long tmp_path
+    directory = tempfile.mkdtemp(prefix="pt")
+    network = Network(seed=1)
+    server = ControlServer(network, os.path.join(directory, "control.sock"))
+    server.start()
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(server.path)
+    lines = connection.makefile("rb")
+
+    def request(message):
+        """Send one request and return its responses up to the batch's done line."""
+        connection.sendall((message if isinstance(message, str) else json.dumps(message)).encode() + b"\n")
+        responses = []
+        while True:
+            response = json.loads(lines.readline())
+            responses.append(response)
+            if response.get("done") or "op" not in response:
+                return responses
+
+    request.network = network
+    yield request
+    connection.close()
+    server.close()
+    shutil.rmtree(directory)
+
+
+def results(responses):
+    return [response for response in responses if "output" not in response and not response.get("done")]
+
+
+def test_batch_builds_and_pings(client):
+    responses = client({"id": 7, "ops": [
+        {"op": "add_device", "type": "PC", "count": 3},
+        {"op": "connect", "a": 1, "b": "192.168.0.2", "distance": 10},
+        {"op": "ping", "src": 1, "dst": 2, "count": 2},
+        {"op": "ping", "src": 1, "dst": 3},
+        {"op": "stats"},
+    ]})
+    ops = results(responses)
+    assert [op["ok"] for op in ops] == [True, True, True, False, True]
+    assert [device["ip"] for device in ops[0]["result"]] == ["192.168.0.1", "192.168.0.2", "192.168.0.3"]
+    assert "unreachable" in ops[3]["error"]
+    assert ops[4]["result"]["devices"] == 3 and ops[4]["result"]["links"] == 1
+    assert responses[-1] == {"id": 7, "done": True, "ok": 4, "failed": 1, "ms": responses[-1]["ms"]}
+
+
+@pytest.mark.parametrize("distance", ["nan", "inf", "-inf", -1, "far"])
+def test_connect_rejects_bad_distances(client, distance):
+    client({"op": "add_device", "type": "PC", "count": 2})
+    op, = results(client({"op": "connect", "a": 1, "b": 2, "distance": distance}))
+    assert not op["ok"]
+    assert not client.network.links
+
+
+@pytest.mark.parametrize("ref", [True, False, 1.0, "nobody", None])
+def test_devices_are_ids_or_ips_only(client, ref):
+    client({"op": "add_device", "type": "PC", "count": 2})
+    op, = results(client({"op": "connect", "a": ref, "b": 2}))
+    assert not op["ok"]
+    assert not client.network.links
+
+
+def test_bad_requests_keep_the_connection(client):
+    assert client("{not json")[0]["ok"] is False
+    assert client("[1, 2]")[0]["ok"] is False
+    assert client({"ops": {"op": "stats"}}) == [{"ok": False, "error": "ops must be a list"}]
+    op, = results(client({"op": "frobnicate"}))
+    assert op == {"id": None, "op": 0, "ok": False, "error": "Unknown operation 'frobnicate'"}
+    op, = results(client({"op": "stats"}))
+    assert op["ok"]
@@ -0,0 +1,140 @@
+"""Trace recording, seeking and replay."""
+import random
+
+import pytest
+
+from eventlog import (
+    RECORD, EVENT_DEVICE_ADD, EVENT_LINK_ADD, PROTO_ICMP, PROTO_TCP,
+    TraceEvent, TraceReader, TraceRecorder,
+)
+from network import Network
+
+
+class ListRecorder:
+    """Keep events in memory, rounded through the record format as the file stores them."""
+
+    def __init__(self):
+        self.events = []
+
+    def record(self, time_ms, kind, a=0, b=0, c=0, code=0, index=0, value=0.0):
+        self.events.append(TraceEvent(*RECORD.unpack(RECORD.pack(time_ms, kind, code, index, a, b, c, value))))
+
+
+def run_session(network, seed):
+    """Random edits and packets; returns (clock, devices, links) after each packet."""
+    rng = random.Random(seed)
+    snapshots = []
+    devices = [network.add_device(rng.choice(["Router", "Switch", "PC"]), 16) for _ in range(12)]
+    for _ in range(300):
+        roll = rng.random()
+        if roll < 0.1:
+            a, b = rng.sample(devices, 2)
+            network.connect(a, b, rng.choice(["Copper", "Fiber"]))
+        elif roll < 0.13 and network.links:
+            network.disconnect(rng.choice(list(network.links)))
+        elif roll < 0.15 and len(devices) > 4:
+            network.remove_device(devices.pop(rng.randrange(len(devices))))
+        else:
+            a, b = rng.sample(devices, 2)
+            route = network.route(a, b)
+            if route is not None:
+                network.transmit(route.path, rng.choice([PROTO_ICMP, PROTO_TCP]), route.links)
+                snapshots.append(snapshot(network))
+    return snapshots
+
+
+def snapshot(network):
+    devices = {device.id: device.device_type for device in network.devices.values()}
+    links = {link.id: (link.device1.id, link.device2.id, link.type) for link in network.links}
+    return network.clock, devices, links
+
+
+@pytest.fixture
+def trace(tmp_path):
+    network = Network(seed=7)
+    memory = ListRecorder()
+    recorder = TraceRecorder(tmp_path / "run.trace", network.seed)
+    network.listeners += [memory, recorder]
+    snapshots = run_session(network, 7)
+    recorder.close()
+    reader = TraceReader(tmp_path / "run.trace")
+    yield reader, memory.events, snapshots
+    reader.close()
+
+
+def test_file_holds_every_event_in_order(trace):
+    reader, events, _ = trace
+    assert reader.seed == 7
+    assert len(reader) == len(events) > 500
+    assert list(reader.events()) == events
+    assert [reader[i] for i in range(len(reader))] == events
+    assert all(a.time <= b.time for a, b in zip(events, events[1:]))
+    assert reader.duration == events[-1].time
+
+
+def test_seek_finds_the_first_event_at_or_after_a_time(trace):
+    reader, events, _ = trace
+    rng = random.Random(1)
+    times = [event.time for event in events]
+    for time_ms in [-1.0, 0.0, reader.duration, reader.duration + 1] + rng.sample(times, 50):
+        expected = next((i for i, t in enumerate(times) if t >= time_ms), len(times))
+        assert reader.seek(time_ms) == expected
+
+
+def test_replay_from_a_time_matches_the_recorded_events(trace):
+    reader, events, _ = trace
+    start, end = reader.duration / 3, reader.duration * 2 / 3
+    replayed = []
+    reader.replay(replayed.append, start, end)
+    assert replayed == [event for event in events if start <= event.time <= end]
+    replayed = []
+    reader.replay(replayed.append)
+    assert replayed == events
+
+
+def test_topology_at_rebuilds_the_topology_at_each_point(trace):
+    reader, _, snapshots = trace
+    assert len(snapshots) > 100
+    # Edits do not advance the clock but packets do, so the clock right after
+    # a packet is later than every event before it
+    for clock, devices, links in snapshots[::7]:
+        assert reader.topology_at(clock) == (devices, links)
+
+
+def test_same_seed_writes_the_same_trace(tmp_path):
+    paths = []
+    for name in ("a.trace", "b.trace"):
+        network = Network(seed=99)
+        recorder = TraceRecorder(tmp_path / name, network.seed)
+        network.listeners.append(recorder)
+        run_session(network, 3)
+        recorder.close()
+        paths.append(tmp_path / name)
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    recorder = TraceRecorder(tmp_path / "torn.trace", 1)
+    recorder.record(0.0, EVENT_DEVICE_ADD, 1, code=1)
+    recorder.record(1.0, EVENT_LINK_ADD, 1, 1, 2, code=1)
+    recorder.close()
+    with open(tmp_path / "torn.trace", "ab") as f:
+        f.write(b"\x00" * (RECORD.size // 2))
+    reader = TraceReader(tmp_path / "torn.trace")
+    assert len(reader) == 2
+    assert reader.topology_at(2.0) == ({1: "PC"}, {1: (1, 2, "Copper")})
+    reader.close()
+
+
+@pytest.mark.parametrize("seed", [-1, -(1 << 63), (1 << 63) - 1])
+def test_any_64_bit_seed_round_trips(tmp_path, seed):
+    TraceRecorder(tmp_path / "seed.trace", seed).close()
+    reader = TraceReader(tmp_path / "seed.trace")
+    assert reader.seed == seed
+    reader.close()
+
+
+def test_seed_too_large_for_the_header_creates_no_file(tmp_path):
+    with pytest.raises(ValueError):
+        TraceRecorder(tmp_path / "big.trace", 1 << 64)
+    assert not (tmp_path / "big.trace").exists()
@@ -0,0 +1,77 @@
+"""Bridges and articulation points, checked against removing each link and device in turn."""
+import random
+
+import networkx as nx
+import pytest
+
+from failures import analyze
+from network import Network
+
+
+def random_network(seed, devices, links):
+    rng = random.Random(seed)
+    network = Network(seed=seed)
+    nodes = [network.add_device("Switch", 64) for _ in range(devices)]
+    for _ in range(links):
+        a, b = rng.sample(nodes, 2)
+        network.connect(a, b, "Copper")
+    return network
+
+
+def connected_pairs(graph):
+    return sum(len(part) * (len(part) - 1) // 2 for part in nx.connected_components(graph))
+
+
+def brute_force(network):
+    """(pairs lost per link id, pairs lost per device id), by deleting each one from a copy of the graph."""
+    graph = network.graph
+    before = connected_pairs(graph)
+    bridges = {}
+    for link in network.links:
+        if len(network.links.between(link.device1, link.device2)) > 1:
+            continue  # A parallel link still carries the traffic
+        cut = graph.copy()
+        cut.remove_edge(link.device1.id, link.device2.id)
+        lost = before - connected_pairs(cut)
+        if lost:
+            bridges[link.id] = lost
+    points = {}
+    for device_id in graph:
+        cut = graph.copy()
+        cut.remove_node(device_id)
+        own = len(nx.node_connected_component(graph, device_id)) - 1
+        lost = before - own - connected_pairs(cut)
+        if lost:
+            points[device_id] = lost
+    return bridges, points
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("devices, links", [(8, 7), (20, 22), (30, 45), (40, 30)])
+def test_matches_brute_force(seed, devices, links):
+    network = random_network(seed, devices, links)
+    report = analyze(network)
+    bridges, points = brute_force(network)
+    assert {link.id: pairs for pairs, link, _ in report.bridges} == bridges
+    assert {device.id: pairs for pairs, device, _ in report.articulation_points} == points
+    assert report.connected_pairs == connected_pairs(network.graph)
+    assert report.components == nx.number_connected_components(network.graph)
+
+
+def test_parallel_links_are_not_bridges():
+    network = Network(seed=1)
+    a, b, c = (network.add_device("Router") for _ in range(3))
+    network.connect(a, b, "Copper")
+    network.connect(a, b, "Fiber")
+    network.connect(b, c, "Copper")
+    report = analyze(network)
+    assert [(pairs, link.device1.id, link.device2.id) for pairs, link, _ in report.bridges] == [(2, b.id, c.id)]
+    assert [(pairs, device.id, parts) for pairs, device, parts in report.articulation_points] == [(1, b.id, 2)]
+
+
+def test_report_is_cached_until_the_topology_changes():
+    network = random_network(3, 10, 9)
+    report = network.failure_report()
+    assert network.failure_report() is report
+    network.connect(*list(network.devices.values())[:2], "Copper")
+    assert network.failure_report() is not report
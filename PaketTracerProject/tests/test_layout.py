@@ -0,0 +1,154 @@
+"""Auto layout: the force layout's forces and result, tree levels and fitting onto the canvas."""
+import numpy as np
+import pytest
+
+from layout import ForceLayout, fit, is_forest, tree_layout
+
+
+def grid_edges(size):
+    edges = []
+    for row in range(size):
+        for column in range(size):
+            node = row * size + column
+            if column + 1 < size:
+                edges.append((node, node + 1))
+            if row + 1 < size:
+                edges.append((node, node + size))
+    return edges
+
+
+def edge_lengths(pos, edges):
+    edges = np.array(edges)
+    return np.hypot(*(pos[edges[:, 0]] - pos[edges[:, 1]]).T)
+
+
+def nearest_distances(pos):
+    delta = pos[:, None, :] - pos[None, :, :]
+    distance = np.hypot(delta[..., 0], delta[..., 1])
+    np.fill_diagonal(distance, np.inf)
+    return distance.min(axis=1)
+
+
+@pytest.mark.parametrize("spread", ["uniform", "clustered"])
+def test_repulsion_matches_the_exact_pairwise_sum(spread):
+    rng = np.random.default_rng(0)
+    if spread == "uniform":
+        pos = rng.uniform(0, 30, (800, 2))
+    else:
+        pos = np.concatenate([rng.normal(0, 1, (600, 2)), rng.uniform(-40, 40, (200, 2))])
+    layout = ForceLayout(pos, [], seed=1)
+    layout.pos = pos.copy()
+    approx = layout._repulsion()
+
+    delta = pos[:, None, :] - pos[None, :, :]
+    distance2 = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+    np.fill_diagonal(distance2, np.inf)
+    exact = (delta / distance2[..., None]).sum(axis=1)
+    error = np.hypot(*(approx - exact).T) / np.hypot(*exact.T).mean()
+    assert np.median(error) < 0.01
+    assert np.percentile(error, 99) < 0.05
+
+
+def test_grid_lays_out_evenly_without_overlaps():
+    edges = grid_edges(12)
+    start = np.random.default_rng(0).uniform(0, 800, (144, 2))
+    layout = ForceLayout(start, edges, seed=0)
+    pos = layout.run()
+    assert layout.done
+    assert pos.shape == (144, 2) and np.isfinite(pos).all()
+    lengths = edge_lengths(pos, edges)
+    assert lengths.std() / lengths.mean() < 0.3
+    assert nearest_distances(pos).min() > 0.3 * lengths.mean()
+    # A grid unfolds: opposite corners end up about as far apart as its diagonal
+    corners = np.hypot(*(pos[0] - pos[-1])) / lengths.mean()
+    assert corners > 0.7 * 11 * np.sqrt(2)
+
+
+def test_same_seed_same_layout():
+    edges = grid_edges(6) + [(0, 35)]
+    start = np.random.default_rng(5).uniform(0, 100, (36, 2))
+    first = ForceLayout(start, edges, seed=9).run()
+    assert np.array_equal(first, ForceLayout(start, edges, seed=9).run())
+
+
+def test_devices_stacked_on_one_spot_spread_out():
+    edges = [(i, (i + 1) % 300) for i in range(300)]
+    pos = ForceLayout(np.full((300, 2), 100.0), edges, seed=1).run()
+    lengths = edge_lengths(pos, edges)
+    assert nearest_distances(pos).min() > 0.1 * lengths.mean()
+
+
+def test_disconnected_devices_stay_near_the_rest():
+    rng = np.random.default_rng(6)
+    edges = grid_edges(10)
+    n = 100 + 60  # Plus 60 isolated devices
+    pos = ForceLayout(rng.uniform(0, 800, (n, 2)), edges, seed=2).run()
+    lengths = edge_lengths(pos, edges)
+    assert np.ptp(pos, axis=0).max() < 40 * lengths.mean()
+
+
+def test_progressive_steps_end_where_run_does():
+    edges = grid_edges(8)
+    start = np.random.default_rng(7).uniform(0, 100, (64, 2))
+    layout = ForceLayout(start, edges, seed=3)
+    while not layout.done:
+        pos = layout.step(7)
+        assert pos.shape == (64, 2)
+    assert np.array_equal(pos, ForceLayout(start, edges, seed=3).run())
+
+
+def test_is_forest():
+    assert is_forest(4, [(0, 1), (1, 2), (1, 3)])
+    assert is_forest(5, [(0, 1), (2, 3)])  # Several trees and an isolated node
+    assert is_forest(3, [(0, 1), (1, 0), (1, 1), (1, 2)])  # Parallel links and self-loops do not count
+    assert not is_forest(3, [(0, 1), (1, 2), (2, 0)])
+    assert is_forest(0, [])
+
+
+def test_tree_levels_follow_depth_from_the_centre():
+    # A chain 0-1-2-3-4 with leaves 5, 6 on node 2: centred on 2
+    edges = [(0, 1), (1, 2), (2, 3), (3, 4), (2, 5), (2, 6)]
+    pos = tree_layout(7, edges)
+    assert list(pos[:, 1]) == [2, 1, 0, 1, 2, 1, 1]
+    # Leaves take distinct slots and parents sit over their children
+    assert len({tuple(point) for point in pos}) == 7
+    assert pos[2, 0] == pytest.approx((pos[1, 0] + pos[6, 0]) / 2)
+    assert pos[1, 0] == pos[0, 0] and pos[3, 0] == pos[4, 0]
+
+
+def test_star_has_its_hub_on_top():
+    pos = tree_layout(6, [(5, leaf) for leaf in range(5)])
+    assert pos[5, 1] == 0 and (pos[:5, 1] == 1).all()
+    assert pos[5, 0] == pytest.approx(pos[:5, 0].mean())
+
+
+def test_trees_of_a_forest_do_not_overlap():
+    pos = tree_layout(7, [(0, 1), (0, 2), (3, 4), (4, 5)])
+    first, second, alone = pos[[0, 1, 2]], pos[[3, 4, 5]], pos[6]
+    assert first[:, 0].max() < second[:, 0].min() < second[:, 0].max() < alone[0]
+
+
+def test_long_chain_does_not_recurse():
+    n = 20000
+    pos = tree_layout(n, [(i, i + 1) for i in range(n - 1)])
+    assert pos[:, 1].max() == n // 2
+
+
+@pytest.mark.parametrize("keep_aspect", [True, False])
+def test_fit_stays_inside_the_margins(keep_aspect):
+    pos = np.random.default_rng(8).normal(0, 50, (200, 2)) * [3, 1]
+    fitted = fit(pos, 800, 600, margin=40, keep_aspect=keep_aspect)
+    assert fitted.min(axis=0) == pytest.approx([40, 40] if not keep_aspect else [40, fitted[:, 1].min()])
+    assert (fitted >= 40 - 1e-9).all()
+    assert (fitted[:, 0] <= 760 + 1e-9).all() and (fitted[:, 1] <= 560 + 1e-9).all()
+    if keep_aspect:
+        scale = np.ptp(fitted, axis=0) / np.ptp(pos, axis=0)
+        assert scale[0] == pytest.approx(scale[1])
+        assert fitted[:, 1].mean() == pytest.approx(300, abs=40)  # Centred vertically
+    else:
+        assert np.ptp(fitted, axis=0) == pytest.approx([720, 520])
+
+
+def test_fit_centres_a_single_point_and_handles_none():
+    assert fit([[5, 5]], 800, 600).tolist() == [[400, 300]]
+    assert fit(np.zeros((0, 2)), 800, 600).shape == (0, 2)
@@ -0,0 +1,57 @@
+"""Link storage: lookups by id, device pair and device."""
+from links import LinkStore
+from network import Device
+
+
+def make_devices(count):
+    return [Device(i, "Switch") for i in range(1, count + 1)]
+
+
+def test_add_indexes_a_link_every_way():
+    a, b, c = make_devices(3)
+    store = LinkStore()
+    ab = store.add(a, b, 1, 1, "Copper")
+    bc = store.add(c, b, 1, 2, "Fiber", 12.5)
+    assert (ab.id, bc.id) == (1, 2)
+    assert store.get(2) is bc and store.get(3) is None
+    assert store.between(b, a) == [ab] and store.between(a, c) == []
+    assert store.first_between(b, c) is bc and store.first_between(a, c) is None
+    assert sorted(link.id for link in store.of_device(b)) == [ab.id, bc.id]
+    assert store.degree(b) == 2 and store.degree(a) == 1
+    assert len(store) == 2 and list(store) == [ab, bc] and bc in store
+    assert bc.distance == 12.5 and bc.other(c) is b and bc.port_of(b) == 2
+
+
+def test_parallel_links_stay_apart():
+    a, b = make_devices(2)
+    store = LinkStore()
+    first = store.add(a, b, 1, 1, "Copper")
+    second = store.add(b, a, 2, 2, "Fiber")
+    assert store.between(a, b) == [first, second]
+    assert store.remove(first)
+    assert store.between(a, b) == [second] and store.first_between(a, b) is second
+    assert not store.remove(first)  # Already gone
+    assert first not in store
+
+
+def test_remove_cleans_every_index():
+    a, b = make_devices(2)
+    store = LinkStore()
+    link = store.add(a, b, 1, 1, "Copper")
+    store.remove(link)
+    assert len(store) == 0 and store.of_device(a) == [] and store.degree(b) == 0
+    assert store._by_pair == {} and store._by_device == {}
+    assert store.add(a, b, 1, 1, "Copper").id == 2  # Ids are never reused
+
+
+def test_remove_device_only_touches_its_links():
+    devices = make_devices(6)
+    hub, others = devices[0], devices[1:]
+    store = LinkStore()
+    spokes = [store.add(hub, other, port, 1, "Copper") for port, other in enumerate(others, 1)]
+    ring = [store.add(x, y, 2, 3, "Copper") for x, y in zip(others, others[1:])]
+    removed = store.remove_device(hub)
+    assert sorted(link.id for link in removed) == [link.id for link in spokes]
+    assert list(store) == ring
+    assert store.of_device(hub) == [] and store.remove_device(hub) == []
+    assert all(store.degree(other) == len(store.of_device(other)) for other in others)
@@ -0,0 +1,52 @@
+"""The headless 'run' command: output and exit status."""
+import json
+
+from packettracer import main
+
+
+def write_lab(tmp_path):
+    lab = {"devices": [{"id": 1, "type": "PC"}, {"id": 2, "type": "PC"}, {"id": 3, "type": "PC"}],
+           "links": [{"a": 1, "b": 2}]}
+    path = tmp_path / "lab.json"
+    path.write_text(json.dumps(lab))
+    return path
+
+
+def run(tmp_path, *lines, extra=()):
+    script = tmp_path / "script.txt"
+    script.write_text("\n".join(lines) + "\n")
+    output = tmp_path / "out.txt"
+    status = main(["run", str(script), "--topology", str(write_lab(tmp_path)), "--output", str(output),
+                   "--seed", "1", *extra])
+    return status, output.read_text()
+
+
+def test_succeeding_script_exits_zero(tmp_path):
+    status, output = run(tmp_path, "# comment", "", "ping 192.168.0.1 192.168.0.2 2", "show devices")
+    assert status == 0
+    assert "Reply from 192.168.0.2" in output
+
+
+def test_any_failed_command_exits_one(tmp_path):
+    for line in ("frobnicate", "ping 192.168.0.1 192.168.0.3", "ping 192.168.0.1 300.0.0.1"):
+        status, _ = run(tmp_path, "show devices", line, "show devices")
+        assert status == 1, line
+
+
+def test_negative_seed_with_a_trace(tmp_path):
+    status, output = run(tmp_path, "show devices", extra=("--seed", "-1", "--trace", str(tmp_path / "t.trace")))
+    assert status == 0
+    assert "seed -1" in output
+
+
+def test_missing_script_exits_two(tmp_path, capsys):
+    assert main(["run", str(tmp_path / "missing.txt"), "--output", str(tmp_path / "out.txt")]) == 2
+    assert "cannot read script" in capsys.readouterr().err
+    assert not (tmp_path / "out.txt").exists()
+
+
+def test_unloadable_topology_exits_two(tmp_path, capsys):
+    script = tmp_path / "script.txt"
+    script.write_text("show devices\n")
+    assert main(["run", str(script), "--topology", str(tmp_path / "missing.json")]) == 2
+    assert "cannot load topology" in capsys.readouterr().err
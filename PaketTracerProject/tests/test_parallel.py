@@ -0,0 +1,104 @@
+"""Partitioned traffic simulation: results must not depend on the number of workers."""
+import json
+import random
+
+import networkx as nx
+import pytest
+
+from network import Network
+from parallel import ParallelSimulation, partition, random_flows, shortest_path, transit_adjacency
+from topology import load_topology
+
+
+def build_network(seed=11):
+    """Routers in a sparse mesh with PCs on them, plus a separate small island."""
+    rng = random.Random(seed)
+    network = Network(seed=seed)
+    routers = [network.add_device("Router", 32) for _ in range(40)]
+    for i, router in enumerate(routers[1:], 1):
+        network.connect(router, routers[rng.randrange(i)], rng.choice(["Copper", "Fiber"]))
+    for _ in range(15):
+        a, b = rng.sample(routers, 2)
+        network.connect(a, b, "Fiber", rng.uniform(0, 300))
+    for router in routers:
+        for _ in range(rng.randrange(4)):
+            network.connect(network.add_device("PC"), router, "Copper")
+    island = [network.add_device("Switch") for _ in range(3)]
+    network.connect(island[0], island[1], "Copper")
+    network.connect(island[1], island[2], "Copper")
+    network.add_device("PC")  # Unreachable from everywhere
+    return network
+
+
+def adjacency_of(network):
+    return {node: list(network.graph[node]) for node in network.graph}
+
+
+def test_partition_assigns_every_node_to_balanced_shards():
+    adjacency = adjacency_of(build_network())
+    for shards in (1, 2, 3, 5):
+        owner = partition(adjacency, shards)
+        assert set(owner) == set(adjacency)
+        counts = [list(owner.values()).count(shard) for shard in range(shards)]
+        assert all(counts)
+        assert max(counts) <= len(adjacency) / shards * 1.03 + 1
+
+
+def test_shortest_path_has_the_fewest_hops():
+    network = build_network()
+    adjacency = adjacency_of(network)
+    transit = transit_adjacency(adjacency)
+    rng = random.Random(4)
+    nodes = list(adjacency)
+    for _ in range(200):
+        src, dst = rng.sample(nodes, 2)
+        path = shortest_path(adjacency, transit, src, dst)
+        if not nx.has_path(network.graph, src, dst):
+            assert path is None
+            continue
+        assert path[0] == src and path[-1] == dst
+        assert all(network.graph.has_edge(a, b) for a, b in zip(path, path[1:]))
+        assert len(path) == nx.shortest_path_length(network.graph, src, dst) + 1
+
+
+def run(workers, protocol):
+    network = build_network()
+    flows = random_flows(network, 1500, 50, protocol, seed=3)
+    report = ParallelSimulation(network, workers).run(flows)
+    links = {link.id: (link.packets, link.bytes, link.drops) for link in network.links}
+    return report, links, network.clock
+
+
+@pytest.mark.parametrize("protocol", ["MIX", "UDP"])
+def test_totals_are_identical_for_any_worker_count(protocol):
+    baseline, baseline_links, baseline_clock = run(1, protocol)
+    assert baseline.completed > 0 and baseline.unreachable > 0
+    for workers in (2, 3, 4):
+        report, links, clock = run(workers, protocol)
+        assert report.shards == workers and report.crossings > 0
+        for name in ("flows", "delivered", "completed", "dropped", "unreachable", "events", "latency_max", "end_ms"):
+            assert getattr(report, name) == getattr(baseline, name), name
+        # Shards add up their latencies in a different order
+        assert report.latency_sum == pytest.approx(baseline.latency_sum, rel=1e-12)
+        assert links == baseline_links
+        assert clock == baseline_clock
+
+
+def test_cut_links_without_a_minimum_delay_fall_back_to_one_worker():
+    network = build_network()
+    for link in network.links:
+        link.latency = link.jitter = 0.0  # No lookahead on any cut
+    flows = random_flows(network, 300, 20, "UDP", seed=3)
+    report = ParallelSimulation(network, 3).run(flows)
+    assert report.serial_fallback and report.shards == 1
+    assert any("one worker" in line for line in report.lines())
+    assert report.completed > 0
+
+
+@pytest.mark.parametrize("distance", [-2000, "nan", "inf"])
+def test_topology_files_reject_bad_distances(tmp_path, distance):
+    path = tmp_path / "lab.json"
+    path.write_text(json.dumps({"devices": [{"id": 1, "type": "PC"}, {"id": 2, "type": "PC"}],
+                                "links": [{"a": 1, "b": 2, "distance": distance}]}))
+    with pytest.raises(ValueError):
+        load_topology(path)
@@ -0,0 +1,121 @@
+"""Pcap frames: headers and checksums checked by an independent parser."""
+import random
+import struct
+
+import pytest
+
+from eventlog import INITIAL_TTL, PROTO_ICMP, PROTO_TCP, PROTO_UDP
+from network import Network
+from pcap import PcapWriter
+
+
+def checksum(data):
+    """Internet checksum of data (a result of 0 means data, checksum field included, is valid)."""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f">{len(data) // 2}H", data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def read_frames(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, major, minor, _, _, snaplen, linktype = struct.unpack_from("<IHHiIII", data)
+    assert (magic, major, minor, linktype) == (0xa1b2c3d4, 2, 4, 1)
+    frames = []
+    offset = 24
+    while offset < len(data):
+        seconds, microseconds, captured, length = struct.unpack_from("<IIII", data, offset)
+        assert captured == length <= snaplen
+        offset += 16
+        frames.append((seconds + microseconds / 1e6, data[offset:offset + captured]))
+        offset += captured
+    assert offset == len(data)
+    return frames
+
+
+def chain_network(length, seed=5):
+    network = Network(seed=seed)
+    devices = [network.add_device("Router") for _ in range(length)]
+    for a, b in zip(devices, devices[1:]):
+        network.connect(a, b, "Copper")
+    return network, devices
+
+
+@pytest.fixture
+def capture(tmp_path):
+    network, devices = chain_network(6)
+    # High addresses, so the checksums' carries wrap around
+    network.set_address(devices[0], "255.255.254.1", "255.255.255.0")
+    network.set_address(devices[-1], "254.255.255.255", "255.0.0.0")
+    writer = PcapWriter(tmp_path / "run.pcap", network)
+    network.listeners.append(writer)
+    rng = random.Random(2)
+    sent = []
+    for _ in range(60):
+        src, dest = rng.sample(devices, 2)
+        protocol = rng.choice([PROTO_ICMP, PROTO_TCP, PROTO_UDP])
+        path = network.shortest_path(src, dest)
+        network.transmit(path, protocol)
+        network.transmit(path[::-1], protocol, reply=True)
+        sent += [(path, protocol, False), (path[::-1], protocol, True)]
+    writer.close()
+    return network, sent, read_frames(tmp_path / "run.pcap")
+
+
+def test_one_frame_per_hop(capture):
+    _, sent, frames = capture
+    assert len(frames) == sum(len(path) - 1 for path, _, _ in sent)
+    times = [time for time, _ in frames]
+    assert times == sorted(times)
+
+
+def test_headers_and_checksums(capture):
+    network, sent, frames = capture
+    frames = iter(frames)
+    for path, protocol, reply in sent:
+        src, dest = network.devices[path[0]], network.devices[path[-1]]
+        for hop, (a, b) in enumerate(zip(path, path[1:])):
+            _, frame = next(frames)
+            # Ethernet: the devices on this hop, IPv4
+            assert frame[0:6] == network.devices[b].mac_bytes
+            assert frame[6:12] == network.devices[a].mac_bytes
+            assert frame[12:14] == b"\x08\x00"
+            ip = frame[14:34]
+            version_ihl, _, total_length, _, flags, ttl, ip_protocol, _ = struct.unpack(">BBHHHBBH", ip[:12])
+            assert (version_ihl, ip_protocol, flags) == (0x45, protocol, 0x4000)
+            assert total_length == len(frame) - 14
+            assert ttl == INITIAL_TTL - hop
+            assert struct.unpack(">II", ip[12:20]) == (src.ip_int, dest.ip_int)
+            assert checksum(ip) == 0
+
+            segment = frame[34:]
+            if protocol == PROTO_ICMP:
+                assert segment[0] == (0 if reply else 8)
+                assert checksum(segment) == 0
+            else:
+                pseudo = ip[12:20] + struct.pack(">BBH", 0, protocol, len(segment))
+                assert checksum(pseudo + segment) == 0
+                ports = struct.unpack(">HH", segment[:4])
+                assert (ports[0] == 9) == reply and (ports[1] == 9) != reply
+                if protocol == PROTO_UDP:
+                    assert struct.unpack(">H", segment[4:6])[0] == len(segment)
+                    assert segment[6:8] != b"\x00\x00"
+                else:
+                    assert segment[13] == (0x10 if reply else 0x18)
+    assert next(frames, None) is None
+
+
+def test_ttl_runs_out_after_initial_ttl_hops(tmp_path):
+    network, devices = chain_network(INITIAL_TTL + 2)
+    writer = PcapWriter(tmp_path / "long.pcap", network)
+    network.listeners.append(writer)
+    path = network.shortest_path(devices[0], devices[-1])
+    assert network.transmit(path, PROTO_UDP) is None
+    writer.close()
+    frames = read_frames(tmp_path / "long.pcap")
+    assert len(frames) == INITIAL_TTL - 1
+    assert [frame[14 + 8] for _, frame in frames] == list(range(INITIAL_TTL, 1, -1))
+    assert all(checksum(frame[14:34]) == 0 for _, frame in frames)
@@ -0,0 +1,52 @@
+"""Port allocation: the bitmap allocator and per-type port counts."""
+import pytest
+
+from network import Device
+from ports import DEFAULT_PORT_COUNT, PORT_COUNTS, PortAllocator
+
+
+def test_allocate_takes_the_lowest_free_port():
+    ports = PortAllocator(4)
+    assert [ports.allocate() for _ in range(4)] == [1, 2, 3, 4]
+    assert ports.allocate() is None and ports.lowest_free() is None
+    assert ports.release(2) and ports.release(3)
+    assert ports.lowest_free() == 2
+    assert ports.allocate() == 2 and ports.allocate() == 3
+
+
+def test_use_and_release_keep_the_free_count():
+    ports = PortAllocator(8)
+    assert ports.use(5) and not ports.use(5)
+    assert not ports.use(0) and not ports.use(9)
+    assert len(ports) == 7
+    assert 5 not in ports and 4 in ports and 9 not in ports and 0 not in ports
+    assert not ports.release(4)  # Already free
+    assert not ports.release(9)
+    assert ports.release(5) and len(ports) == 8
+
+
+def test_iteration_and_ranges():
+    ports = PortAllocator(12)
+    for port in (2, 3, 7, 12):
+        ports.use(port)
+    assert list(ports) == [1, 4, 5, 6, 8, 9, 10, 11]
+    assert str(ports) == "1, 4-6, 8-11"
+    for port in list(ports):
+        ports.use(port)
+    assert list(ports) == [] and str(ports) == "none"
+    assert str(PortAllocator(48)) == "1-48"
+
+
+def test_large_allocator_fills_every_port_once():
+    ports = PortAllocator(1000)
+    taken = [ports.allocate() for _ in range(1000)]
+    assert taken == list(range(1, 1001)) and len(ports) == 0
+    ports.release(640)
+    assert ports.lowest_free() == 640 and list(ports) == [640]
+
+
+@pytest.mark.parametrize("device_type", sorted(PORT_COUNTS) + ["Unknown"])
+def test_devices_get_their_type_port_count(device_type):
+    device = Device(1, device_type)
+    assert device.available_ports.size == PORT_COUNTS.get(device_type, DEFAULT_PORT_COUNT)
+    assert Device(2, device_type, 48).available_ports.size == 48
@@ -0,0 +1,100 @@
+"""RIP and OSPF control planes: converged tables must match the topology after every edit."""
+import random
+
+import networkx as nx
+import pytest
+
+from network import Network
+
+
+def check_converged(network):
+    """Every pair routes along a minimum-hop path exactly when it is connected."""
+    graph = network.graph
+    lengths = dict(nx.all_pairs_shortest_path_length(graph))
+    for src in graph:
+        for dst in graph:
+            path = network.routing.path(src, dst)
+            if dst not in lengths[src]:
+                assert path is None, (src, dst)
+            else:
+                assert path is not None, (src, dst)
+                assert len(path) - 1 == lengths[src][dst], (src, dst)
+                assert all(graph.has_edge(a, b) for a, b in zip(path, path[1:]))
+
+
+def random_edits(network, rng, count):
+    """Random device and link additions and removals, keeping the graph small."""
+    for _ in range(count):
+        devices = list(network.devices.values())
+        roll = rng.random()
+        if roll < 0.2 or len(devices) < 3:
+            yield network.add_device("Router", 16)
+        elif roll < 0.7:
+            a, b = rng.sample(devices, 2)
+            yield network.connect(a, b, rng.choice(["Copper", "Fiber"]))
+        elif roll < 0.9 and network.links:
+            yield network.disconnect(rng.choice(list(network.links)))
+        else:
+            yield network.remove_device(rng.choice(devices))
+
+
+@pytest.mark.parametrize("protocol", ["rip", "ospf"])
+@pytest.mark.parametrize("seed", range(4))
+def test_tables_match_the_topology_after_every_edit(protocol, seed):
+    network = Network(seed=seed)
+    network.set_routing(protocol)
+    for _ in random_edits(network, random.Random(seed), 60):
+        check_converged(network)
+        report = network.routing.last_report
+        assert report.unrestored == 0
+        assert report.convergence_ms >= 0
+
+
+@pytest.mark.parametrize("protocol", ["rip", "ospf"])
+def test_switching_on_converges_on_the_existing_topology(protocol):
+    network = Network(seed=8)
+    for _ in random_edits(network, random.Random(8), 80):
+        pass
+    report = network.set_routing(protocol)
+    assert report.messages > 0 and report.route_changes > 0
+    check_converged(network)
+    network.set_routing(None)
+    assert network.routing is None
+
+
+@pytest.mark.parametrize("protocol", ["rip", "ospf"])
+def test_losing_a_link_on_a_ring_reroutes_the_other_way(protocol):
+    network = Network(seed=1)
+    network.set_routing(protocol)
+    ring = [network.add_device("Router") for _ in range(6)]
+    links = [network.connect(a, b, "Copper") for a, b in zip(ring, ring[1:] + ring[:1])]
+    assert network.routing.path(ring[0].id, ring[1].id) == [ring[0].id, ring[1].id]
+    network.disconnect(links[0])
+    report = network.routing.last_report
+    assert report.cause == f"link {ring[0].id}-{ring[1].id} down"
+    assert report.route_changes > 0 and report.unrestored == 0
+    assert network.routing.path(ring[0].id, ring[1].id) == [device.id for device in [ring[0]] + ring[:0:-1]]
+    check_converged(network)
+
+
+@pytest.mark.parametrize("protocol", ["rip", "ospf"])
+def test_a_batch_converges_once_to_the_same_tables(protocol):
+    network = Network(seed=2)
+    network.set_routing(protocol)
+    before = network.routing.last_report
+    with network.batch():
+        for _ in random_edits(network, random.Random(2), 50):
+            assert network.routing.last_report is before
+    assert network.routing.last_report is not before
+    assert network.routing.last_report.cause.startswith("50 edits")
+    check_converged(network)
+
+
+def test_a_route_lookup_inside_a_batch_sees_the_edits_so_far():
+    network = Network(seed=3)
+    network.set_routing("ospf")
+    with network.batch():
+        a, b, c = (network.add_device("Router") for _ in range(3))
+        network.connect(a, b, "Copper")
+        network.connect(b, c, "Copper")
+        assert network.shortest_path(a, c) == [a.id, b.id, c.id]
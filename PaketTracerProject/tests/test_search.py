@@ -0,0 +1,106 @@
+"""Device search: the blocked sorted sequence and the prefix index on a Network."""
+import random
+
+import pytest
+
+import search
+from network import Network
+from search import DeviceIndex, SortedBlocks
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """Blocks of a few entries, so a handful of edits splits and empties them."""
+    monkeypatch.setattr(search, "BLOCK_SIZE", 4)
+
+
+def test_sorted_blocks_match_a_sorted_list(small_blocks):
+    rng = random.Random(1)
+    blocks, model = SortedBlocks(), []
+    for _ in range(3000):
+        if model and rng.random() < 0.4:
+            entry = rng.choice(model)
+            blocks.remove(entry)
+            model.remove(entry)
+        else:
+            entry = (rng.randrange(500), rng.randrange(1000))
+            blocks.add(entry)
+            model.append(entry)
+        model.sort()
+        assert len(blocks) == len(model)
+    assert len(blocks._blocks) > 10  # The edits did split blocks
+    assert all(0 < len(block) <= 2 * search.BLOCK_SIZE for block in blocks._blocks)
+    assert [blocks[i] for i in range(len(model))] == model
+    assert list(blocks.iter_from(0, len(model))) == model
+    for start, stop in ((0, 1), (3, 17), (len(model) - 5, len(model)), (7, 7), (9, 4)):
+        assert list(blocks.iter_from(start, stop)) == model[start:stop]
+    for probe in ((0,), (250, 500), (499, 999), (500,)):
+        assert blocks.bisect_left(probe) == sum(entry < probe for entry in model)
+
+
+def test_sorted_blocks_removing_everything(small_blocks):
+    blocks = SortedBlocks()
+    entries = [(i,) for i in range(40)]
+    for entry in entries:
+        blocks.add(entry)
+    random.Random(2).shuffle(entries)
+    for entry in entries:
+        blocks.remove(entry)
+    assert len(blocks) == 0 and blocks._blocks == []
+    assert blocks.bisect_left((5,)) == 0
+    blocks.add((3,))
+    assert blocks[0] == (3,)
+
+
+def test_index_prefix_queries(small_blocks):
+    network = Network(seed=1)
+    routers = [network.add_device("Router") for _ in range(12)]
+    pcs = [network.add_device("PC") for _ in range(30)]
+    index = network.index
+
+    assert list(index.search("")) == sorted(device.id for device in routers + pcs)
+    assert sorted(index.search("router")) == sorted(device.id for device in routers)
+    assert sorted(index.search("  PC ")) == sorted(device.id for device in pcs)  # Trimmed, any case
+    pc = pcs[0]
+    assert list(index.search(f"pc {pc.id}")) == [pc.id] + sorted(
+        device.id for device in pcs if str(device.id).startswith(str(pc.id)) and device is not pc)
+    assert list(index.search(pc.ip_address)) == [pc.id]
+    by_ip = index.search(pc.ip_address.rsplit(".", 1)[0] + ".")
+    assert len(by_ip) == len(routers + pcs)  # All in the same /24 pool
+    assert list(index.search("switch")) == []
+    assert list(index.search("192.168.250.")) == []
+
+
+def test_matches_slice_and_index_like_a_list(small_blocks):
+    network = Network(seed=1)
+    for _ in range(50):
+        network.add_device("PC")
+    matches = network.index.search("pc")
+    expected = list(matches)
+    assert len(matches) == len(expected) == 50
+    for window in (slice(0, 10), slice(13, 29), slice(45, 80), slice(-5, None), slice(None, None, 7)):
+        assert matches[window] == expected[window]
+    assert matches[0] == expected[0] and matches[-1] == expected[-1]
+    with pytest.raises(IndexError):
+        matches[50]
+
+
+def test_index_follows_address_changes_and_removals(small_blocks):
+    network = Network(seed=1)
+    devices = [network.add_device("PC") for _ in range(20)]
+    moved, removed = devices[3], devices[7]
+    old_ip = moved.ip_address
+
+    network.set_address(moved, "10.9.8.7")
+    assert list(network.index.search(old_ip)) == []
+    assert list(network.index.search("10.9.")) == [moved.id]
+
+    network.remove_device(removed)
+    assert removed.id not in list(network.index.search(""))
+    assert list(network.index.search(removed.ip_address)) == []
+    assert len(network.index) == len(network.devices) == 19
+    assert sorted(network.index.search("pc")) == sorted(network.devices)
+
+    removed_again = DeviceIndex()
+    removed_again.remove(moved)  # Removing a device that was never indexed is a no-op
+    assert len(removed_again) == 0
@@ -0,0 +1,85 @@
+"""Load and save topologies as JSON.
+
+The format is::
+
+    {
+        "devices": [
+            {"id": 1, "type": "Router", "ip": "192.168.0.1",
+             "subnet_mask": "255.255.255.0", "mac": "02:00:00:00:00:01", "ports": 6},
+            ...
+        ],
+        "links": [
+            {"a": 1, "b": 2, "type": "Copper", "distance": 12.5},
+            ...
+        ]
+    }
+
+Only a device's "id" and "type" and a link's "a" and "b" are required. Ids in
+the file only tie links to devices; devices get fresh ids when loaded. A
+link's "distance" is its length in km (0 if left out; it must be finite and
+not negative), which sets its propagation delay. Devices without an "ip"
+lease one from the network's address pools; two devices with the same "ip"
+are an error.
+"""
+import json
+import math
+
+from network import Network
+
+
+def load_topology(path, network=None):
+    """Build the topology in the JSON file into a (new) Network and return it."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    if network is None:
+        network = Network()
+    with network.batch():
+        _build(network, data)
+    return network
+
+
+def _build(network, data):
+    devices = {}
+    for entry in data.get("devices", []):
+        device = network.add_device(entry["type"], entry.get("ports"))
+        if "ip" in entry or "subnet_mask" in entry:
+            network.set_address(device, entry.get("ip", device.ip_address), entry.get("subnet_mask"))
+        if "mac" in entry:
+            device.mac_address = entry["mac"]
+        devices[entry["id"]] = device
+
+    for entry in data.get("links", []):
+        try:
+            device1, device2 = devices[entry["a"]], devices[entry["b"]]
+        except KeyError as e:
+            raise ValueError(f"Link refers to unknown device id {e.args[0]}") from None
+        distance = float(entry.get("distance", 0.0))
+        if not (math.isfinite(distance) and distance >= 0):
+            raise ValueError(f"Link between devices {entry['a']} and {entry['b']} has a bad distance {distance}")
+        if network.connect(device1, device2, entry.get("type", "Copper"), distance) is None:
+            raise ValueError(f"No free port for link between devices {entry['a']} and {entry['b']}")
+
+
+def save_topology(network, path):
+    """Write a Network's devices and links to a JSON file."""
+    with network.lock:
+        data = {
+            "devices": [
+                {
+                    "id": device.id,
+                    "type": device.device_type,
+                    "ip": device.ip_address,
+                    "subnet_mask": device.subnet_mask,
+                    "mac": device.mac_address,
+                    "ports": device.available_ports.size,
+                }
+                for device in network.devices.values()
+            ],
+            "links": [
+                {"a": link.device1.id, "b": link.device2.id, "type": link.type, "distance": link.distance}
+                for link in network.links
+            ],
+        }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
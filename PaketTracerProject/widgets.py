@@ -0,0 +1,154 @@
+"""Reusable Tk widgets for the simulator's sidebar."""
+import tkinter as tk
+from tkinter import ttk
+
+from search import device_label
+
+FILTER_DELAY_MS = 150  # Wait for a pause in typing before re-filtering
+
+
+class DevicePicker(ttk.Frame):
+    """Type-to-filter device list that only ever renders its visible rows.
+
+    Filtering is a prefix search in the network's DeviceIndex; the listbox
+    holds just ``rows`` entries and the scrollbar is driven by hand, so the
+    cost of a refresh does not depend on how many devices there are.
+    """
+
+    def __init__(self, parent, network, rows=6, on_select=None):
+        super().__init__(parent)
+        self.network = network
+        self.rows = rows
+        self.on_select = on_select
+        self.matches = network.index.search("")
+        self.top = 0  # Index (into matches) of the first visible row
+        self.selected_id = None
+        self._filter_job = None
+
+        self.filter_entry = ttk.Entry(self)
+        self.filter_entry.pack(fill="x")
+        self.filter_entry.bind("<KeyRelease>", self._on_filter_key)
+        self.filter_entry.bind("<Down>", lambda event: self._move_selection(1))
+        self.filter_entry.bind("<Up>", lambda event: self._move_selection(-1))
+
+        body = ttk.Frame(self)
+        body.pack(fill="both", expand=True)
+        self.listbox = tk.Listbox(body, height=rows, exportselection=False, activestyle="none")
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.status_label = ttk.Label(self, text="", foreground="gray")
+        self.status_label.pack(anchor="w")
+
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<MouseWheel>", self._on_mousewheel)  # Windows / macOS
+        self.listbox.bind("<Button-4>", lambda event: self.scroll(-1))  # X11
+        self.listbox.bind("<Button-5>", lambda event: self.scroll(1))
+        self.listbox.bind("<Down>", lambda event: self._move_selection(1))
+        self.listbox.bind("<Up>", lambda event: self._move_selection(-1))
+
+        self._render()
+
+    # Public API
+
+    def get(self):
+        """Id of the selected device, or None if nothing (still existing) is selected."""
+        if self.selected_id not in self.network.devices:
+            return None
+        return self.selected_id
+
+    def select(self, device_id, notify=False):
+        """Select a device, optionally telling on_select about it."""
+        self.selected_id = device_id
+        self._render()
+        if notify and self.on_select is not None:
+            self.on_select(device_id)
+
+    def select_first(self):
+        if len(self.matches):
+            self.select(self.matches[0])
+
+    def refresh(self):
+        """Re-run the current filter after devices were added, removed or renamed."""
+        self.matches = self.network.index.search(self.filter_entry.get())
+        self._render()
+
+    def scroll(self, rows):
+        self.top += rows
+        self._render()
+        return "break"
+
+    # Rendering
+
+    def _render(self):
+        total = len(self.matches)
+        self.top = max(0, min(self.top, total - self.rows))
+        visible = self.matches[self.top:self.top + self.rows]
+
+        self.listbox.delete(0, tk.END)
+        for row, device_id in enumerate(visible):
+            device = self.network.devices.get(device_id)
+            if device is None:
+                continue
+            self.listbox.insert(tk.END, f"{device_label(device)}  ({device.ip_address})")
+            if device_id == self.selected_id:
+                self.listbox.selection_set(row)
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.status_label.config(text=f"{total} of {len(self.network.index)} devices")
+
+    # Event handlers
+
+    def _on_filter_key(self, event):
+        if event.keysym in ("Up", "Down", "Return"):
+            return
+        # Debounce, so a fast typist does not trigger a search per key
+        if self._filter_job is not None:
+            self.after_cancel(self._filter_job)
+        self._filter_job = self.after(FILTER_DELAY_MS, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        self.top = 0
+        self.refresh()
+
+    def _on_scrollbar(self, *args):
+        total = len(self.matches)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.top += int(args[1]) * step
+        self._render()
+
+    def _on_mousewheel(self, event):
+        return self.scroll(-1 if event.delta > 0 else 1)
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        position = self.top + selection[0]
+        if position < len(self.matches):
+            self.select(self.matches[position], notify=True)
+
+    def _move_selection(self, step):
+        """Arrow keys: move through all matches, scrolling the window as needed."""
+        total = len(self.matches)
+        if not total:
+            return "break"
+        try:
+            position = self.matches[self.top:self.top + self.rows].index(self.selected_id) + self.top
+        except ValueError:
+            position = self.top - step  # Selection is off-screen: start from the window
+        position = max(0, min(total - 1, position + step))
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.rows:
+            self.top = position - self.rows + 1
+        self.select(self.matches[position], notify=True)
+        return "break"